@@ -1,9 +1,13 @@
 #!/usr/bin/python3
+import argparse
 import json
 import logging
 import os
 import pathlib
+import queue
 import requests
+import resource
+import threading
 import time
 from elasticsearch import Elasticsearch, helpers
 from elasticsearch.helpers import parallel_bulk, streaming_bulk
@@ -22,10 +26,18 @@ compression_ratios = []
 ingestion_times = []
 ingestion_speeds = []
 
-# path_pattern = '/home/datasets/worker*/worker*/*log*'
-path_pattern = sys.argv[1]
+parser = argparse.ArgumentParser(description='Ingest unstructured logs into Elasticsearch, streaming them so that the memory of this loader stays bounded.')
+# e.g., '/home/datasets/worker*/worker*/*log*'
+parser.add_argument('path_pattern')
+parser.add_argument('nr_clients', nargs='?', type=int, default=1, help='The number of concurrent bulk clients')
+parser.add_argument('--readers', type=int, default=4, help='The number of threads reading files concurrently')
+parser.add_argument('--block-size', type=int, default=1024 * 1024, help='The size in bytes of the blocks of lines passed from the readers')
+parser.add_argument('--queue-size', type=int, default=16, help='The maximum number of blocks waiting to be indexed')
+parser.add_argument('--max-chunk-bytes', type=int, default=16 * 1024 * 1024, help='The maximum size in bytes of a bulk request')
+args = parser.parse_args()
+nr_clients = args.nr_clients
 # Find all files matching the pattern
-log_files = glob.glob(path_pattern)
+log_files = glob.glob(args.path_pattern)
 logging.info(f'Total log files: {len(log_files)}')
 
 def get_compressed_size(dataset):
@@ -33,17 +45,68 @@ def get_compressed_size(dataset):
     return response['_all']['total']['store']['size_in_bytes']
 
 
+def read_files(files, blocks, stop_event):
+    # Streams the lines of each file as blocks of about `--block-size` bytes. The queue of blocks is
+    # bounded, so readers wait for the bulk clients instead of loading whole files
+    while not stop_event.is_set():
+        try:
+            log_file = files.get_nowait()
+        except queue.Empty:
+            break
+        try:
+            with open(log_file, 'r') as f:
+                block = []
+                block_size = 0
+                for line in f:
+                    block.append(line)
+                    block_size += len(line)
+                    if args.block_size <= block_size:
+                        put_block(blocks, block, stop_event)
+                        block = []
+                        block_size = 0
+                if block:
+                    put_block(blocks, block, stop_event)
+            logging.info(f'Processed file: {log_file}')
+        except Exception as e:
+            put_block(blocks, e, stop_event)
+    put_block(blocks, None, stop_event)
+
+
+def put_block(blocks, block, stop_event):
+    while not stop_event.is_set():
+        try:
+            blocks.put(block, timeout=1)
+            return
+        except queue.Full:
+            continue
+
+
 def traverse_data(index_name):
+    files = queue.Queue()
     for log_file in log_files:
-        logging.info(f'Processed file: {log_file}')
-        with open(log_file, 'r') as f:
-            for line in f.readlines():
-                yield {
-                    '_index': index_name,
-                    '_source': {
-                        'log_line': line
-                    }
-                }
+        files.put(log_file)
+    blocks = queue.Queue(maxsize=args.queue_size)
+    stop_event = threading.Event()
+    nr_readers = max(1, min(args.readers, len(log_files)))
+    readers = [threading.Thread(target=read_files, args=(files, blocks, stop_event), daemon=True) for _ in range(nr_readers)]
+    for reader in readers:
+        reader.start()
+    try:
+        nr_finished_readers = 0
+        while nr_finished_readers < nr_readers:
+            block = blocks.get()
+            if block is None:
+                nr_finished_readers += 1
+                continue
+            if isinstance(block, Exception):
+                raise block
+            for line in block:
+                # Serialized here, so the bulk helpers only measure its size
+                yield json.dumps({'log_line': line})
+    finally:
+        stop_event.set()
+        for reader in readers:
+            reader.join()
 
 
 def ingest_dataset():
@@ -55,7 +118,14 @@ def ingest_dataset():
     logging.info(f'Begin ingesting {dataset}')
     start_time = time.time()
     count = 0
-    for success, info in streaming_bulk(es, traverse_data(dataset), raise_on_error=False, raise_on_exception=False, chunk_size=100000, request_timeout=3600):
+    # Bulk requests are cut by size only, as the document count bounds neither their memory nor
+    # their latency
+    if nr_clients > 1:
+        logging.info(f'Ingesting with {nr_clients} bulk clients')
+        results = parallel_bulk(es, traverse_data(dataset), index=index_name, thread_count=nr_clients, queue_size=nr_clients, raise_on_error=False, raise_on_exception=False, chunk_size=sys.maxsize, max_chunk_bytes=args.max_chunk_bytes, request_timeout=3600)
+    else:
+        results = streaming_bulk(es, traverse_data(dataset), index=index_name, raise_on_error=False, raise_on_exception=False, chunk_size=sys.maxsize, max_chunk_bytes=args.max_chunk_bytes, request_timeout=3600)
+    for success, info in results:
         if success:
             count += 1
         else:
@@ -83,6 +153,9 @@ def ingest_dataset():
     logging.info(f'Compression ratio for {dataset} is {compression_ratio}')
     logging.info(f'Ingestion time for {dataset} is {ingestion_time} s')
     logging.info(f'Ingestion speed for {dataset} is {ingestion_speed} MB/s')
+    # Reported separately from the memory of Elasticsearch, in bytes (`ru_maxrss` is in KiB)
+    loader_peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    logging.info(f'Loader peak RSS for {dataset} is {loader_peak_rss}')
 
 
 if __name__ == "__main__":
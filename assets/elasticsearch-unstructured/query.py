@@ -1,6 +1,7 @@
 from elasticsearch import Elasticsearch, helpers
 from elasticsearch.helpers import parallel_bulk, streaming_bulk
 from threading import Thread, Event
+import json
 import logging
 import sys
 
@@ -15,6 +16,8 @@ es = Elasticsearch("http://localhost:9201", timeout=30, max_retries=10, retry_on
 
 # '{"query": {"bool": {"must": {"match_phrase": {"log_line": " org.apache.hadoop.hdfs.server.common.Storage: Analyzing storage directories for bpid "}}}}, "size": 10000}'
 query = sys.argv[1]
+# With --count, only print the number of matched documents, without retrieving them
+count_only = len(sys.argv) > 2 and sys.argv[2] == "--count"
 
 # Function to execute a query without cache
 def execute_query_without_cache(query):
@@ -40,6 +43,21 @@ def execute_query_without_cache(query):
 
     es.indices.clear_cache(index="hadoop")
 
+# Function to count the matches of a query without cache, through the _count API
+def count_without_cache(query):
+    body = json.loads(query)
+    # _count only accepts the query, not e.g. size or sort
+    result = es.count(
+        index="hadoop",
+        body={"query": body.get("query", {"match_all": {}})}
+    )
+    print(result['count'])
+
+    es.indices.clear_cache(index="hadoop")
+
 # Execute the query
-execute_query_without_cache(query)
+if count_only:
+    count_without_cache(query)
+else:
+    execute_query_without_cache(query)
     
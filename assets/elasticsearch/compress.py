@@ -1,6 +1,10 @@
 #!/usr/bin/python3
+import argparse
+import collections
+import itertools
 import json
 import logging
+import multiprocessing
 import os
 import pathlib
 import requests
@@ -21,7 +25,7 @@ compression_ratios = []
 ingestion_times = []
 ingestion_speeds = []
 
-log_path = sys.argv[1]
+log_path = None
 # log_path = '/home/muslope/mongodb-test/mongod.log.2023-03-22T03-45-46'
 # log_path = '/home/muslope/datasets/mongod.log'
 
@@ -30,61 +34,111 @@ def get_compressed_size(dataset):
     return response['_all']['total']['store']['size_in_bytes']
 
 
+def transform(json_line):
+    if 'attr' in json_line:
+        attr = json_line['attr']
+        if 'uuid' in attr and isinstance(attr['uuid'], dict):
+            uuid = attr['uuid']['uuid']['$uuid']
+            json_line['attr']['uuid'] = uuid
+        if 'error' in attr and isinstance(attr['error'], str):
+            error_msg = attr['error']
+            json_line['attr']['error'] = {}
+            json_line['attr']['error']['errmsg'] = error_msg
+        if 'command' in attr:
+            command = attr['command']
+            if isinstance(command, str):
+                json_line['attr']['command'] = {}
+                json_line['attr']['command']['command'] = command
+            if isinstance(command, dict) and \
+                'q' in command and isinstance(command['q'], dict) and \
+                '_id' in command['q'] and not isinstance(command['q']['_id'], dict):
+                id_value = str(command['q']['_id'])
+                json_line['attr']['command']['q']['_id'] = {}
+                json_line['attr']['command']['q']['_id']['_ooid'] = id_value
+        if 'writeConcern' in attr and isinstance(attr['writeConcern'], dict) and \
+            'w' in attr['writeConcern'] and isinstance(attr['writeConcern']['w'], int):
+            w = attr['writeConcern']['w']
+            json_line['attr']['writeConcern']['w'] = str(w)
+        if 'query' in attr and isinstance(attr['query'], dict) and \
+            '_id' in attr['query'] and not isinstance(attr['query']['_id'], dict):
+            id_value = str(attr['query']['_id'])
+            json_line['attr']['query']['_id'] = {}
+            json_line['attr']['query']['_id']['_ooid'] = id_value
+    return json_line
+
+
 def traverse_data(index_name):
     with open(log_path, encoding='utf-8') as f:
         for line in f:
-            json_line = json.loads(line)
-            if 'attr' in json_line:
-                attr = json_line['attr']
-                if 'uuid' in attr and isinstance(attr['uuid'], dict):
-                    uuid = attr['uuid']['uuid']['$uuid']
-                    json_line['attr']['uuid'] = uuid
-                if 'error' in attr and isinstance(attr['error'], str):
-                    error_msg = attr['error']
-                    json_line['attr']['error'] = {}
-                    json_line['attr']['error']['errmsg'] = error_msg
-                if 'command' in attr:
-                    command = attr['command']
-                    if isinstance(command, str):
-                        json_line['attr']['command'] = {}
-                        json_line['attr']['command']['command'] = command
-                    if isinstance(command, dict) and \
-                        'q' in command and isinstance(command['q'], dict) and \
-                        '_id' in command['q'] and not isinstance(command['q']['_id'], dict):
-                        id_value = str(command['q']['_id'])
-                        json_line['attr']['command']['q']['_id'] = {}
-                        json_line['attr']['command']['q']['_id']['_ooid'] = id_value
-                if 'writeConcern' in attr and isinstance(attr['writeConcern'], dict) and \
-                    'w' in attr['writeConcern'] and isinstance(attr['writeConcern']['w'], int):
-                    w = attr['writeConcern']['w']
-                    json_line['attr']['writeConcern']['w'] = str(w)
-                if 'query' in attr and isinstance(attr['query'], dict) and \
-                    '_id' in attr['query'] and not isinstance(attr['query']['_id'], dict):
-                    id_value = str(attr['query']['_id'])
-                    json_line['attr']['query']['_id'] = {}
-                    json_line['attr']['query']['_id']['_ooid'] = id_value
+            json_line = transform(json.loads(line))
             yield {
                 '_index': index_name,
                 '_source': json_line,
             }
 
 
-def ingest_dataset():
+def parse_range(path, start, end):
+    # Parses and transforms the lines starting in [start, end) into serialized documents. The line
+    # crossing `start` belongs to the range before.
+    documents = []
+    with open(path, 'rb') as f:
+        position = start
+        if start > 0:
+            f.seek(start - 1)
+            position += len(f.readline()) - 1
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            if line.strip():
+                documents.append(json.dumps(transform(json.loads(line)), separators=(',', ':')))
+    return documents
+
+
+def traverse_data_in_parallel(pool, nr_processes, range_size):
+    # Byte ranges are parsed by the worker processes, at most two per process at a time so that
+    # memory stays bounded, and their documents are yielded in order
+    file_size = os.path.getsize(log_path)
+    pending_ranges = collections.deque()
+    for start in range(0, file_size, range_size):
+        pending_ranges.append(pool.apply_async(parse_range, (log_path, start, min(start + range_size, file_size))))
+        if len(pending_ranges) >= 2 * nr_processes:
+            yield from pending_ranges.popleft().get()
+    while pending_ranges:
+        yield from pending_ranges.popleft().get()
+
+
+def ingest_dataset(nr_processes=1, nr_clients=1, chunk_size=10000, range_size=64 * 1024 * 1024):
     es = Elasticsearch('http://localhost:9202', request_timeout=1200, retry_on_timeout=True)
     dataset='mongodb_new_single_1'
     index_name = 'mongodb_new_single_1'
 
     requests.delete(f"http://localhost:9202/{index_name}")
     logging.info(f'Begin ingesting {dataset}')
+    logging.info(f'Ingesting with {nr_processes} parsing processes, {nr_clients} bulk clients, and {chunk_size} documents per bulk request')
+    # The process pool is created before any bulk client thread starts
+    pool = multiprocessing.Pool(nr_processes) if nr_processes > 1 else None
     start_time = time.time()
     count = 0
-    for success, info in streaming_bulk(es, traverse_data(dataset), raise_on_error=False, raise_on_exception=False, chunk_size=10000, request_timeout=120):
-        if success:
-            count += 1
-        else:
-            logging.error(f"Failed to index document at {count}: {info}")
-        if count % 100000 == 0:
-            logging.info(f'Index {count} logs')
+    if pool is not None:
+        # Documents are serialized by the worker processes, and sent as they are
+        results = parallel_bulk(es, traverse_data_in_parallel(pool, nr_processes, range_size), index=index_name, thread_count=nr_clients, queue_size=nr_clients, raise_on_error=False, raise_on_exception=False, chunk_size=chunk_size, request_timeout=120)
+    elif nr_clients > 1:
+        results = parallel_bulk(es, traverse_data(dataset), thread_count=nr_clients, queue_size=nr_clients, raise_on_error=False, raise_on_exception=False, chunk_size=chunk_size, request_timeout=120)
+    else:
+        results = streaming_bulk(es, traverse_data(dataset), raise_on_error=False, raise_on_exception=False, chunk_size=chunk_size, request_timeout=120)
+    try:
+        for success, info in results:
+            if success:
+                count += 1
+            else:
+                logging.error(f"Failed to index document at {count}: {info}")
+            if count % 100000 == 0:
+                logging.info(f'Index {count} logs')
+    finally:
+        if pool is not None:
+            pool.terminate()
 
     requests.post(f"http://localhost:9202/{index_name}/_flush/")
     logging.debug(f'Flush all data in {index_name}')
@@ -104,11 +158,34 @@ def ingest_dataset():
     logging.info(f'Compression ratio for {dataset} is {compression_ratio}')
     logging.info(f'Ingestion time for {dataset} is {ingestion_time} s')
     logging.info(f'Ingestion speed for {dataset} is {ingestion_speed} MB/s')
+    return ingestion_speed
+
+
+def parse_counts(counts):
+    return [int(count) for count in counts.split(',')]
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Ingest a MongoDB log into Elasticsearch. Each of --processes, --clients, and --chunk-size can be a comma-separated list, in which case every combination is ingested in turn.')
+    parser.add_argument('log_path')
+    parser.add_argument('nr_clients', nargs='?', default='1', help='The number of concurrent bulk clients, same as --clients')
+    parser.add_argument('--processes', default='1', help='The number of processes parsing the log, 1 to parse it in this process')
+    parser.add_argument('--clients', default=None, help='The number of concurrent bulk clients')
+    parser.add_argument('--chunk-size', default='10000', help='The number of documents per bulk request')
+    parser.add_argument('--range-size', type=int, default=64 * 1024 * 1024, help='The size in bytes of each range of the log parsed by a process')
+    args = parser.parse_args()
+    log_path = args.log_path
     try:
-        ingest_dataset()
+        settings = list(itertools.product(
+            parse_counts(args.processes),
+            parse_counts(args.clients if args.clients is not None else args.nr_clients),
+            parse_counts(args.chunk_size),
+        ))
+        speeds = []
+        for nr_processes, nr_clients, chunk_size in settings:
+            speeds.append(ingest_dataset(nr_processes, nr_clients, chunk_size, args.range_size))
+        for (nr_processes, nr_clients, chunk_size), speed in zip(settings, speeds):
+            logging.info(f'Ingestion speed with {nr_processes} processes, {nr_clients} clients, and chunk size {chunk_size} is {speed} MB/s')
     except Exception as e:
         print(e)
     
\ No newline at end of file
@@ -1,6 +1,7 @@
 from elasticsearch import Elasticsearch, helpers
 from elasticsearch.helpers import parallel_bulk, streaming_bulk
 from threading import Thread, Event
+import json
 import logging
 import sys
 
@@ -14,6 +15,8 @@ es_transport_logger.setLevel(logging.WARNING)
 es = Elasticsearch("http://localhost:9202",  timeout=30, max_retries=10, retry_on_timeout=True)
 
 query = sys.argv[1]
+# With --count, only print the number of matched documents, without retrieving them
+count_only = len(sys.argv) > 2 and sys.argv[2] == "--count"
 
 # Function to execute a query without cache
 def execute_query_without_cache(query):
@@ -39,10 +42,25 @@ def execute_query_without_cache(query):
     
     es.indices.clear_cache(index="mongodb_new_single_1")
 
+# Function to count the matches of a query without cache, through the _count API
+def count_without_cache(query):
+    body = json.loads(query)
+    # _count only accepts the query, not e.g. size or sort
+    result = es.count(
+        index="mongodb_new_single_1",
+        body={"query": body.get("query", {"match_all": {}})}
+    )
+    print(result['count'])
+
+    es.indices.clear_cache(index="mongodb_new_single_1")
+
 # Execute the query
 while (True):
     try:
-        execute_query_without_cache(query)
+        if count_only:
+            count_without_cache(query)
+        else:
+            execute_query_without_cache(query)
         break
     except Exception as e:
         logging.error(e)
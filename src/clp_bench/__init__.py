@@ -1,9 +1,13 @@
 import argparse
 import importlib
 import logging
+import sys
 import traceback
 
-from .executor import BenchmarkingMode, BenchmarkingSystemMetric, CPTExecutorBase
+from .compare import compare_main
+from .executor import BenchmarkingMode, CPTExecutorBase
+from .generate import generate_main
+from .publish import publish_results
 from .version import VERSION, VERSION_SHORT
 
 # Setup logging
@@ -27,9 +31,8 @@ def load_executor_class(target_tool_name: str, config_path: str) -> CPTExecutorB
 def hot_run_benchmark(executor: CPTExecutorBase):
     logger.info("Running benchmark in hot-run mode")
     try:
-        executor.start_polling_system_metric(
-            BenchmarkingSystemMetric.MEMORY, BenchmarkingMode.HOT_RUN_MODE
-        )
+        for metric in executor.get_enabled_system_metrics():
+            executor.start_polling_system_metric(metric, BenchmarkingMode.HOT_RUN_MODE)
         executor.deploy(BenchmarkingMode.HOT_RUN_MODE)
         executor.launch(BenchmarkingMode.HOT_RUN_MODE)
         executor.ingest(BenchmarkingMode.HOT_RUN_MODE)
@@ -38,9 +41,8 @@ def hot_run_benchmark(executor: CPTExecutorBase):
         traceback.print_exc()
         logger.error(f"Failed to run benchmark in hot-run mode: {e}")
     finally:
-        executor.stop_polling_system_metric(
-            BenchmarkingSystemMetric.MEMORY, BenchmarkingMode.HOT_RUN_MODE
-        )
+        for metric in executor.get_enabled_system_metrics():
+            executor.stop_polling_system_metric(metric, BenchmarkingMode.HOT_RUN_MODE)
         try:
             executor.terminate(BenchmarkingMode.HOT_RUN_MODE)
         except Exception as e:
@@ -50,9 +52,8 @@ def hot_run_benchmark(executor: CPTExecutorBase):
 def cold_run_benchmark(executor: CPTExecutorBase):
     logger.info("Running benchmarking in cold-run mode")
     try:
-        executor.start_polling_system_metric(
-            BenchmarkingSystemMetric.MEMORY, BenchmarkingMode.COLD_RUN_MODE
-        )
+        for metric in executor.get_enabled_system_metrics():
+            executor.start_polling_system_metric(metric, BenchmarkingMode.COLD_RUN_MODE)
         executor.deploy(BenchmarkingMode.COLD_RUN_MODE)
         executor.launch(BenchmarkingMode.COLD_RUN_MODE)
         executor.ingest(BenchmarkingMode.COLD_RUN_MODE)
@@ -62,9 +63,8 @@ def cold_run_benchmark(executor: CPTExecutorBase):
     except Exception as e:
         logger.error(f"Failed to run benchmark in cold-run mode: {e}")
     finally:
-        executor.stop_polling_system_metric(
-            BenchmarkingSystemMetric.MEMORY, BenchmarkingMode.COLD_RUN_MODE
-        )
+        for metric in executor.get_enabled_system_metrics():
+            executor.stop_polling_system_metric(metric, BenchmarkingMode.COLD_RUN_MODE)
         try:
             executor.terminate(BenchmarkingMode.COLD_RUN_MODE)
         except Exception as e:
@@ -74,21 +74,113 @@ def cold_run_benchmark(executor: CPTExecutorBase):
 def query_only_run_benchmark(executor: CPTExecutorBase):
     logger.info("Running benchmarking in query-only-run mode")
     try:
-        executor.start_polling_system_metric(
-            BenchmarkingSystemMetric.MEMORY, BenchmarkingMode.QUERY_ONLY_RUN_MODE
-        )
+        for metric in executor.get_enabled_system_metrics():
+            executor.start_polling_system_metric(metric, BenchmarkingMode.QUERY_ONLY_RUN_MODE)
         # Query-only run mode no need to deploy, it assumes just finished a hot-run or cold-run benchmarking.
         executor.launch(BenchmarkingMode.QUERY_ONLY_RUN_MODE)
         executor.run_query_benchmark(BenchmarkingMode.QUERY_ONLY_RUN_MODE)
     except Exception as e:
         logger.error(f"Failed to run benchmark in query-only-run mode: {e}")
     finally:
-        executor.stop_polling_system_metric(
-            BenchmarkingSystemMetric.MEMORY, BenchmarkingMode.QUERY_ONLY_RUN_MODE
-        )
+        for metric in executor.get_enabled_system_metrics():
+            executor.stop_polling_system_metric(metric, BenchmarkingMode.QUERY_ONLY_RUN_MODE)
+
+
+def concurrency_run_benchmark(executor: CPTExecutorBase):
+    logger.info("Running benchmarking in concurrency-run mode")
+    try:
+        for metric in executor.get_enabled_system_metrics():
+            executor.start_polling_system_metric(metric, BenchmarkingMode.CONCURRENCY_RUN_MODE)
+        # Concurrency run mode no need to deploy, it assumes just finished a hot-run or cold-run
+        # benchmarking.
+        executor.launch(BenchmarkingMode.CONCURRENCY_RUN_MODE)
+        executor.run_concurrency_benchmark(BenchmarkingMode.CONCURRENCY_RUN_MODE)
+    except Exception as e:
+        logger.error(f"Failed to run benchmark in concurrency-run mode: {e}")
+    finally:
+        for metric in executor.get_enabled_system_metrics():
+            executor.stop_polling_system_metric(metric, BenchmarkingMode.CONCURRENCY_RUN_MODE)
+
+
+def open_loop_run_benchmark(executor: CPTExecutorBase):
+    logger.info("Running benchmarking in open-loop-run mode")
+    try:
+        for metric in executor.get_enabled_system_metrics():
+            executor.start_polling_system_metric(metric, BenchmarkingMode.OPEN_LOOP_RUN_MODE)
+        # Open-loop run mode no need to deploy, it assumes just finished a hot-run or cold-run
+        # benchmarking.
+        executor.launch(BenchmarkingMode.OPEN_LOOP_RUN_MODE)
+        executor.run_open_loop_benchmark(BenchmarkingMode.OPEN_LOOP_RUN_MODE)
+    except Exception as e:
+        logger.error(f"Failed to run benchmark in open-loop-run mode: {e}")
+    finally:
+        for metric in executor.get_enabled_system_metrics():
+            executor.stop_polling_system_metric(metric, BenchmarkingMode.OPEN_LOOP_RUN_MODE)
+
+
+def ingest_scaling_run_benchmark(executor: CPTExecutorBase):
+    logger.info("Running benchmarking in ingest-scaling-run mode")
+    try:
+        for metric in executor.get_enabled_system_metrics():
+            executor.start_polling_system_metric(metric, BenchmarkingMode.INGEST_SCALING_RUN_MODE)
+        executor.deploy(BenchmarkingMode.INGEST_SCALING_RUN_MODE)
+        executor.launch(BenchmarkingMode.INGEST_SCALING_RUN_MODE)
+        executor.run_ingest_scaling_benchmark(BenchmarkingMode.INGEST_SCALING_RUN_MODE)
+    except Exception as e:
+        traceback.print_exc()
+        logger.error(f"Failed to run benchmark in ingest-scaling-run mode: {e}")
+    finally:
+        for metric in executor.get_enabled_system_metrics():
+            executor.stop_polling_system_metric(metric, BenchmarkingMode.INGEST_SCALING_RUN_MODE)
+        try:
+            executor.terminate(BenchmarkingMode.INGEST_SCALING_RUN_MODE)
+        except Exception as e:
+            logger.error(f"Failed to finish benchmark in ingest-scaling-run mode: {e}")
+
+
+def dataset_scaling_run_benchmark(executor: CPTExecutorBase):
+    logger.info("Running benchmarking in dataset-scaling-run mode")
+    try:
+        # Each subset of the dataset is deployed, ingested, queried, and terminated on its own
+        executor.run_dataset_scaling_benchmark(BenchmarkingMode.DATASET_SCALING_RUN_MODE)
+    except Exception as e:
+        traceback.print_exc()
+        logger.error(f"Failed to run benchmark in dataset-scaling-run mode: {e}")
+
+
+def interleaved_run_benchmark(executor_a: CPTExecutorBase, executor_b: CPTExecutorBase):
+    logger.info("Running benchmarking in interleaved-run mode")
+    try:
+        for metric in executor_a.get_enabled_system_metrics():
+            executor_a.start_polling_system_metric(metric, BenchmarkingMode.INTERLEAVED_RUN_MODE)
+        # Each configuration ingests once, so they must not share data paths. Only A is polled, so
+        # its ingest stage ends before B is deployed, leaving B's ingestion out of A's metrics
+        for executor in (executor_a, executor_b):
+            executor.deploy(BenchmarkingMode.INTERLEAVED_RUN_MODE)
+            executor.launch(BenchmarkingMode.INTERLEAVED_RUN_MODE)
+            executor.ingest(BenchmarkingMode.INTERLEAVED_RUN_MODE)
+            executor.end_ingest_stage()
+        executor_a.run_interleaved_benchmark(BenchmarkingMode.INTERLEAVED_RUN_MODE, executor_b)
+    except Exception as e:
+        traceback.print_exc()
+        logger.error(f"Failed to run benchmark in interleaved-run mode: {e}")
+    finally:
+        for metric in executor_a.get_enabled_system_metrics():
+            executor_a.stop_polling_system_metric(metric, BenchmarkingMode.INTERLEAVED_RUN_MODE)
+        for executor in (executor_a, executor_b):
+            try:
+                executor.terminate(BenchmarkingMode.INTERLEAVED_RUN_MODE)
+            except Exception as e:
+                logger.error(f"Failed to finish benchmark in interleaved-run mode: {e}")
 
 
 def main():
+    # Subcommands, each with its own arguments
+    if 1 < len(sys.argv) and "compare" == sys.argv[1]:
+        sys.exit(compare_main(sys.argv[2:]))
+    if 1 < len(sys.argv) and "generate" == sys.argv[1]:
+        sys.exit(generate_main(sys.argv[2:]))
+
     # Command line arguments parsing
     parser = argparse.ArgumentParser(
         description="CLP Bench--An out-of-the-box benchmarking framework."
@@ -118,33 +210,115 @@ def main():
         "-m",
         "--mode",
         type=str,
-        choices=["all", "hot", "cold", "query-only"],
+        choices=[
+            "all",
+            "hot",
+            "cold",
+            "query-only",
+            "concurrency",
+            "open-loop",
+            "interleaved",
+            "ingest-scaling",
+            "dataset-scaling",
+        ],
         default="all",
         help="The benchmarking mode",
     )
+    parser.add_argument(
+        "-b",
+        "--config-b",
+        type=str,
+        default=None,
+        help="The yaml config file of the second configuration (B) in interleaved-run mode",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=str,
+        default=None,
+        help="The directory to export the results to as a JSON file, with every raw sample",
+    )
+    parser.add_argument(
+        "-p",
+        "--publish",
+        type=str,
+        default=None,
+        metavar="URL",
+        help="The UI backend's URL (including its base path) to publish the results to",
+    )
     args = parser.parse_args()
     logger.info(f"Target tool is {args.target}")
     logger.info(f"The config file location: {args.config}")
     logger.info(f"The benchmarking mode: {args.mode}")
 
+    if "interleaved" == args.mode and args.config_b is None:
+        parser.error("--config-b is required in interleaved-run mode")
+
     # Load cooresponding implementation for executor's SPI
     try:
         executor = load_executor_class(args.target, args.config)
+        if "interleaved" == args.mode:
+            logger.info(f"The config file location of B: {args.config_b}")
+            executor_b = load_executor_class(args.target, args.config_b)
     except Exception as e:
         traceback.print_exc()
         logger.error(e)
         return
 
+    executed_modes = []
+
     # Hot run mode with warm cache benchmarking
     if "all" == args.mode or "hot" == args.mode:
         hot_run_benchmark(executor)
+        executed_modes.append(BenchmarkingMode.HOT_RUN_MODE)
 
     # Cold run mode with cold cache benchmarking
     if "all" == args.mode or "cold" == args.mode:
         cold_run_benchmark(executor)
+        executed_modes.append(BenchmarkingMode.COLD_RUN_MODE)
 
     # Query only run mode, assuming just finished a hot run or cold run
     if "query-only" == args.mode:
         query_only_run_benchmark(executor)
+        executed_modes.append(BenchmarkingMode.QUERY_ONLY_RUN_MODE)
+
+    # Concurrency run mode, assuming just finished a hot run or cold run
+    if "concurrency" == args.mode:
+        concurrency_run_benchmark(executor)
+        executed_modes.append(BenchmarkingMode.CONCURRENCY_RUN_MODE)
+
+    # Open-loop run mode, assuming just finished a hot run or cold run
+    if "open-loop" == args.mode:
+        open_loop_run_benchmark(executor)
+        executed_modes.append(BenchmarkingMode.OPEN_LOOP_RUN_MODE)
+
+    # Ingest scaling run mode, sweeping the number of concurrent ingest workers
+    if "ingest-scaling" == args.mode:
+        ingest_scaling_run_benchmark(executor)
+        executed_modes.append(BenchmarkingMode.INGEST_SCALING_RUN_MODE)
+
+    # Dataset scaling run mode, running the whole pipeline on subsets of the dataset
+    if "dataset-scaling" == args.mode:
+        dataset_scaling_run_benchmark(executor)
+        executed_modes.append(BenchmarkingMode.DATASET_SCALING_RUN_MODE)
+
+    # Interleaved run mode, comparing two configurations of the target tool
+    if "interleaved" == args.mode:
+        interleaved_run_benchmark(executor, executor_b)
+        executed_modes.append(BenchmarkingMode.INTERLEAVED_RUN_MODE)
 
     executor.visualize()
+
+    if args.output_dir is not None:
+        try:
+            executor.export_results(args.target, executed_modes, args.output_dir)
+        except Exception as e:
+            traceback.print_exc()
+            logger.error(f"Failed to export results: {e}")
+
+    if args.publish is not None:
+        try:
+            publish_results(executor, args.target, executed_modes, args.publish)
+        except Exception as e:
+            traceback.print_exc()
+            logger.error(f"Failed to publish results: {e}")
@@ -0,0 +1,91 @@
+import logging
+import os
+from typing import Dict, List, Optional
+
+from .docker_client import DockerClient
+
+# Retrive logger
+logger = logging.getLogger(__name__)
+
+CGROUP_V2_ROOT = "/sys/fs/cgroup"
+
+
+class ContainerCgroup:
+    """
+    Reads the cgroup v2 interface files of a docker container directly from the host, without
+    spawning any process per sample.
+    """
+
+    def __init__(self, container_id: str, docker_client: DockerClient) -> None:
+        self.container_id = container_id
+        self.path = self.__resolve_path(docker_client)
+        logger.info(f"cgroup of container {container_id}: {self.path}")
+
+    def __resolve_path(self, docker_client: DockerClient) -> str:
+        container = docker_client.inspect_container(self.container_id)
+        full_id = container["Id"]
+        pid = container["State"]["Pid"]
+        candidates: List[str] = [
+            # systemd cgroup driver
+            os.path.join(CGROUP_V2_ROOT, "system.slice", f"docker-{full_id}.scope"),
+            # cgroupfs cgroup driver
+            os.path.join(CGROUP_V2_ROOT, "docker", full_id),
+        ]
+        if 0 != pid:
+            with open(f"/proc/{pid}/cgroup", "r") as f:
+                for line in f:
+                    # The cgroup v2 entry is `0::<path>`
+                    if line.startswith("0::"):
+                        candidates.append(CGROUP_V2_ROOT + line.strip()[3:])
+        for candidate in candidates:
+            if os.path.isfile(os.path.join(candidate, "memory.current")):
+                return candidate
+        raise Exception(
+            f"Cannot find cgroup v2 of container {self.container_id}, is the host using cgroup v2?"
+        )
+
+    def __read_value(self, file_name: str) -> Optional[int]:
+        try:
+            with open(os.path.join(self.path, file_name), "r") as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            # E.g., `memory.peak` is only available since Linux 5.19
+            if not os.path.isdir(self.path):
+                raise
+            return None
+
+    def read_flat_keyed(self, file_name: str) -> Dict[str, int]:
+        stat: Dict[str, int] = {}
+        with open(os.path.join(self.path, file_name), "r") as f:
+            for line in f:
+                key, value = line.split()
+                stat[key] = int(value)
+        return stat
+
+    def read_nested_keyed(self, file_name: str) -> Dict[str, Dict[str, int]]:
+        stat: Dict[str, Dict[str, int]] = {}
+        with open(os.path.join(self.path, file_name), "r") as f:
+            for line in f:
+                key, *fields = line.split()
+                stat[key] = {}
+                for field in fields:
+                    sub_key, value = field.split("=")
+                    stat[key][sub_key] = int(value)
+        return stat
+
+    def read_memory_usage(self) -> Dict[str, int]:
+        """
+        Returns the memory usage of the container in KB, with anonymous memory and page cache
+        reported separately. `tool` is the memory charged to the container excluding page cache.
+        """
+        current = self.__read_value("memory.current")
+        peak = self.__read_value("memory.peak")
+        stat = self.read_flat_keyed("memory.stat")
+        return {
+            "tool": (current - stat["file"]) // 1024,
+            "anon": stat["anon"] // 1024,
+            "file": stat["file"] // 1024,
+            "kernel": stat.get("kernel", 0) // 1024,
+            "current": current // 1024,
+            "peak": (peak if peak is not None else current) // 1024,
+        }
@@ -1,8 +1,16 @@
 import logging
 import subprocess
 import time
+from typing import Dict, List, Optional
 
-from .executor import BenchmarkingMode, BenchmarkingSystemMetric, CPTExecutorBase
+from .docker_client import DockerExecError
+from .executor import (
+    BenchmarkingMode,
+    BenchmarkingSystemMetric,
+    CPTExecutorBase,
+    IngestScalingResult,
+    QueryExecutionResult,
+)
 
 # Retrive logger
 logger = logging.getLogger(__name__)
@@ -43,25 +51,14 @@ class CPTExecutorCLPG(CPTExecutorBase):
             result = subprocess.run(
                 ["du", dataset_path, "-c", "-b"], stdout=subprocess.PIPE, check=True
             )
-            decompressed_size_mb = (
-                int(result.stdout.decode("utf-8").split("\n")[-2].split()[0].strip()) / 1024 / 1024
+            decompressed_size = int(
+                result.stdout.decode("utf-8").split("\n")[-2].split()[0].strip()
             )
-            self.benchmarking_reseults[mode].decompressed_size = f"{decompressed_size_mb:.2f}MB"
+            self.benchmarking_reseults[mode].decompressed_size = decompressed_size
             start_ts = time.perf_counter_ns()
-            subprocess.run(
-                [
-                    "docker",
-                    "exec",
-                    container_id,
-                    "bash",
-                    "-c",
-                    f"{clp_binary_path} c {data_path} {dataset_path}",
-                ],
-                check=True,
-            )
+            self._exec_in_docker(container_id, f"{clp_binary_path} c {data_path} {dataset_path}")
             end_ts = time.perf_counter_ns()
-            elapsed_time = (end_ts - start_ts) / 1e9
-            self.benchmarking_reseults[mode].ingest_e2e_latency = f"{elapsed_time:.9f}s"
+            self.benchmarking_reseults[mode].ingest_e2e_latency = end_ts - start_ts
             # FIXME: this is inconsistent with clp-s genereated archives permission
             subprocess.run(
                 ["sudo", "find", data_path, "-exec", "chmod", "o+r+x", "{}", ";"], check=True
@@ -69,32 +66,66 @@ class CPTExecutorCLPG(CPTExecutorBase):
             result = subprocess.run(
                 ["du", data_path, "-c", "-b"], stdout=subprocess.PIPE, check=True
             )
-            compressed_size_mb = (
-                int(result.stdout.decode("utf-8").split("\n")[-2].split()[0].strip()) / 1024 / 1024
-            )
-            self.benchmarking_reseults[mode].compressed_size = f"{compressed_size_mb:.2f}MB"
-            self.benchmarking_reseults[mode].ratio = f"{decompressed_size_mb / compressed_size_mb}x"
-        except subprocess.CalledProcessError as e:
+            compressed_size = int(result.stdout.decode("utf-8").split("\n")[-2].split()[0].strip())
+            self.benchmarking_reseults[mode].compressed_size = compressed_size
+            self.benchmarking_reseults[mode].ratio = decompressed_size / compressed_size
+        except (subprocess.CalledProcessError, DockerExecError) as e:
             raise Exception(f"clp failed to compress data: {e}")
 
+    def _ingest_with_workers(self, nr_workers: int) -> IngestScalingResult:
+        container_id = self.config["clpg"]["container_id"]
+        clp_binary_path = self.config["clpg"]["clp_binary_path"]
+        data_path = self.config["clpg"]["data_path"]
+        dataset_path = self.config["clpg"]["dataset_path"]
+        try:
+            return self._ingest_shards_in_docker(
+                container_id,
+                dataset_path,
+                data_path,
+                nr_workers,
+                lambda archive_path, file_paths: [clp_binary_path, "c", archive_path, *file_paths],
+            )
+        except DockerExecError as e:
+            raise Exception(f"clp failed to compress data with {nr_workers} workers: {e}")
+
     def run_query_benchmark(self, mode: BenchmarkingMode):
         super().run_query_benchmark(mode)
         logger.info("Running query benchmark for clp")
-        container_id = self.config["clpg"]["container_id"]
-        clg_binary_path = self.config["clpg"]["clg_binary_path"]
-        data_path = self.config["clpg"]["data_path"]
-        queries = self.config["clpg"]["queries"]
+        queries = self._get_queries()
         try:
             for query in queries:
-                command = f"docker exec {container_id} {clg_binary_path} {data_path} {query}"
-                self._execute_query(mode, command)
-        except subprocess.CalledProcessError as e:
+                self._run_query_trials(mode, query)
+        except DockerExecError as e:
             raise Exception(f"clp failed to finish the query benchmarking: {e}")
         pass
 
+    def _get_container_ids(self) -> List[str]:
+        return [self.config["clpg"]["container_id"]]
+
+    def _get_tool_config(self) -> Optional[Dict]:
+        return self.config["clpg"]
+
+    def _get_queries(self) -> List[str]:
+        return self.config["clpg"]["queries"]
+
+    def _run_empty_query(self) -> Optional[QueryExecutionResult]:
+        container_id = self.config["clpg"]["container_id"]
+        return self._execute_query_in_docker(container_id, "true")
+
+    def _run_query(self, query: str) -> QueryExecutionResult:
+        container_id = self.config["clpg"]["container_id"]
+        clg_binary_path = self.config["clpg"]["clg_binary_path"]
+        data_path = self.config["clpg"]["data_path"]
+        command = f"{clg_binary_path} {data_path} {query}"
+        return self._execute_query_in_docker(container_id, command)
+
     def mid_terminate(self, mode: BenchmarkingMode):
         super().mid_terminate(mode)
         self.terminate(mode)
+        self._clear_os_caches()
+
+    def _get_archive_paths(self) -> List[str]:
+        return [self.config["clpg"]["data_path"]]
 
     def launch(self, mode: BenchmarkingMode):
         logger.info("Launching clp")
@@ -107,12 +138,7 @@ class CPTExecutorCLPG(CPTExecutorBase):
     def _acquire_system_metric_sample(self, metric: BenchmarkingSystemMetric) -> int:
         container_id = self.config["clpg"]["container_id"]
         try:
-            result = subprocess.run(
-                ["docker", "stats", container_id, "--no-stream"], stdout=subprocess.PIPE, check=True
-            )
-            output = result.stdout.decode("utf-8").strip().split("\n")
-            for line in output:
-                if container_id in line:
-                    return self._get_mem_usage_from_docker_stats(line)
-        except subprocess.CalledProcessError:
-            raise Exception("clp failed to get mem usage info")
+            stats = self._docker_client.get_stats(container_id)
+            return self._docker_client.get_memory_usage(stats) // 1024
+        except Exception as e:
+            raise Exception(f"clp failed to get mem usage info: {e}")
@@ -1,13 +1,31 @@
 import logging
 import re
-import subprocess
 import time
+from typing import Dict, List, Optional
 
-from .executor import BenchmarkingMode, BenchmarkingSystemMetric, CPTExecutorBase
+from .docker_client import DockerExecError
+from .executor import (
+    BenchmarkingMode,
+    BenchmarkingSystemMetric,
+    CPTExecutorBase,
+    QueryExecutionResult,
+)
 
 # Retrive logger
 logger = logging.getLogger(__name__)
 
+SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3, "TB": 1024**4}
+
+
+def _parse_size(size: str) -> int:
+    """
+    Parses a size printed by clp-json, e.g., `1.23GB`, into bytes.
+    """
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMGT]?)i?B", size.strip())
+    if match is None:
+        raise Exception(f"Unknown size: {size}")
+    return int(float(match.group(1)) * SIZE_UNITS[f"{match.group(2)}B"])
+
 
 class CPTExecutorCLPJson(CPTExecutorBase):
     """
@@ -61,86 +79,90 @@ class CPTExecutorCLPJson(CPTExecutorBase):
         dataset_path = self.config["clp_json"]["dataset_path"]
         try:
             start_ts = time.perf_counter_ns()
-            command = f"docker exec {container_id} {compress_script_path} --timestamp-key 't.$date' {dataset_path}"
-            result = subprocess.run(
-                command, stderr=subprocess.PIPE, shell=True, check=True, text=True
-            )
+            command = f"{compress_script_path} --timestamp-key 't.$date' {dataset_path}"
+            _, output = self._exec_in_docker(container_id, command)
             end_ts = time.perf_counter_ns()
             elapsed_time = (end_ts - start_ts) / 1e9
             logger.info(
                 f"clp-json compressed data in {dataset_path} successfully in {elapsed_time:.9f} seconds"
             )
-            self.benchmarking_reseults[mode].ingest_e2e_latency = f"{elapsed_time:.9f}s"
-            output = result.stderr
-            match = re.search(r"Compressed (\S+).*?into (\S+).*?\((\d+\.\d+x)\)", output)
+            self.benchmarking_reseults[mode].ingest_e2e_latency = end_ts - start_ts
+            match = re.search(r"Compressed (\S+).*?into (\S+).*?\((\d+\.\d+)x\)", output)
             if match:
-                self.benchmarking_reseults[mode].decompressed_size = match.group(1)
-                self.benchmarking_reseults[mode].compressed_size = match.group(2)
-                self.benchmarking_reseults[mode].ratio = match.group(3)
+                self.benchmarking_reseults[mode].decompressed_size = _parse_size(match.group(1))
+                self.benchmarking_reseults[mode].compressed_size = _parse_size(match.group(2))
+                self.benchmarking_reseults[mode].ratio = float(match.group(3))
                 logger.info("Ingest metrics collected")
             else:
                 logger.error("Cannot get ingest metrics")
-        except subprocess.CalledProcessError as e:
+        except DockerExecError as e:
             raise Exception(f"clp-json failed to compress data: {e}")
 
     def run_query_benchmark(self, mode: BenchmarkingMode):
         super().run_query_benchmark(mode)
         logger.info("Running query benchmark for CLP")
+        queries = self._get_queries()
+        for query in queries:
+            self._run_query_trials(mode, query)
+
+    def _get_container_ids(self) -> List[str]:
+        # clp-json's components run in sibling containers named with a `clp-` prefix
+        try:
+            containers = self._docker_client.list_containers("^clp-")
+        except Exception as e:
+            raise Exception(f"clp-json failed to list its containers: {e}")
+        return [container["Id"] for container in containers]
+
+    def _get_tool_config(self) -> Optional[Dict]:
+        return self.config["clp_json"]
+
+    def _get_queries(self) -> List[str]:
+        return self.config["clp_json"]["queries"]
+
+    def _run_empty_query(self) -> Optional[QueryExecutionResult]:
+        container_id = self.config["clp_json"]["container_id"]
+        return self._execute_query_in_docker(container_id, "true")
+
+    def _run_query(self, query: str) -> QueryExecutionResult:
         container_id = self.config["clp_json"]["container_id"]
         search_script_path = self.config["clp_json"]["search_script_path"]
-        queries = self.config["clp_json"]["queries"]
-        for query in queries:
-            command = f"docker exec {container_id} {search_script_path} '{query}'"
-            self._execute_query(mode, command)
+        command = f"{search_script_path} '{query}'"
+        return self._execute_query_in_docker(container_id, command)
 
     def launch(self, mode: BenchmarkingMode):
         logger.info("Launching CLP")
         try:
             container_id = self.config["clp_json"]["container_id"]
             launch_script_path = self.config["clp_json"]["launch_script_path"]
-            subprocess.run(
-                ["docker", "exec", container_id, "bash", "-c", f"{launch_script_path}"], check=True
-            )
+            self._exec_in_docker(container_id, f"{launch_script_path}")
             logger.info(f"clp-json launched successfully in container {container_id}")
-        except subprocess.CalledProcessError as e:
+        except DockerExecError as e:
             raise Exception(f"clp-json failed to launch: {e}")
 
     def mid_terminate(self, mode: BenchmarkingMode):
         super().mid_terminate(mode)
         self.terminate(mode)
+        self._clear_os_caches()
 
     def terminate(self, mode: BenchmarkingMode):
         logger.info("Terminating CLP")
         container_id = self.config["clp_json"]["container_id"]
         terminate_script_path = self.config["clp_json"]["terminate_script_path"]
         try:
-            subprocess.run(
-                ["docker", "exec", container_id, "bash", "-c", f"{terminate_script_path}"],
-                check=True,
-            )
-        except subprocess.CalledProcessError as e:
+            self._exec_in_docker(container_id, f"{terminate_script_path}")
+        except DockerExecError as e:
             raise Exception(f"clp-json failed to terminate: {e}")
 
     def _acquire_system_metric_sample(self, metric: BenchmarkingSystemMetric) -> int:
-        container_id = self.config["clp_json"]["container_id"]
         while True:
-            result = subprocess.run(
-                [
-                    "docker",
-                    "exec",
-                    container_id,
-                    "bash",
-                    "-c",
-                    'docker stats $(docker ps --format "{{.Names}}" | grep "^clp-") --no-stream',
-                ],
-                stdout=subprocess.PIPE,
-            )
-            output = result.stdout.decode("utf-8").strip().split("\n")
-            if len(output) > 1:
+            clp_container_ids = self._get_container_ids()
+            if clp_container_ids:
                 break
             else:
-                logger.info("Cannot get output of docker stats, try again")
+                logger.info("Cannot find clp-json containers, try again")
+                time.sleep(1)
         metric_sample = 0
-        for line in output[1:]:
-            metric_sample += self._get_mem_usage_from_docker_stats(line)
+        for clp_container_id in clp_container_ids:
+            stats = self._docker_client.get_stats(clp_container_id)
+            metric_sample += self._docker_client.get_memory_usage(stats) / 1024
         return metric_sample
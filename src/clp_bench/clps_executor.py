@@ -1,8 +1,16 @@
 import logging
 import subprocess
 import time
+from typing import Dict, List, Optional
 
-from .executor import BenchmarkingMode, BenchmarkingSystemMetric, CPTExecutorBase
+from .docker_client import DockerExecError
+from .executor import (
+    BenchmarkingMode,
+    BenchmarkingSystemMetric,
+    CPTExecutorBase,
+    IngestScalingResult,
+    QueryExecutionResult,
+)
 
 # Retrive logger
 logger = logging.getLogger(__name__)
@@ -49,45 +57,83 @@ class CPTExecutorCLPS(CPTExecutorBase):
             result = subprocess.run(
                 ["du", dataset_path, "-c", "-b"], stdout=subprocess.PIPE, check=True
             )
-            decompressed_size_mb = (
-                int(result.stdout.decode("utf-8").split("\n")[-2].split()[0].strip()) / 1024 / 1024
+            decompressed_size = int(
+                result.stdout.decode("utf-8").split("\n")[-2].split()[0].strip()
             )
-            self.benchmarking_reseults[mode].decompressed_size = f"{decompressed_size_mb:.2f}MB"
+            self.benchmarking_reseults[mode].decompressed_size = decompressed_size
             start_ts = time.perf_counter_ns()
-            command = f"docker exec {container_id} {binary_path} c --timestamp-key 't.$date' --target-encoded-size 268435456 {data_path} {dataset_path}"
-            subprocess.run(
-                command,
-                shell=True,
-                check=True,
-            )
+            command = f"{binary_path} c --timestamp-key 't.$date' --target-encoded-size 268435456 {data_path} {dataset_path}"
+            self._exec_in_docker(container_id, command)
             end_ts = time.perf_counter_ns()
-            elapsed_time = (end_ts - start_ts) / 1e9
-            self.benchmarking_reseults[mode].ingest_e2e_latency = f"{elapsed_time:.9f}s"
+            self.benchmarking_reseults[mode].ingest_e2e_latency = end_ts - start_ts
             result = subprocess.run(
                 ["du", data_path, "-c", "-b"], stdout=subprocess.PIPE, check=True
             )
-            compressed_size_mb = (
-                int(result.stdout.decode("utf-8").split("\n")[-2].split()[0].strip()) / 1024 / 1024
-            )
-            self.benchmarking_reseults[mode].compressed_size = f"{compressed_size_mb:.2f}MB"
-            self.benchmarking_reseults[mode].ratio = f"{decompressed_size_mb / compressed_size_mb}x"
-        except subprocess.CalledProcessError as e:
+            compressed_size = int(result.stdout.decode("utf-8").split("\n")[-2].split()[0].strip())
+            self.benchmarking_reseults[mode].compressed_size = compressed_size
+            self.benchmarking_reseults[mode].ratio = decompressed_size / compressed_size
+        except (subprocess.CalledProcessError, DockerExecError) as e:
             raise Exception(f"clp-s failed to compress data: {e}")
 
+    def _ingest_with_workers(self, nr_workers: int) -> IngestScalingResult:
+        container_id = self.config["clp_s"]["container_id"]
+        binary_path = self.config["clp_s"]["binary_path"]
+        data_path = self.config["clp_s"]["data_path"]
+        dataset_path = self.config["clp_s"]["dataset_path"]
+        try:
+            return self._ingest_shards_in_docker(
+                container_id,
+                dataset_path,
+                data_path,
+                nr_workers,
+                lambda archive_path, file_paths: [
+                    binary_path,
+                    "c",
+                    "--timestamp-key",
+                    "t.$date",
+                    "--target-encoded-size",
+                    "268435456",
+                    archive_path,
+                    *file_paths,
+                ],
+            )
+        except DockerExecError as e:
+            raise Exception(f"clp-s failed to compress data with {nr_workers} workers: {e}")
+
     def run_query_benchmark(self, mode: BenchmarkingMode):
         super().run_query_benchmark(mode)
         logger.info("Running query benchmark for clp-s")
+        queries = self._get_queries()
+        for query in queries:
+            self._run_query_trials(mode, query)
+
+    def _get_container_ids(self) -> List[str]:
+        return [self.config["clp_s"]["container_id"]]
+
+    def _get_tool_config(self) -> Optional[Dict]:
+        return self.config["clp_s"]
+
+    def _get_queries(self) -> List[str]:
+        return self.config["clp_s"]["queries"]
+
+    def _run_empty_query(self) -> Optional[QueryExecutionResult]:
+        container_id = self.config["clp_s"]["container_id"]
+        return self._execute_query_in_docker(container_id, "true")
+
+    def _run_query(self, query: str) -> QueryExecutionResult:
         container_id = self.config["clp_s"]["container_id"]
         binary_path = self.config["clp_s"]["binary_path"]
         data_path = self.config["clp_s"]["data_path"]
-        queries = self.config["clp_s"]["queries"]
-        for query in queries:
-            command = f"docker exec {container_id} {binary_path} s {data_path} '{query}'"
-            self._execute_query(mode, command)
+        command = f"{binary_path} s {data_path} '{query}'"
+        return self._execute_query_in_docker(container_id, command)
 
     def mid_terminate(self, mode: BenchmarkingMode):
         super().mid_terminate(mode)
         self.terminate(mode)
+        self._clear_os_caches()
+
+    def _get_archive_paths(self) -> List[str]:
+        return [self.config["clp_s"]["data_path"]]
 
     def launch(self, mode: BenchmarkingMode):
         logger.info("Launching clp-s")
@@ -102,12 +148,6 @@ class CPTExecutorCLPS(CPTExecutorBase):
         data_path = self.config["clp_s"]["data_path"]
         container_id = self.config["clp_s"]["container_id"]
         try:
-            command = f"docker exec {container_id} ps aux"
-            result = subprocess.run(command, stdout=subprocess.PIPE, shell=True, check=True)
-            output = result.stdout.decode("utf-8").strip().split("\n")
-            for line in output:
-                if binary_path in line and data_path in line:
-                    return int(line.strip().split()[5])
-            return 0
-        except subprocess.CalledProcessError:
+            return self._get_rss_from_ps_in_docker(container_id, [binary_path, data_path])
+        except DockerExecError:
             raise Exception("clp-s failed to get mem usage info")
@@ -0,0 +1,356 @@
+import argparse
+import json
+import logging
+import statistics
+import urllib.request
+from typing import Dict, List, Optional
+
+from .executor import BenchmarkingMode, BenchmarkingStage, RESULT_SCHEMA_VERSION
+from .stats import get_min_mann_whitney_p_value, mann_whitney_u
+
+# Retrive logger
+logger = logging.getLogger(__name__)
+
+# The mode of each `--mode` choice, matching the UI backend's `metric` of hot-run and cold-run
+COMPARED_MODES: Dict[str, BenchmarkingMode] = {
+    "hot": BenchmarkingMode.HOT_RUN_MODE,
+    "cold": BenchmarkingMode.COLD_RUN_MODE,
+    "query-only": BenchmarkingMode.QUERY_ONLY_RUN_MODE,
+}
+
+
+class ComparedResult:
+    """
+    A result set to compare, loaded from an exported result file or a run of the UI backend.
+    """
+
+    def __init__(self, label: str):
+        self.label: str = label
+        # None where the query is unknown, i.e., for runs of the UI backend
+        self.queries: List[Optional[str]] = []
+        # Every measured run of each query
+        self.query_latencies: List[List[float]] = []  # Unit: second
+        self.ingest_e2e_latency: Optional[float] = None  # Unit: second
+        self.compressed_size: Optional[int] = None  # Unit: byte
+        self.avg_ingest_mem: Optional[int] = None  # Unit: byte
+        self.avg_query_mem: Optional[int] = None  # Unit: byte
+
+
+class MetricComparison:
+    """
+    The comparison of a metric, where lower is better, between the baseline and the candidate.
+    """
+
+    REGRESSION = "regression"
+    IMPROVEMENT = "improvement"
+    UNCHANGED = "unchanged"
+    UNAVAILABLE = "n/a"
+
+    def __init__(
+        self,
+        name: str,
+        baseline: Optional[float],
+        candidate: Optional[float],
+        threshold: float,
+        p_value: Optional[float] = None,
+        alpha: Optional[float] = None,
+    ):
+        self.name = name
+        self.baseline = baseline
+        self.candidate = candidate
+        self.threshold = threshold
+        self.p_value = p_value
+        self.relative_change: Optional[float] = None
+        if baseline is None or candidate is None or 0 == baseline:
+            self.verdict = MetricComparison.UNAVAILABLE
+            return
+        self.relative_change = (candidate - baseline) / baseline
+        # A change within the threshold, or not statistically significant, is noise
+        if abs(self.relative_change) <= threshold or (
+            p_value is not None and alpha is not None and alpha <= p_value
+        ):
+            self.verdict = MetricComparison.UNCHANGED
+        elif 0 < self.relative_change:
+            self.verdict = MetricComparison.REGRESSION
+        else:
+            self.verdict = MetricComparison.IMPROVEMENT
+
+    def __str__(self) -> str:
+        if MetricComparison.UNAVAILABLE == self.verdict:
+            return f"{self.name}: {self.verdict}"
+        description = (
+            f"{self.name}: {self.baseline:.9g} -> {self.candidate:.9g}"
+            f" ({self.relative_change:+.2%}, threshold {self.threshold:.2%}"
+        )
+        if self.p_value is not None:
+            description += f", p={self.p_value:.4g}"
+        return f"{description}) {self.verdict}"
+
+
+def _get_average_memory(memory_result: Dict, stage: BenchmarkingStage) -> Optional[int]:
+    """
+    Returns the average memory usage, in bytes, of `stage` in an exported memory result, computed as
+    `SystemMetricResult.get_stage_average` does.
+    """
+    samples = [
+        sample["value"]
+        for sample in memory_result["stages"][stage.value]["samples"]
+        if 0 < sample["value"]
+    ]
+    if not samples:
+        return None
+    average = statistics.mean(samples)
+    if -1 != memory_result["baseline"]:
+        average -= memory_result["baseline"]
+    # Unit: KB
+    return int(average) * 1024
+
+
+def load_exported_result(path: str, mode: BenchmarkingMode) -> ComparedResult:
+    """
+    Loads the result of `mode` from a file written by `CPTExecutorBase.export_results`.
+    """
+    with open(path, "r") as result_file:
+        document = json.load(result_file)
+    if RESULT_SCHEMA_VERSION != document.get("schema_version"):
+        raise Exception(
+            f"{path} has schema version {document.get('schema_version')}, expected"
+            f" {RESULT_SCHEMA_VERSION}"
+        )
+    for result in document["results"]:
+        if mode.value == result["mode"]:
+            break
+    else:
+        raise Exception(f"{path} has no result of {mode.value} mode")
+    compared_result = ComparedResult(f"{document['target']}@{document['created_at']}")
+    for trial in result["query_trials"]:
+        compared_result.queries.append(trial["query"])
+        compared_result.query_latencies.append(
+            [execution["latency_ns"] / 1e9 for execution in trial["executions"]]
+        )
+    if result["ingest_e2e_latency_ns"] is not None:
+        compared_result.ingest_e2e_latency = result["ingest_e2e_latency_ns"] / 1e9
+    compared_result.compressed_size = result["compressed_size_bytes"]
+    memory_result = result["system_metrics"]["memory"]
+    compared_result.avg_ingest_mem = _get_average_memory(memory_result, BenchmarkingStage.INGEST)
+    compared_result.avg_query_mem = _get_average_memory(
+        memory_result, BenchmarkingStage.RUN_QUERY_BENCHMARK
+    )
+    return compared_result
+
+
+def load_published_run(url: str, run_id: int) -> ComparedResult:
+    """
+    Loads a run, with every latency sample, from the UI backend at `url`.
+    """
+    with urllib.request.urlopen(f"{url.rstrip('/')}/api/runs/{run_id}") as response:
+        run = json.loads(response.read().decode("utf-8"))["payload"]
+    compared_result = ComparedResult(f"{run['target']}@{run['created_at']} (run {run_id})")
+    for samples in run["query_latencies"]:
+        compared_result.queries.append(None)
+        # Unit: ms
+        compared_result.query_latencies.append([latency / 1e3 for latency in samples])
+    if run["ingest_time"] is not None:
+        # Unit: ms
+        compared_result.ingest_e2e_latency = run["ingest_time"] / 1e3
+    compared_result.compressed_size = run["compressed_size"]
+    compared_result.avg_ingest_mem = run["avg_ingest_mem"]
+    compared_result.avg_query_mem = run["avg_query_mem"]
+    return compared_result
+
+
+def compare_results(
+    baseline: ComparedResult,
+    candidate: ComparedResult,
+    alpha: float,
+    latency_threshold: float,
+    ingest_threshold: float,
+    size_threshold: float,
+    memory_threshold: float,
+) -> List[MetricComparison]:
+    """
+    Compares every query, the ingest latency, the compressed size, and the average memory usage.
+    Query latencies are compared by their medians, and a change only counts if the Mann-Whitney U
+    test on the repeated samples finds it significant at `alpha`. If there are too few samples for
+    the test to ever reach `alpha`, only the threshold applies, as for the other metrics, which have
+    a single value per run.
+    """
+    if len(baseline.query_latencies) != len(candidate.query_latencies):
+        logger.warning(
+            f"The baseline has {len(baseline.query_latencies)} queries but the candidate has"
+            f" {len(candidate.query_latencies)}, only the common ones are compared"
+        )
+    comparisons = []
+    for i in range(min(len(baseline.query_latencies), len(candidate.query_latencies))):
+        baseline_query = baseline.queries[i]
+        candidate_query = candidate.queries[i]
+        if None not in (baseline_query, candidate_query) and baseline_query != candidate_query:
+            logger.warning(f"No.{i} query differs: {baseline_query} vs {candidate_query}")
+        baseline_latencies = baseline.query_latencies[i]
+        candidate_latencies = candidate.query_latencies[i]
+        if not baseline_latencies or not candidate_latencies:
+            comparisons.append(
+                MetricComparison(f"No.{i} query latency (s)", None, None, latency_threshold)
+            )
+            continue
+        p_value: Optional[float] = None
+        if alpha < get_min_mann_whitney_p_value(len(baseline_latencies), len(candidate_latencies)):
+            logger.warning(
+                f"Too few samples to test No.{i} query's latency at alpha {alpha}"
+                f" ({len(baseline_latencies)} vs {len(candidate_latencies)}), only its threshold"
+                " applies"
+            )
+        else:
+            _, p_value = mann_whitney_u(baseline_latencies, candidate_latencies)
+        comparisons.append(
+            MetricComparison(
+                f"No.{i} query latency (s)",
+                statistics.median(baseline_latencies),
+                statistics.median(candidate_latencies),
+                latency_threshold,
+                p_value,
+                alpha,
+            )
+        )
+    comparisons.append(
+        MetricComparison(
+            "ingest e2e latency (s)",
+            baseline.ingest_e2e_latency,
+            candidate.ingest_e2e_latency,
+            ingest_threshold,
+        )
+    )
+    comparisons.append(
+        MetricComparison(
+            "compressed size (B)",
+            baseline.compressed_size,
+            candidate.compressed_size,
+            size_threshold,
+        )
+    )
+    comparisons.append(
+        MetricComparison(
+            "average ingest memory (B)",
+            baseline.avg_ingest_mem,
+            candidate.avg_ingest_mem,
+            memory_threshold,
+        )
+    )
+    comparisons.append(
+        MetricComparison(
+            "average query memory (B)",
+            baseline.avg_query_mem,
+            candidate.avg_query_mem,
+            memory_threshold,
+        )
+    )
+    return comparisons
+
+
+def _load_compared_result(
+    source: str, url: Optional[str], mode: BenchmarkingMode
+) -> ComparedResult:
+    if source.isdigit():
+        if url is None:
+            raise Exception(f"--url is required to load run {source} from the UI backend")
+        return load_published_run(url, int(source))
+    return load_exported_result(source, mode)
+
+
+def compare_main(argv: List[str]) -> int:
+    """
+    Entry of `clp-bench compare`. Returns 1 if any metric regresses, so nightly jobs can fail on it,
+    2 if the results cannot be loaded, otherwise 0.
+    """
+    parser = argparse.ArgumentParser(
+        prog="clp-bench compare",
+        description="Compare two benchmarking results and detect regressions.",
+    )
+    parser.add_argument(
+        "baseline",
+        type=str,
+        help="The baseline: an exported result file, or a run ID of the UI backend",
+    )
+    parser.add_argument(
+        "candidate",
+        type=str,
+        help="The candidate: an exported result file, or a run ID of the UI backend",
+    )
+    parser.add_argument(
+        "-u",
+        "--url",
+        type=str,
+        default=None,
+        help="The UI backend's URL (including its base path) to load runs from",
+    )
+    parser.add_argument(
+        "-m",
+        "--mode",
+        type=str,
+        choices=list(COMPARED_MODES),
+        default="hot",
+        help="The benchmarking mode to compare in exported result files",
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.05,
+        help="The significance level of the Mann-Whitney U test on query latencies",
+    )
+    parser.add_argument(
+        "--latency-threshold",
+        type=float,
+        default=0.05,
+        help="The relative change of a query's median latency to report",
+    )
+    parser.add_argument(
+        "--ingest-threshold",
+        type=float,
+        default=0.1,
+        help="The relative change of the ingest latency to report",
+    )
+    parser.add_argument(
+        "--size-threshold",
+        type=float,
+        default=0.01,
+        help="The relative change of the compressed size to report",
+    )
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=0.1,
+        help="The relative change of the average memory usage to report",
+    )
+    args = parser.parse_args(argv)
+
+    mode = COMPARED_MODES[args.mode]
+    try:
+        baseline = _load_compared_result(args.baseline, args.url, mode)
+        candidate = _load_compared_result(args.candidate, args.url, mode)
+    except Exception as e:
+        logger.error(f"Failed to load results: {e}")
+        return 2
+    logger.info(f"Baseline: {baseline.label}")
+    logger.info(f"Candidate: {candidate.label}")
+
+    comparisons = compare_results(
+        baseline,
+        candidate,
+        args.alpha,
+        args.latency_threshold,
+        args.ingest_threshold,
+        args.size_threshold,
+        args.memory_threshold,
+    )
+    regressions = []
+    for comparison in comparisons:
+        if MetricComparison.REGRESSION == comparison.verdict:
+            logger.error(str(comparison))
+            regressions.append(comparison)
+        else:
+            logger.info(str(comparison))
+    if regressions:
+        logger.error(f"{len(regressions)} of {len(comparisons)} metrics regressed")
+        return 1
+    logger.info("No regression")
+    return 0
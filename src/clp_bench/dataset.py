@@ -0,0 +1,117 @@
+import glob
+import logging
+import math
+import os
+import shutil
+from typing import List, Tuple
+
+# Retrive logger
+logger = logging.getLogger(__name__)
+
+# Size of each read when copying a dataset's files
+COPY_BUFFER_SIZE = 1 << 20
+
+# How far above its fraction a subset of whole files may be, relative to the fraction's size
+FILE_SPLIT_TOLERANCE = 0.1
+
+
+def is_glob_pattern(dataset_path: str) -> bool:
+    return any(character in dataset_path for character in "*?[")
+
+
+def list_dataset_files(dataset_path: str) -> List[Tuple[str, int]]:
+    """
+    Returns the path and size, in bytes, of each file of a dataset, sorted by path so that subsets
+    are deterministic. The dataset is a file, a directory, or a glob pattern of files.
+    """
+    if is_glob_pattern(dataset_path):
+        file_paths = [path for path in glob.glob(dataset_path) if os.path.isfile(path)]
+    elif os.path.isfile(dataset_path):
+        file_paths = [dataset_path]
+    else:
+        file_paths = []
+        for root, _, file_names in os.walk(dataset_path):
+            for file_name in file_names:
+                file_paths.append(os.path.join(root, file_name))
+    return [(file_path, os.path.getsize(file_path)) for file_path in sorted(file_paths)]
+
+
+def _copy_line_prefix(source_path: str, target_path: str, size: int) -> None:
+    """
+    Copies the first `size` bytes of `source_path`, extended to the end of the last line.
+    """
+    with open(source_path, "rb") as source_file, open(target_path, "wb") as target_file:
+        remaining_size = size
+        data = b""
+        while 0 < remaining_size:
+            data = source_file.read(min(COPY_BUFFER_SIZE, remaining_size))
+            if not data:
+                return
+            target_file.write(data)
+            remaining_size -= len(data)
+        if data and not data.endswith(b"\n"):
+            target_file.write(source_file.readline())
+
+
+def _link_file(source_path: str, target_path: str) -> None:
+    """
+    Hard links `source_path` at `target_path`, or symlinks it if they are on different file systems,
+    so that whole files of a dataset are not duplicated.
+    """
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        os.symlink(os.path.abspath(source_path), target_path)
+
+
+def create_dataset_subset(
+    dataset_path: str, fraction: float, split: str, subset_path: str
+) -> Tuple[str, int]:
+    """
+    Writes a deterministic subset of `fraction` of a dataset into the directory `subset_path`, and
+    returns the path to ingest it from (in the same form as `dataset_path`, i.e., a file, a
+    directory, or a glob pattern) along with its size in bytes. With `split` being `file`, the
+    subset is the smallest prefix of the files (sorted by path) reaching `fraction` of the dataset;
+    with `line`, it is the prefix of `fraction` of each file, ending at a line boundary. Whole files
+    are linked rather than copied. If no prefix of the files is within `FILE_SPLIT_TOLERANCE` of
+    `fraction` (e.g., for a single file), the split falls back to `line`.
+    """
+    if split not in ("file", "line"):
+        raise Exception(f"Unknown dataset split: {split}")
+    files = list_dataset_files(dataset_path)
+    if not files:
+        raise Exception(f"No file in dataset {dataset_path}")
+    target_size = fraction * sum(file_size for _, file_size in files)
+    nr_prefix_files = 0
+    if "file" == split:
+        prefix_size = 0
+        while prefix_size < target_size and nr_prefix_files < len(files):
+            prefix_size += files[nr_prefix_files][1]
+            nr_prefix_files += 1
+        if (1 + FILE_SPLIT_TOLERANCE) * target_size < prefix_size:
+            logger.warning(
+                f"The smallest prefix of whole files reaching {fraction:.2%} of the dataset is"
+                f" {prefix_size / (target_size / fraction):.2%} of it, splitting by line instead"
+            )
+            split = "line"
+    if os.path.exists(subset_path):
+        shutil.rmtree(subset_path)
+    os.makedirs(subset_path)
+    subset_size = 0
+    subset_file_paths = []
+    for i, (file_path, file_size) in enumerate(files):
+        # Prefixed with the file's index to keep the order, as the files are flattened
+        subset_file_path = os.path.join(subset_path, f"{i:06d}-{os.path.basename(file_path)}")
+        if "file" == split:
+            if nr_prefix_files <= i:
+                break
+            _link_file(file_path, subset_file_path)
+        else:
+            _copy_line_prefix(file_path, subset_file_path, math.ceil(file_size * fraction))
+        subset_size += os.path.getsize(subset_file_path)
+        subset_file_paths.append(subset_file_path)
+    if os.path.isfile(dataset_path):
+        return subset_file_paths[0], subset_size
+    if is_glob_pattern(dataset_path):
+        return os.path.join(subset_path, "*"), subset_size
+    return subset_path, subset_size
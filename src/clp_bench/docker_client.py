@@ -0,0 +1,269 @@
+import http.client
+import json
+import logging
+import queue
+import socket
+import struct
+import time
+import urllib.parse
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+# Retrive logger
+logger = logging.getLogger(__name__)
+
+# Stream types of the multiplexed stream of an exec without TTY
+STDOUT_STREAM = 1
+STDERR_STREAM = 2
+
+
+class DockerExecError(Exception):
+    """
+    Raised when a command executed in a container exits with a non-zero code.
+    """
+
+    def __init__(self, container_id: str, cmd: List[str], exit_code: int, stderr: bytes):
+        super().__init__(
+            f"{cmd} exited with {exit_code} in container {container_id}:"
+            f" {stderr.decode('utf-8', errors='replace').strip()}"
+        )
+        self.exit_code = exit_code
+        self.stderr = stderr
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    An HTTP connection over a unix domain socket.
+    """
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerClient:
+    """
+    A minimal client of the Docker Engine API over `/var/run/docker.sock`. Keep-alive connections
+    are pooled and shared by threads, so a call costs a request on an open connection rather than
+    starting a `docker` CLI process.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = "/var/run/docker.sock",
+        api_version: str = "v1.41",
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.socket_path = socket_path
+        self.api_version = api_version
+        self.timeout = timeout
+        self.__idle_connections: "queue.LifoQueue[UnixHTTPConnection]" = queue.LifoQueue()
+
+    def __acquire_connection(self) -> Tuple[UnixHTTPConnection, bool]:
+        """
+        Returns an idle connection, or a new one if none is idle, and whether it is an idle one.
+        """
+        try:
+            return self.__idle_connections.get_nowait(), True
+        except queue.Empty:
+            return UnixHTTPConnection(self.socket_path, self.timeout), False
+
+    def __release_connection(
+        self, connection: UnixHTTPConnection, response: http.client.HTTPResponse
+    ) -> None:
+        if response.will_close:
+            connection.close()
+        else:
+            self.__idle_connections.put(connection)
+
+    def __send(
+        self, method: str, path: str, body: Optional[Union[Dict[str, Any], bytes]] = None
+    ) -> Tuple[UnixHTTPConnection, http.client.HTTPResponse]:
+        headers = {}
+        encoded_body = None
+        if isinstance(body, bytes):
+            encoded_body = body
+            headers["Content-Type"] = "application/x-tar"
+        elif body is not None:
+            encoded_body = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        url = f"/{self.api_version}{path}"
+        while True:
+            connection, reused = self.__acquire_connection()
+            sent = False
+            try:
+                connection.request(method, url, body=encoded_body, headers=headers)
+                sent = True
+                return connection, connection.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                connection.close()
+                # The daemon may have closed an idle keep-alive connection, in which case the
+                # request is retried on another one. Once sent, a request other than GET may have
+                # taken effect before the connection dropped, so it is not retried.
+                if not reused or (sent and "GET" != method):
+                    raise
+
+    def request(
+        self, method: str, path: str, body: Optional[Union[Dict[str, Any], bytes]] = None
+    ) -> Any:
+        """
+        Sends a request and returns its decoded JSON response, if any. A `bytes` body is sent as a
+        tar archive.
+        """
+        connection, response = self.__send(method, path, body)
+        try:
+            data = response.read()
+        finally:
+            self.__release_connection(connection, response)
+        if 400 <= response.status:
+            raise Exception(
+                f"Docker API {method} {path} failed with {response.status}:"
+                f" {data.decode('utf-8', errors='replace').strip()}"
+            )
+        if not data:
+            return None
+        return json.loads(data)
+
+    def inspect_container(self, container_id: str) -> Dict[str, Any]:
+        return self.request("GET", f"/containers/{urllib.parse.quote(container_id)}/json")
+
+    def list_containers(self, name_pattern: Optional[str] = None) -> List[Dict[str, Any]]:
+        path = "/containers/json"
+        if name_pattern is not None:
+            filters = json.dumps({"name": [name_pattern]})
+            path += f"?filters={urllib.parse.quote(filters)}"
+        return self.request("GET", path)
+
+    def restart_container(self, container_id: str, timeout: int = 10) -> None:
+        self.request("POST", f"/containers/{urllib.parse.quote(container_id)}/restart?t={timeout}")
+
+    def put_archive(self, container_id: str, path: str, archive: bytes) -> None:
+        """
+        Extracts a tar archive into the directory `path` of the container.
+        """
+        self.request(
+            "PUT",
+            f"/containers/{urllib.parse.quote(container_id)}/archive"
+            f"?path={urllib.parse.quote(path)}",
+            archive,
+        )
+
+    def exec_stream(self, container_id: str, cmd: List[str]) -> Iterator[Tuple[int, bytes]]:
+        """
+        Executes `cmd` in the container and yields `(stream type, data)` chunks of its output as
+        they arrive. Raises DockerExecError at the end if the command exits with a non-zero code.
+        """
+        exec_instance = self.request(
+            "POST",
+            f"/containers/{urllib.parse.quote(container_id)}/exec",
+            {"Cmd": cmd, "AttachStdout": True, "AttachStderr": True, "Tty": False},
+        )
+        exec_id = exec_instance["Id"]
+        connection, response = self.__send(
+            "POST", f"/exec/{exec_id}/start", {"Detach": False, "Tty": False}
+        )
+        stderr_tail = b""
+        try:
+            if 400 <= response.status:
+                raise Exception(
+                    f"Docker API failed to start exec in container {container_id}:"
+                    f" {response.read().decode('utf-8', errors='replace').strip()}"
+                )
+            while True:
+                header = response.read(8)
+                if len(header) < 8:
+                    break
+                stream_type, size = struct.unpack(">BxxxL", header)
+                data = response.read(size)
+                if STDERR_STREAM == stream_type:
+                    stderr_tail = (stderr_tail + data)[-4096:]
+                yield stream_type, data
+        finally:
+            # The connection is hijacked for the raw stream, so it cannot be reused
+            connection.close()
+        exit_code = self.__wait_for_exec_exit_code(exec_id)
+        if 0 != exit_code:
+            raise DockerExecError(container_id, cmd, exit_code, stderr_tail)
+
+    def __wait_for_exec_exit_code(self, exec_id: str) -> int:
+        while True:
+            exec_state = self.request("GET", f"/exec/{exec_id}/json")
+            if not exec_state["Running"]:
+                return exec_state["ExitCode"]
+            time.sleep(0.01)
+
+    def exec_run(self, container_id: str, cmd: List[str]) -> Tuple[bytes, bytes]:
+        """
+        Executes `cmd` in the container and returns its stdout and stderr. Raises DockerExecError if
+        the command exits with a non-zero code.
+        """
+        stdout_chunks = []
+        stderr_chunks = []
+        for stream_type, data in self.exec_stream(container_id, cmd):
+            if STDOUT_STREAM == stream_type:
+                stdout_chunks.append(data)
+            else:
+                stderr_chunks.append(data)
+        return b"".join(stdout_chunks), b"".join(stderr_chunks)
+
+    def test_path(self, container_id: str, path: str, flag: str = "-e") -> bool:
+        """
+        Returns whether `test <flag> <path>` succeeds in the container, e.g., `-f` for files and
+        `-d` for directories.
+        """
+        try:
+            self.exec_run(container_id, ["test", flag, path])
+            return True
+        except DockerExecError:
+            return False
+
+    def get_stats(self, container_id: str) -> Dict[str, Any]:
+        """
+        Returns a single stats snapshot of the container without waiting for a second CPU sample.
+        """
+        return self.request(
+            "GET",
+            f"/containers/{urllib.parse.quote(container_id)}/stats?stream=false&one-shot=true",
+        )
+
+    def stream_stats(self, container_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Yields a stats snapshot of the container about every second, until the caller stops.
+        """
+        connection, response = self.__send(
+            "GET", f"/containers/{urllib.parse.quote(container_id)}/stats?stream=true"
+        )
+        try:
+            if 400 <= response.status:
+                raise Exception(
+                    f"Docker API failed to stream stats of container {container_id}:"
+                    f" {response.read().decode('utf-8', errors='replace').strip()}"
+                )
+            while True:
+                line = response.readline()
+                if not line:
+                    break
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def get_memory_usage(stats: Dict[str, Any]) -> int:
+        """
+        Returns the memory usage in bytes from a stats snapshot, computed like `docker stats` does,
+        i.e., excluding inactive page cache.
+        """
+        memory_stats = stats.get("memory_stats", {})
+        usage = memory_stats.get("usage", 0)
+        detailed_stats = memory_stats.get("stats", {})
+        # cgroup v2 reports `inactive_file`, cgroup v1 reports `total_inactive_file`
+        inactive_file = detailed_stats.get(
+            "inactive_file", detailed_stats.get("total_inactive_file", 0)
+        )
+        return max(0, usage - inactive_file)
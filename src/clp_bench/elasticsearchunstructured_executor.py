@@ -1,8 +1,15 @@
 import logging
 import re
-import subprocess
+from typing import Dict, List, Optional
 
-from .executor import BenchmarkingMode, BenchmarkingSystemMetric, CPTExecutorBase
+from .docker_client import DockerExecError
+from .executor import (
+    BenchmarkingMode,
+    BenchmarkingSystemMetric,
+    CPTExecutorBase,
+    IngestScalingResult,
+    QueryExecutionResult,
+)
 
 # Retrive logger
 logger = logging.getLogger(__name__)
@@ -59,86 +66,120 @@ class CPTExecutorElasticsearchUnstructured(CPTExecutorBase):
         compress_script_path = self.config["elasticsearch"]["compress_script_path"]
         dataset_path = self.config["elasticsearch"]["dataset_path"]
         try:
-            result = subprocess.run(
-                [
-                    "docker",
-                    "exec",
-                    container_id,
-                    "bash",
-                    "-c",
-                    f'python3 {compress_script_path} "{dataset_path}"',
-                ],
-                stderr=subprocess.PIPE,
-                check=True,
-                text=True,
-            )
-            output = result.stderr
+            command = f'python3 {compress_script_path} "{dataset_path}"'
+            _, output = self._exec_in_docker(container_id, command)
             decompressed_size_match = re.search(r"Original size for \S+ is (\d+)", output)
             compressed_size_match = re.search(r"Compressed size for \S+ is (\d+)", output)
             ratio_match = re.search(r"Compression ratio for \S+ is (\d+\.\d+)", output)
             ingest_e2e_match = re.search(r"Ingestion time for \S+ is (\d+\.\d+) s", output)
+            loader_peak_rss_match = re.search(r"Loader peak RSS for \S+ is (\d+)", output)
             if decompressed_size_match:
-                self.benchmarking_reseults[mode].decompressed_size = (
-                    f"{int(decompressed_size_match.group(1)) / 1024 / 1024}MB"
+                self.benchmarking_reseults[mode].decompressed_size = int(
+                    decompressed_size_match.group(1)
                 )
                 logger.info(
-                    f"File size before compression: {self.benchmarking_reseults[mode].decompressed_size}"
+                    f"File size before compression: {self.benchmarking_reseults[mode].decompressed_size}B"
                 )
             else:
                 logger.error("Cannot get decompressed metric")
             if compressed_size_match:
-                self.benchmarking_reseults[mode].compressed_size = (
-                    f"{int(compressed_size_match.group(1)) / 1024 / 1024}MB"
+                self.benchmarking_reseults[mode].compressed_size = int(
+                    compressed_size_match.group(1)
                 )
                 logger.info(
-                    f"File size after compression: {self.benchmarking_reseults[mode].compressed_size}"
+                    f"File size after compression: {self.benchmarking_reseults[mode].compressed_size}B"
                 )
             else:
                 logger.error("Cannot get compressed metric")
             if ratio_match:
-                self.benchmarking_reseults[mode].ratio = f"{ratio_match.group(1)}x"
-                logger.info(f"Compression ratio: {self.benchmarking_reseults[mode].ratio}")
+                self.benchmarking_reseults[mode].ratio = float(ratio_match.group(1))
+                logger.info(f"Compression ratio: {self.benchmarking_reseults[mode].ratio}x")
             else:
                 logger.error("Cannot get compression ratio metric")
             if ingest_e2e_match:
-                self.benchmarking_reseults[mode].ingest_e2e_latency = (
-                    f"{ingest_e2e_match.group(1)}s"
+                self.benchmarking_reseults[mode].ingest_e2e_latency = int(
+                    float(ingest_e2e_match.group(1)) * 1e9
                 )
                 logger.info(
                     f"Elasticsearch compressed data in {dataset_path} successfully in {ingest_e2e_match.group(1)} seconds"
                 )
             else:
                 logger.error("Cannot get ingest end-to-end latency metric")
-        except subprocess.CalledProcessError as e:
+            if loader_peak_rss_match:
+                self.benchmarking_reseults[mode].loader_peak_rss = int(
+                    loader_peak_rss_match.group(1)
+                )
+                logger.info(f"Loader peak RSS: {self.benchmarking_reseults[mode].loader_peak_rss}B")
+        except DockerExecError as e:
             raise Exception(f"Elasticsearch failed to compress data: {e}")
 
+    def _ingest_with_workers(self, nr_workers: int) -> IngestScalingResult:
+        container_id = self.config["elasticsearch"]["container_id"]
+        compress_script_path = self.config["elasticsearch"]["compress_script_path"]
+        dataset_path = self.config["elasticsearch"]["dataset_path"]
+        scaling_result = IngestScalingResult(nr_workers)
+        try:
+            # The compress script recreates the index, and loads it with `nr_workers` bulk clients
+            command = f'python3 {compress_script_path} "{dataset_path}" {nr_workers}'
+            _, output = self._exec_in_docker(container_id, command)
+        except DockerExecError as e:
+            raise Exception(f"Elasticsearch failed to compress data with {nr_workers} clients: {e}")
+        decompressed_size_match = re.search(r"Original size for \S+ is (\d+)", output)
+        compressed_size_match = re.search(r"Compressed size for \S+ is (\d+)", output)
+        ingest_e2e_match = re.search(r"Ingestion time for \S+ is (\d+\.\d+) s", output)
+        if not decompressed_size_match or not ingest_e2e_match:
+            raise Exception(f"Cannot get ingest metrics with {nr_workers} clients")
+        scaling_result.decompressed_size = int(decompressed_size_match.group(1))
+        scaling_result.elapsed_time = float(ingest_e2e_match.group(1))
+        if compressed_size_match:
+            scaling_result.compressed_size = int(compressed_size_match.group(1))
+        return scaling_result
+
     def run_query_benchmark(self, mode: BenchmarkingMode):
         super().run_query_benchmark(mode)
         logger.info("Running query benchmark for Elasticsearch")
+        queries = self._get_queries()
+        for query in queries:
+            self._run_query_trials(mode, query)
+
+    def _get_container_ids(self) -> List[str]:
+        return [self.config["elasticsearch"]["container_id"]]
+
+    def _get_tool_config(self) -> Optional[Dict]:
+        return self.config["elasticsearch"]
+
+    def _get_queries(self) -> List[str]:
+        return self.config["elasticsearch"]["queries"]
+
+    def _run_empty_query(self) -> Optional[QueryExecutionResult]:
+        container_id = self.config["elasticsearch"]["container_id"]
+        return self._execute_query_in_docker(container_id, "true")
+
+    def _run_query(self, query: str) -> QueryExecutionResult:
         container_id = self.config["elasticsearch"]["container_id"]
         search_script_path = self.config["elasticsearch"]["search_script_path"]
-        queries = self.config["elasticsearch"]["queries"]
-        for query in queries:
-            command = f"docker exec {container_id} python3 {search_script_path} '{query}'"
-            self._execute_query(mode, command)
+        command = f"python3 {search_script_path} '{query}'"
+        return self._execute_query_in_docker(container_id, command)
 
     def mid_terminate(self, mode: BenchmarkingMode):
         super().mid_terminate(mode)
         self.terminate(mode)
+        self._clear_os_caches()
+
+    def _run_count_query(self, query: str) -> Optional[QueryExecutionResult]:
+        container_id = self.config["elasticsearch"]["container_id"]
+        search_script_path = self.config["elasticsearch"]["search_script_path"]
+        command = f"python3 {search_script_path} '{query}' --count"
+        return self._execute_count_query_in_docker(container_id, command)
 
     def launch(self, mode: BenchmarkingMode):
         logger.info("Launching Elasticsearch")
         try:
             container_id = self.config["elasticsearch"]["container_id"]
             launch_script_path = self.config["elasticsearch"]["launch_script_path"]
-            subprocess.run(
-                ["docker", "exec", container_id, "bash", "-c", f"bash {launch_script_path}"],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.STDOUT,
-                check=True,
-            )
+            self._exec_in_docker(container_id, f"bash {launch_script_path}")
             logger.info(f"Elasticsearch launched successfully in container {container_id}")
-        except subprocess.CalledProcessError as e:
+        except DockerExecError as e:
             raise Exception(f"Elasticsearch failed to launch: {e}")
 
     def terminate(self, mode: BenchmarkingMode):
@@ -146,11 +187,8 @@ class CPTExecutorElasticsearchUnstructured(CPTExecutorBase):
         try:
             container_id = self.config["elasticsearch"]["container_id"]
             terminate_script_path = self.config["elasticsearch"]["terminate_script_path"]
-            subprocess.run(
-                ["docker", "exec", container_id, "bash", "-c", f"bash {terminate_script_path}"],
-                check=True,
-            )
-        except subprocess.CalledProcessError as e:
+            self._exec_in_docker(container_id, f"bash {terminate_script_path}")
+        except DockerExecError as e:
             raise Exception(f"Elasticsearch failed to terminate: {e}")
 
     # def _acquire_system_metric_sample(self, metric: BenchmarkingSystemMetric) -> int:
@@ -178,13 +216,6 @@ class CPTExecutorElasticsearchUnstructured(CPTExecutorBase):
     def _acquire_system_metric_sample(self, metric: BenchmarkingSystemMetric) -> int:
         container_id = self.config["elasticsearch"]["container_id"]
         try:
-            command = f"docker exec {container_id} ps aux"
-            result = subprocess.run(command, stdout=subprocess.PIPE, shell=True, check=True)
-            output = result.stdout.decode("utf-8").strip().split("\n")
-            metric = 0
-            for line in output:
-                if "/usr/share/elasticsearch" in line:
-                    metric += int(line.strip().split()[5])
-            return metric
-        except subprocess.CalledProcessError:
+            return self._get_rss_from_ps_in_docker(container_id, ["/usr/share/elasticsearch"])
+        except DockerExecError:
             raise Exception("Elasticsearch failed to get mem usage info")
@@ -1,17 +1,50 @@
+import datetime
+import heapq
+import io
+import json
 import logging
+import os
+import platform
+import posixpath
+import random
+import resource
+import shlex
+import shutil
+import socket
 import statistics
 import subprocess
+import tarfile
 import threading
 import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Tuple
 
 import yaml
 
+from .cgroup import ContainerCgroup
+from .dataset import create_dataset_subset, list_dataset_files
+from .docker_client import DockerClient, DockerExecError, STDOUT_STREAM
+from .page_cache import drop_os_page_cache, evict_from_page_cache, get_page_cache_residency
+from .stats import fit_power_law, LatencyHistogram, LatencySummary, median_confidence_interval
+from .version import VERSION
+
 # Retrive logger
 logger = logging.getLogger(__name__)
 
+TIMING_AGENT_FILE_NAME = "clp_bench_timing_agent.py"
+
+# Size of each read of a query's stdout on the host
+QUERY_READ_BUFFER_SIZE = 1 << 20
+
+# Version of the layout of exported result files, bumped on incompatible changes
+RESULT_SCHEMA_VERSION = 1
+
+
+def _seconds_to_ns(value: Optional[float]) -> Optional[int]:
+    return None if value is None else int(value * 1e9)
+
 
 class BenchmarkingMode(Enum):
     """
@@ -21,6 +54,11 @@ class BenchmarkingMode(Enum):
     HOT_RUN_MODE = "hot run"
     COLD_RUN_MODE = "cold run"
     QUERY_ONLY_RUN_MODE = "query only run"
+    CONCURRENCY_RUN_MODE = "concurrency run"
+    OPEN_LOOP_RUN_MODE = "open loop run"
+    INTERLEAVED_RUN_MODE = "interleaved run"
+    INGEST_SCALING_RUN_MODE = "ingest scaling run"
+    DATASET_SCALING_RUN_MODE = "dataset scaling run"
 
 
 class BenchmarkingStage(Enum):
@@ -38,22 +76,290 @@ class BenchmarkingSystemMetric(Enum):
     """
 
     MEMORY = ("memory", "KB")
+    CPU = ("cpu", "ms")
+    IO = ("io", "KB")
+
+    @property
+    def is_cumulative(self) -> bool:
+        """
+        Whether samples of the metric are cumulative counters, whose deltas are what matters.
+        """
+        return BenchmarkingSystemMetric.MEMORY != self
+
+
+class QueryExecutionResult:
+    """
+    Outcome of executing a query once.
+    """
+
+    def __init__(self, latency: float, nr_matched_log_lines: int):
+        self.latency: float = latency  # Unit: second
+        self.nr_matched_log_lines: int = nr_matched_log_lines
+        # Only filled when the timing agent measures the latency in the container, in which case
+        # `harness_latency` is the latency measured from the host
+        self.harness_latency: Optional[float] = None  # Unit: second
+        self.user_time: Optional[float] = None  # Unit: second
+        self.system_time: Optional[float] = None  # Unit: second
+        self.max_rss: Optional[int] = None  # Unit: KB
+        # Only filled when the output is read by clp-bench or the timing agent, measured from the
+        # start. The first result is the first complete line.
+        self.nr_output_bytes: Optional[int] = None
+        self.time_to_first_byte: Optional[float] = None  # Unit: second
+        self.time_to_first_result: Optional[float] = None  # Unit: second
+        # Only filled for queries split into sub-queries (e.g., time windows), the sum of their
+        # latencies, which exceeds `latency` when they run concurrently
+        self.summed_latency: Optional[float] = None  # Unit: second
+        # Deltas of cumulative system metric counters across the execution
+        self.system_metric_deltas: Dict[BenchmarkingSystemMetric, Dict[str, int]] = {}
+        self.timestamp: Optional[int] = None  # Unit: nanosecond since the epoch, at the start
+
+    def to_dict(self) -> Dict:
+        return {
+            "timestamp_ns": self.timestamp,
+            "latency_ns": _seconds_to_ns(self.latency),
+            "nr_matched_log_lines": self.nr_matched_log_lines,
+            "harness_latency_ns": _seconds_to_ns(self.harness_latency),
+            "user_time_ns": _seconds_to_ns(self.user_time),
+            "system_time_ns": _seconds_to_ns(self.system_time),
+            "max_rss_kb": self.max_rss,
+            "nr_output_bytes": self.nr_output_bytes,
+            "time_to_first_byte_ns": _seconds_to_ns(self.time_to_first_byte),
+            "time_to_first_result_ns": _seconds_to_ns(self.time_to_first_result),
+            "summed_latency_ns": _seconds_to_ns(self.summed_latency),
+            "system_metric_deltas": {
+                metric.value[0]: deltas for metric, deltas in self.system_metric_deltas.items()
+            },
+        }
+
+
+class QueryOutputCounter:
+    """
+    Counts the lines and bytes of a query's output as it arrives, without decoding it, and records
+    when the first byte and the first complete line arrive.
+    """
+
+    def __init__(self, start_ts: int):
+        self.start_ts: int = start_ts  # Unit: nanosecond, from `time.perf_counter_ns`
+        self.nr_lines: int = 0
+        self.nr_bytes: int = 0
+        self.first_byte_ts: Optional[int] = None
+        self.first_result_ts: Optional[int] = None
+
+    def count(self, data, size: int) -> None:
+        """
+        Counts the first `size` bytes of `data`.
+        """
+        if 0 == size:
+            return
+        if self.first_byte_ts is None:
+            self.first_byte_ts = time.perf_counter_ns()
+        nr_lines = data.count(b"\n", 0, size)
+        if self.first_result_ts is None and 0 < nr_lines:
+            self.first_result_ts = time.perf_counter_ns()
+        self.nr_lines += nr_lines
+        self.nr_bytes += size
+
+    def to_execution_result(self, end_ts: int) -> QueryExecutionResult:
+        execution = QueryExecutionResult((end_ts - self.start_ts) / 1e9, self.nr_lines)
+        execution.nr_output_bytes = self.nr_bytes
+        if self.first_byte_ts is not None:
+            execution.time_to_first_byte = (self.first_byte_ts - self.start_ts) / 1e9
+        if self.first_result_ts is not None:
+            execution.time_to_first_result = (self.first_result_ts - self.start_ts) / 1e9
+        return execution
+
+
+class QueryTrialResult:
+    """
+    Raw samples of the repeated measured runs of a query, warm-up runs excluded.
+    """
+
+    def __init__(self, query: str):
+        self.query: str = query
+        self.executions: List[QueryExecutionResult] = []
+
+    def get_latencies(self) -> List[float]:
+        return [execution.latency for execution in self.executions]
+
+    def summarize(self, confidence: float) -> LatencySummary:
+        return LatencySummary(self.get_latencies(), confidence)
+
+    def to_dict(self) -> Dict:
+        return {
+            "query": self.query,
+            "executions": [execution.to_dict() for execution in self.executions],
+        }
+
+
+class ConcurrencyLevelResult:
+    """
+    Outcome of running the query set from a number of concurrent closed-loop workers.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency: int = concurrency
+        self.elapsed_time: float = 0  # Unit: second
+        self.nr_failed_queries: int = 0
+        self.executions: List[QueryExecutionResult] = []
+
+    def get_latencies(self) -> List[float]:
+        return [execution.latency for execution in self.executions]
+
+    def get_throughput(self) -> float:
+        if 0 == self.elapsed_time:
+            return 0
+        return len(self.executions) / self.elapsed_time
+
+    def to_dict(self) -> Dict:
+        return {
+            "concurrency": self.concurrency,
+            "elapsed_time_ns": _seconds_to_ns(self.elapsed_time),
+            "nr_failed_queries": self.nr_failed_queries,
+            "executions": [execution.to_dict() for execution in self.executions],
+        }
+
+
+class OpenLoopRateResult:
+    """
+    Outcome of issuing queries at a fixed target arrival rate, regardless of whether the previous
+    queries have returned.
+    """
+
+    def __init__(self, target_rate: float):
+        self.target_rate: float = target_rate  # Unit: queries per second
+        self.elapsed_time: float = 0  # Unit: second
+        self.nr_scheduled_queries: int = 0
+        self.nr_failed_queries: int = 0
+        # Measured from each query's scheduled start, so queueing delay is included
+        self.latency_histogram: LatencyHistogram = LatencyHistogram()
+        # Measured from each query's actual start, i.e., the service time only
+        self.service_time_histogram: LatencyHistogram = LatencyHistogram()
+
+    def get_throughput(self) -> float:
+        if 0 == self.elapsed_time:
+            return 0
+        return self.latency_histogram.total_count / self.elapsed_time
+
+    def to_dict(self) -> Dict:
+        return {
+            "target_rate": self.target_rate,
+            "elapsed_time_ns": _seconds_to_ns(self.elapsed_time),
+            "nr_scheduled_queries": self.nr_scheduled_queries,
+            "nr_failed_queries": self.nr_failed_queries,
+            "latency_histogram": self.latency_histogram.to_dict(),
+            "service_time_histogram": self.service_time_histogram.to_dict(),
+        }
+
+
+class PairedQueryResult:
+    """
+    Outcome of running a query alternately on two configurations of a tool, A and B, where each
+    measured run of A is paired with the run of B right before or after it.
+    """
+
+    def __init__(self, query_a: str, query_b: str):
+        self.query_a: str = query_a
+        self.query_b: str = query_b
+        self.executions_a: List[QueryExecutionResult] = []
+        self.executions_b: List[QueryExecutionResult] = []
+        # Whether A ran first in each pair
+        self.a_first: List[bool] = []
+
+    def get_differences(self) -> List[float]:
+        """
+        Returns the latency of B less the latency of A in each pair, in seconds.
+        """
+        return [
+            execution_b.latency - execution_a.latency
+            for execution_a, execution_b in zip(self.executions_a, self.executions_b)
+        ]
+
+    def describe(self, confidence: float) -> str:
+        differences = self.get_differences()
+        median_a = statistics.median([execution.latency for execution in self.executions_a])
+        median_difference = statistics.median(differences)
+        ci_lower, ci_upper = median_confidence_interval(differences, confidence)
+        ratio = "n/a" if 0 == median_a else f"{median_difference / median_a:+.2%}"
+        return (
+            f"n={len(differences)} A median={median_a:.9f}s B median="
+            f"{statistics.median([execution.latency for execution in self.executions_b]):.9f}s"
+            f" median of B-A={median_difference:+.9f}s ({ratio} of A)"
+            f" {confidence:.0%} CI=[{ci_lower:+.9f}s, {ci_upper:+.9f}s]"
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "query_a": self.query_a,
+            "query_b": self.query_b,
+            "a_first": self.a_first,
+            "executions_a": [execution.to_dict() for execution in self.executions_a],
+            "executions_b": [execution.to_dict() for execution in self.executions_b],
+        }
+
+
+class IngestScalingResult:
+    """
+    Outcome of ingesting the dataset with a number of concurrent workers, e.g., compressor processes
+    each compressing a shard of the dataset's files, or bulk clients.
+    """
+
+    def __init__(self, nr_workers: int):
+        self.nr_workers: int = nr_workers
+        # Fewer than the workers if the dataset has fewer files
+        self.nr_shards: int = nr_workers
+        self.elapsed_time: float = 0  # Unit: second
+        self.decompressed_size: Optional[int] = None  # Unit: byte
+        self.compressed_size: Optional[int] = None  # Unit: byte
+
+    def get_throughput(self) -> float:
+        """
+        Returns the aggregate ingest throughput, in MB/s.
+        """
+        if 0 == self.elapsed_time or self.decompressed_size is None:
+            return 0
+        return self.decompressed_size / 1024 / 1024 / self.elapsed_time
+
+    def to_dict(self) -> Dict:
+        return {
+            "nr_workers": self.nr_workers,
+            "nr_shards": self.nr_shards,
+            "elapsed_time_ns": _seconds_to_ns(self.elapsed_time),
+            "decompressed_size_bytes": self.decompressed_size,
+            "compressed_size_bytes": self.compressed_size,
+        }
 
 
 class BenchmarkingResult:
     """
-    Benchmarking result data structure, for visualization.
+    Benchmarking result data structure, for visualization and export. Values are kept as numbers in
+    the units noted, and only formatted for display.
     """
 
-    def __init__(
-        self, mode: str, compressed_size="", decompressed_size="", ratio="", ingest_e2e_latency=""
-    ):
-        self.mode: str = mode
-        self.compressed_size: str = compressed_size
-        self.decompressed_size: str = decompressed_size
-        self.ratio: str = ratio
-        self.ingest_e2e_latency: str = ingest_e2e_latency
-        self.query_e2e_latencies = []
+    def __init__(self, mode: BenchmarkingMode):
+        self.mode: BenchmarkingMode = mode
+        self.compressed_size: Optional[int] = None  # Unit: byte
+        self.decompressed_size: Optional[int] = None  # Unit: byte
+        self.ratio: Optional[float] = None
+        self.ingest_e2e_latency: Optional[int] = None  # Unit: nanosecond
+        # Peak resident memory of the process loading the dataset, only filled for tools loading it
+        # with a client of their own, so it is kept apart from the memory of the tool
+        self.loader_peak_rss: Optional[int] = None  # Unit: byte
+        # Bytes ingested so far at each sample, only filled for tools reporting their progress, as
+        # (timestamp in nanoseconds since the epoch, bytes)
+        self.ingest_progress: List[Tuple[int, int]] = []
+        # The median latency of each query
+        self.query_e2e_latencies: List[int] = []  # Unit: nanosecond
+        self.query_trial_results: List[QueryTrialResult] = []
+        # Count-only runs of each query, None where the tool has no counting path
+        self.count_query_trial_results: List[Optional[QueryTrialResult]] = []
+        # Runs of an empty command, measuring the overhead of executing a query
+        self.empty_query_trial_result: Optional[QueryTrialResult] = None
+        self.concurrency_level_results: List[ConcurrencyLevelResult] = []
+        self.open_loop_rate_results: List[OpenLoopRateResult] = []
+        self.paired_query_results: List[PairedQueryResult] = []
+        self.ingest_scaling_results: List[IngestScalingResult] = []
+        # The result of the whole pipeline on each subset of the dataset
+        self.dataset_scaling_results: List[DatasetScalingResult] = []
 
         class SystemMetricResult:
             def __init__(self, metric: BenchmarkingSystemMetric):
@@ -62,13 +368,146 @@ class BenchmarkingResult:
                     0  # The OS has used how much memory etc. 0: need baseline, -1: no baseline
                 )
                 self.stage_results: Dict[BenchmarkingStage, List] = {}
+                # Timestamps of each sample, in nanoseconds since the epoch
+                self.stage_timestamps: Dict[BenchmarkingStage, List[int]] = {}
+                # Breakdowns of each sample, only filled by samplers that provide one
+                self.stage_breakdowns: Dict[BenchmarkingStage, List[Dict[str, int]]] = {}
+                # Counter deltas and durations of each stage, only filled for cumulative metrics
+                self.stage_counters: Dict[BenchmarkingStage, Dict[str, int]] = {}
+                self.stage_elapsed_times: Dict[BenchmarkingStage, float] = {}
                 for stage in BenchmarkingStage:
                     self.stage_results[stage] = []
+                    self.stage_timestamps[stage] = []
+                    self.stage_breakdowns[stage] = []
+                    self.stage_counters[stage] = {}
+                    self.stage_elapsed_times[stage] = 0
+
+            def get_stage_average(self, stage: BenchmarkingStage) -> Optional[int]:
+                """
+                Returns the average of the positive samples of `stage`, less the baseline if there
+                is one, or None if there is no such sample.
+                """
+                # Filtered without modifying the raw samples, which are exported
+                positive_samples = [sample for sample in self.stage_results[stage] if 0 < sample]
+                if not positive_samples:
+                    return None
+                if -1 != self.result_baseline:
+                    return int(statistics.mean(positive_samples) - self.result_baseline)
+                return int(statistics.mean(positive_samples))
+
+            def to_dict(self) -> Dict:
+                stages = {}
+                for stage in BenchmarkingStage:
+                    samples = []
+                    for i in range(len(self.stage_results[stage])):
+                        sample = {
+                            "timestamp_ns": self.stage_timestamps[stage][i],
+                            "value": self.stage_results[stage][i],
+                        }
+                        if (
+                            i < len(self.stage_breakdowns[stage])
+                            and self.stage_breakdowns[stage][i]
+                        ):
+                            sample["breakdown"] = self.stage_breakdowns[stage][i]
+                        samples.append(sample)
+                    stages[stage.value] = {
+                        "samples": samples,
+                        "counters": self.stage_counters[stage],
+                        "elapsed_time_ns": _seconds_to_ns(self.stage_elapsed_times[stage]),
+                    }
+                return {
+                    "unit": self.metric.value[1],
+                    "baseline": self.result_baseline,
+                    "stages": stages,
+                }
 
         self.system_metric_results: Dict[BenchmarkingSystemMetric, SystemMetricResult] = {}
         for metric in BenchmarkingSystemMetric:
             self.system_metric_results[metric] = SystemMetricResult(metric)
 
+    def to_dict(self) -> Dict:
+        return {
+            "mode": self.mode.value,
+            "decompressed_size_bytes": self.decompressed_size,
+            "compressed_size_bytes": self.compressed_size,
+            "compression_ratio": self.ratio,
+            "ingest_e2e_latency_ns": self.ingest_e2e_latency,
+            "loader_peak_rss_bytes": self.loader_peak_rss,
+            "ingest_progress": [
+                {"timestamp_ns": timestamp, "ingested_bytes": ingested_bytes}
+                for timestamp, ingested_bytes in self.ingest_progress
+            ],
+            "query_e2e_latencies_ns": self.query_e2e_latencies,
+            "query_trials": [trial_result.to_dict() for trial_result in self.query_trial_results],
+            "count_query_trials": [
+                None if trial_result is None else trial_result.to_dict()
+                for trial_result in self.count_query_trial_results
+            ],
+            "empty_query_trial": (
+                None
+                if self.empty_query_trial_result is None
+                else self.empty_query_trial_result.to_dict()
+            ),
+            "concurrency_levels": [
+                level_result.to_dict() for level_result in self.concurrency_level_results
+            ],
+            "open_loop_rates": [
+                rate_result.to_dict() for rate_result in self.open_loop_rate_results
+            ],
+            "ingest_scaling": [
+                scaling_result.to_dict() for scaling_result in self.ingest_scaling_results
+            ],
+            "dataset_scaling": [
+                scaling_result.to_dict() for scaling_result in self.dataset_scaling_results
+            ],
+            "paired_queries": [
+                paired_result.to_dict() for paired_result in self.paired_query_results
+            ],
+            "system_metrics": {
+                metric.value[0]: metric_result.to_dict()
+                for metric, metric_result in self.system_metric_results.items()
+            },
+        }
+
+
+class DatasetScalingResult:
+    """
+    Outcome of running the whole pipeline on a subset of the dataset.
+    """
+
+    def __init__(self, fraction: float, dataset_size: int, result: BenchmarkingResult):
+        self.fraction: float = fraction
+        self.dataset_size: int = dataset_size  # Unit: byte
+        self.result: BenchmarkingResult = result
+
+    def get_metrics(self) -> Dict[str, Optional[float]]:
+        """
+        Returns each metric whose growth with the dataset size is fitted.
+        """
+        memory_result = self.result.system_metric_results[BenchmarkingSystemMetric.MEMORY]
+        metrics: Dict[str, Optional[float]] = {
+            "ingest e2e latency (s)": (
+                None
+                if self.result.ingest_e2e_latency is None
+                else self.result.ingest_e2e_latency / 1e9
+            ),
+            "compressed size (B)": self.result.compressed_size,
+            "average ingest memory (KB)": memory_result.get_stage_average(BenchmarkingStage.INGEST),
+            "average query memory (KB)": memory_result.get_stage_average(
+                BenchmarkingStage.RUN_QUERY_BENCHMARK
+            ),
+        }
+        for i in range(len(self.result.query_e2e_latencies)):
+            metrics[f"No.{i} query e2e latency (s)"] = self.result.query_e2e_latencies[i] / 1e9
+        return metrics
+
+    def to_dict(self) -> Dict:
+        return {
+            "fraction": self.fraction,
+            "dataset_size_bytes": self.dataset_size,
+            "result": self.result.to_dict(),
+        }
+
 
 class CPTExecutorBase(ABC):
     """
@@ -86,17 +525,21 @@ class CPTExecutorBase(ABC):
             self.config = yaml.safe_load(config_file)
             if self.config is None:
                 raise Exception("Unable to parse " + config_path)
+        docker_config = self.config.get("docker", {})
+        self._docker_client = DockerClient(
+            docker_config.get("socket_path", "/var/run/docker.sock"),
+            docker_config.get("api_version", "v1.41"),
+        )
         # Results for different modes
         self.benchmarking_reseults: Dict[BenchmarkingMode, BenchmarkingResult] = {}
         for mode in BenchmarkingMode:
             self.benchmarking_reseults[mode] = BenchmarkingResult(mode)
 
-        self.__overall_threading_event = threading.Event()
-
         class SystemMetricPoller:
             def __init__(self, metric: BenchmarkingSystemMetric):
                 self.metric = metric
                 self.thread: threading.Thread = None
+                self.polling_event = threading.Event()
                 self.stage_alteration_notifier = threading.Event()
                 self.stage_polling_intervals: Dict[BenchmarkingStage, int] = {}
                 self.stage_events: Dict[BenchmarkingStage, threading.Event] = {}
@@ -108,66 +551,91 @@ class CPTExecutorBase(ABC):
         for metric in BenchmarkingSystemMetric:
             self.__system_metric_pollers[metric] = SystemMetricPoller(metric)
 
+        self.__container_cgroups: Dict[str, ContainerCgroup] = {}
+        self.__timing_agent_paths: Dict[str, str] = {}
+        self.__timing_agent_lock = threading.Lock()
+        # The stage currently accounted for each cumulative metric: (mode, stage, start timestamp,
+        # counters at start)
+        self.__stage_counter_snapshots: Dict[
+            BenchmarkingSystemMetric,
+            Optional[Tuple[BenchmarkingMode, BenchmarkingStage, int, Dict[str, int]]],
+        ] = {}
+        if self._is_using_cgroup_sampler(BenchmarkingSystemMetric.MEMORY):
+            # cgroup samples only cover the tool's containers, there is no need to use baseline
+            for mode in BenchmarkingMode:
+                self.benchmarking_reseults[mode].system_metric_results[
+                    BenchmarkingSystemMetric.MEMORY
+                ].result_baseline = -1
+
     # The following are some utils
     def _check_file_in_docker(self, container_id: str, file_path: str) -> None:
-        try:
-            subprocess.run(["docker", "exec", container_id, "test", "-f", file_path], check=True)
+        if self._docker_client.test_path(container_id, file_path, "-f"):
             logger.info(f"{file_path} exists in container {container_id}")
-        except subprocess.CalledProcessError:
+        else:
             raise Exception(f"{file_path} does not exist in container {container_id}")
 
     def _check_directory_in_docker(
         self, container_id: str, directory_path: str, need_to_create=True, need_to_clear=False
     ) -> None:
-        try:
-            subprocess.run(
-                ["docker", "exec", container_id, "test", "-d", directory_path], check=True
-            )
+        if self._docker_client.test_path(container_id, directory_path, "-d"):
             logger.info(f"{directory_path} exists in {container_id}")
             if need_to_clear:
                 logger.info(
                     f"Clearing existing stuff in {directory_path} in container {container_id}"
                 )
                 try:
-                    # Note to myself: when running the command manually in a shell, the wildcard (*) is expanded
-                    # by the shell to match files in the directory. However, when you run it through
-                    # `subprocess.run`, there is no shell involved by default, so the wildcard (*) isn’t expanded
-                    # and remains a literal *, which won’t work as expected. So the solution is to use `bash -c`
-                    # to enable wildcard expansion.
-                    subprocess.run(
-                        [
-                            "docker",
-                            "exec",
-                            container_id,
-                            "bash",
-                            "-c",
-                            f"rm -rf {directory_path}/*",
-                        ],
-                        check=True,
+                    # The wildcard (*) is expanded by a shell, which an exec doesn't start by
+                    # default. So the solution is to use `bash -c` to enable wildcard expansion.
+                    self._docker_client.exec_run(
+                        container_id, ["bash", "-c", f"rm -rf {directory_path}/*"]
                     )
                     logger.info(
-                        f"All contents within {directory_path} cleared successfully in container {container_id}"
+                        f"All contents within {directory_path} cleared successfully in container"
+                        f" {container_id}"
                     )
-                except subprocess.CalledProcessError as e:
+                except DockerExecError as e:
                     raise Exception(
                         f"Failed to clear {directory_path} contents in {container_id}: {e}"
                     )
-        except subprocess.CalledProcessError as e1:
-            if need_to_create:
-                logger.info(f"{directory_path} does not exist in {container_id}, try to create one")
-                try:
-                    subprocess.run(
-                        ["docker", "exec", container_id, "mkdir", "-p", directory_path], check=True
-                    )
-                    logger.info(
-                        f"{directory_path} created successfully in container {container_id}"
-                    )
-                except subprocess.CalledProcessError as e2:
-                    raise Exception(
-                        f"{directory_path} failed to create in container {container_id}: {e2}"
-                    )
-            else:
-                raise Exception(f"{directory_path} does not exist in {container_id}: {e1}")
+        elif need_to_create:
+            logger.info(f"{directory_path} does not exist in {container_id}, try to create one")
+            try:
+                self._docker_client.exec_run(container_id, ["mkdir", "-p", directory_path])
+                logger.info(f"{directory_path} created successfully in container {container_id}")
+            except DockerExecError as e:
+                raise Exception(
+                    f"{directory_path} failed to create in container {container_id}: {e}"
+                )
+        else:
+            raise Exception(f"{directory_path} does not exist in {container_id}")
+
+    def _exec_in_docker(self, container_id: str, command: str) -> Tuple[str, str]:
+        """
+        Executes a shell command in the container through the Docker Engine API, and returns its
+        stdout and stderr. Raises DockerExecError if the command fails.
+        """
+        stdout, stderr = self._docker_client.exec_run(container_id, ["bash", "-c", command])
+        return stdout.decode("utf-8", errors="replace"), stderr.decode("utf-8", errors="replace")
+
+    def _get_rss_from_ps_in_docker(self, container_id: str, patterns: List[str]) -> int:
+        """
+        Returns the total RSS, in KB, of the processes in the container whose executable (i.e., the
+        first token of `ps aux`'s COMMAND column) contains the first of `patterns`, and whose
+        command line contains the others. Matching the executable leaves out wrappers passed the
+        same arguments, e.g., the timing agent's `python3` process.
+        """
+        stdout, _ = self._exec_in_docker(container_id, "ps aux")
+        rss = 0
+        for line in stdout.strip().split("\n")[1:]:
+            # USER PID %CPU %MEM VSZ RSS TTY STAT START TIME COMMAND
+            fields = line.strip().split(None, 10)
+            if len(fields) < 11:
+                continue
+            command = fields[10]
+            executable = command.split()[0]
+            if patterns[0] in executable and all(pattern in command for pattern in patterns[1:]):
+                rss += int(fields[5])
+        return rss
 
     def _get_mem_usage_from_docker_stats(self, line: str) -> float:
         mem_usage = line.strip().split()[3]
@@ -180,20 +648,336 @@ class CPTExecutorBase(ABC):
         else:
             return float(mem_usage.split("B")[0]) / 1024
 
-    def _execute_query(self, mode: BenchmarkingMode, command: str):
-        wc_command = f"{command} | wc -l"
-        logger.info(f"Executing command: {wc_command}")
+    def _get_tool_config(self) -> Optional[Dict]:
+        """
+        Returns the tool's section of the `yaml` file, holding its `dataset_path`, or None if the
+        tool does not ingest from a dataset path.
+        """
+        return None
+
+    def _get_archive_paths(self) -> List[str]:
+        """
+        Returns the host paths of the data stored by the tool after ingestion, if they are visible
+        from the host.
+        """
+        return []
+
+    def _clear_os_caches(self) -> None:
+        """
+        Cold stage between ingestion and the query benchmark of the cold-run mode. Drops the OS page
+        cache, or evicts only the archives from it, then checks the archives are no longer resident.
+        """
+        cold_run_config = self.config.get("cold_run", {})
+        archive_paths = self._get_archive_paths()
+        if cold_run_config.get("evict_archives_only", False):
+            if not archive_paths:
+                raise Exception("Archives are not visible from the host, cannot evict them only")
+            evict_from_page_cache(archive_paths)
+        elif cold_run_config.get("drop_caches", True):
+            drop_os_page_cache()
+        else:
+            logger.info("Skip clearing OS caches")
+            return
+
+        if not archive_paths or not cold_run_config.get("verify", True):
+            return
+        resident_size, total_size = get_page_cache_residency(archive_paths)
+        resident_ratio = resident_size / total_size if 0 != total_size else 0
+        logger.info(
+            f"{resident_size}B of {total_size}B archives resident in page cache"
+            f" ({resident_ratio:.2%})"
+        )
+        max_resident_ratio = cold_run_config.get("max_resident_ratio", 0.01)
+        if resident_ratio > max_resident_ratio:
+            raise Exception(
+                f"{resident_ratio:.2%} of archives still resident in page cache after clearing,"
+                f" more than {max_resident_ratio:.2%}"
+            )
+
+    def _execute_query(self, command: str) -> QueryExecutionResult:
+        """
+        Executes a query's command on the host, reading its stdout in place with large reads to
+        count the matched log lines and output bytes. The command is split like a shell would, but
+        no shell is started.
+        """
+        logger.info(f"Executing command: {command}")
+        read_buffer = bytearray(QUERY_READ_BUFFER_SIZE)
+        output_counter = QueryOutputCounter(time.perf_counter_ns())
+        with subprocess.Popen(
+            shlex.split(command), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0
+        ) as process:
+            while True:
+                nr_read_bytes = process.stdout.readinto(read_buffer)
+                if not nr_read_bytes:
+                    break
+                output_counter.count(read_buffer, nr_read_bytes)
+            exit_code = process.wait()
+        end_ts = time.perf_counter_ns()
+        # E.g., grep exits with 1 if nothing matches, which is still a valid result
+        if 0 != exit_code:
+            logger.info(f"Command exited with code {exit_code}")
+        execution = output_counter.to_execution_result(end_ts)
+        logger.info(f"Number of matched log lines: {execution.nr_matched_log_lines}")
+        return execution
+
+    def _execute_query_in_docker(self, container_id: str, command: str) -> QueryExecutionResult:
+        """
+        Executes a query's command in the container through the Docker Engine API, counting the
+        matched log lines and output bytes from the streamed stdout instead of piping it through
+        `wc -l`. The command is split like a shell would, but no shell is started.
+        """
+        if self._is_using_timing_agent():
+            return self.__execute_query_with_timing_agent(container_id, command)
+        logger.info(f"Executing command in container {container_id}: {command}")
+        output_counter = QueryOutputCounter(time.perf_counter_ns())
+        for stream_type, data in self._docker_client.exec_stream(
+            container_id, shlex.split(command)
+        ):
+            if STDOUT_STREAM == stream_type:
+                output_counter.count(data, len(data))
+        execution = output_counter.to_execution_result(time.perf_counter_ns())
+        logger.info(f"Number of matched log lines: {execution.nr_matched_log_lines}")
+        return execution
+
+    def _execute_count_query(self, command: str) -> QueryExecutionResult:
+        """
+        Executes a count-only query's command on the host without a shell, and returns its latency
+        with the number of matched log lines parsed from its output.
+        """
+        logger.info(f"Executing count-only command: {command}")
         start_ts = time.perf_counter_ns()
         result = subprocess.run(
-            wc_command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, shell=True, check=True
+            shlex.split(command), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
         )
         end_ts = time.perf_counter_ns()
-        elapsed_time = (end_ts - start_ts) / 1e9
-        nr_matched_log_lines = int(result.stdout.decode("utf-8").strip())
+        nr_matched_log_lines = self._parse_count_output(result.stdout.decode("utf-8"))
+        logger.info(f"Number of matched log lines: {nr_matched_log_lines}")
+        return QueryExecutionResult((end_ts - start_ts) / 1e9, nr_matched_log_lines)
+
+    def _execute_count_query_in_docker(
+        self, container_id: str, command: str
+    ) -> QueryExecutionResult:
+        """
+        Executes a count-only query's command in the container without a shell, and returns its
+        latency with the number of matched log lines parsed from its output.
+        """
+        logger.info(f"Executing count-only command in container {container_id}: {command}")
+        start_ts = time.perf_counter_ns()
+        stdout, _ = self._docker_client.exec_run(container_id, shlex.split(command))
+        end_ts = time.perf_counter_ns()
+        nr_matched_log_lines = self._parse_count_output(stdout.decode("utf-8"))
         logger.info(f"Number of matched log lines: {nr_matched_log_lines}")
-        self.benchmarking_reseults[mode].query_e2e_latencies.append(f"{elapsed_time:.9f}s")
+        return QueryExecutionResult((end_ts - start_ts) / 1e9, nr_matched_log_lines)
+
+    def _parse_count_output(self, output: str) -> int:
+        """
+        Returns the number of matched log lines printed by a count-only query, as the sum of the
+        lines holding only an integer (e.g., the per-file counts of `grep -c`).
+        """
+        return sum(int(line) for line in output.splitlines() if line.strip().isdigit())
+
+    def _is_using_timing_agent(self) -> bool:
+        return self.config.get("timing_agent", {}).get("enable", False)
+
+    def __get_timing_agent_path(self, container_id: str) -> str:
+        """
+        Uploads the timing agent into the container on first use, and returns its path there.
+        """
+        with self.__timing_agent_lock:
+            if container_id not in self.__timing_agent_paths:
+                agent_dir = self.config["timing_agent"].get("agent_dir", "/tmp")
+                with open(os.path.join(os.path.dirname(__file__), "timing_agent.py"), "rb") as f:
+                    agent_source = f.read()
+                archive = io.BytesIO()
+                with tarfile.open(fileobj=archive, mode="w") as tar:
+                    tar_info = tarfile.TarInfo(TIMING_AGENT_FILE_NAME)
+                    tar_info.size = len(agent_source)
+                    tar_info.mode = 0o755
+                    tar_info.mtime = int(time.time())
+                    tar.addfile(tar_info, io.BytesIO(agent_source))
+                self._docker_client.put_archive(container_id, agent_dir, archive.getvalue())
+                self.__timing_agent_paths[container_id] = posixpath.join(
+                    agent_dir, TIMING_AGENT_FILE_NAME
+                )
+                logger.info(
+                    f"Timing agent uploaded to {self.__timing_agent_paths[container_id]} in"
+                    f" container {container_id}"
+                )
+            return self.__timing_agent_paths[container_id]
+
+    def __execute_query_with_timing_agent(
+        self, container_id: str, command: str
+    ) -> QueryExecutionResult:
+        """
+        Executes a query's command in the container under the timing agent, which times the tool's
+        own process there with monotonic clocks and counts its output lines in place. The command is
+        split like a shell would, but no shell is started.
+        """
+        python_path = self.config["timing_agent"].get("python_path", "python3")
+        agent_path = self.__get_timing_agent_path(container_id)
+        logger.info(f"Executing command in container {container_id} with timing agent: {command}")
+        start_ts = time.perf_counter_ns()
+        stdout, _ = self._docker_client.exec_run(
+            container_id, [python_path, agent_path, *shlex.split(command)]
+        )
+        end_ts = time.perf_counter_ns()
+        report = json.loads(stdout.decode("utf-8").strip().split("\n")[-1])
+        execution = QueryExecutionResult(report["wall_time_ns"] / 1e9, report["nr_output_lines"])
+        execution.harness_latency = (end_ts - start_ts) / 1e9
+        execution.user_time = report["user_time_ns"] / 1e9
+        execution.system_time = report["system_time_ns"] / 1e9
+        execution.max_rss = report["max_rss_kb"]
+        execution.nr_output_bytes = report["nr_output_bytes"]
+        if report["time_to_first_byte_ns"] is not None:
+            execution.time_to_first_byte = report["time_to_first_byte_ns"] / 1e9
+        if report["time_to_first_result_ns"] is not None:
+            execution.time_to_first_result = report["time_to_first_result_ns"] / 1e9
+        logger.info(f"Number of matched log lines: {execution.nr_matched_log_lines}")
+        return execution
+
+    def _run_empty_query(self) -> Optional[QueryExecutionResult]:
+        """
+        Executes an empty command (i.e., `true`) the same way `_run_query` executes a query, so that
+        the overhead of executing a query can be reported. Returns None if not supported.
+        """
+        return None
+
+    def __calibrate_empty_query(self, mode: BenchmarkingMode) -> None:
+        nr_calibration_runs = self.config.get("query_trial", {}).get("calibration", 10)
+        if nr_calibration_runs < 1:
+            return
+        trial_result = QueryTrialResult("")
+        for i in range(nr_calibration_runs):
+            logger.info(f"Calibration run {i + 1}/{nr_calibration_runs} with an empty command")
+            timestamp = time.time_ns()
+            execution = self._run_empty_query()
+            if execution is None:
+                logger.info("Skip calibration as empty command is not supported")
+                return
+            execution.timestamp = timestamp
+            trial_result.executions.append(execution)
+        self.benchmarking_reseults[mode].empty_query_trial_result = trial_result
+
+    def _run_count_query(self, query: str) -> Optional[QueryExecutionResult]:
+        """
+        Executes `query` through the tool's native counting path, which finds the matches without
+        retrieving them, and reports the count as the number of matched log lines. Returns None if
+        the tool has no such path.
+        """
+        return None
+
+    def __run_count_query_trials(
+        self, mode: BenchmarkingMode, query: str, nr_warmup_runs: int, nr_measured_runs: int
+    ) -> None:
+        trial_result = QueryTrialResult(query)
+        for i in range(nr_warmup_runs + nr_measured_runs):
+            if i < nr_warmup_runs:
+                logger.info(f"Count-only warm-up run {i + 1}/{nr_warmup_runs} for query: {query}")
+            else:
+                logger.info(
+                    f"Count-only measured run {i - nr_warmup_runs + 1}/{nr_measured_runs} for"
+                    f" query: {query}"
+                )
+            if BenchmarkingMode.COLD_RUN_MODE == mode:
+                self._clear_os_caches()
+            timestamp = time.time_ns()
+            execution = self._run_count_query(query)
+            if execution is None:
+                logger.info("Skip count-only runs as the tool has no counting path")
+                self.benchmarking_reseults[mode].count_query_trial_results.append(None)
+                return
+            execution.timestamp = timestamp
+            if nr_warmup_runs <= i:
+                trial_result.executions.append(execution)
+        self.benchmarking_reseults[mode].count_query_trial_results.append(trial_result)
+
+    def _run_query_trials(self, mode: BenchmarkingMode, query: str) -> None:
+        """
+        Runs `query` with the warm-up and measured runs configured under `query_trial`, and records
+        every measured run. In cold-run mode, warm-up runs are skipped and the OS caches are cleared
+        before every measured run, so that each of them sees a cold system. If `count_query.enable`
+        is set, the same numbers of runs are then made through the tool's counting path.
+        """
+        trial_config = self.config.get("query_trial", {})
+        nr_warmup_runs = trial_config.get("warmup", 0)
+        nr_measured_runs = trial_config.get("measured", 1)
+        if nr_measured_runs < 1:
+            raise Exception(f"query_trial.measured must be at least 1, got {nr_measured_runs}")
+        if BenchmarkingMode.COLD_RUN_MODE == mode:
+            nr_warmup_runs = 0
+
+        for i in range(nr_warmup_runs):
+            logger.info(f"Warm-up run {i + 1}/{nr_warmup_runs} for query: {query}")
+            self._run_query(query)
+
+        trial_result = QueryTrialResult(query)
+        cumulative_metrics = [
+            metric for metric in self.get_enabled_system_metrics() if metric.is_cumulative
+        ]
+        for i in range(nr_measured_runs):
+            logger.info(f"Measured run {i + 1}/{nr_measured_runs} for query: {query}")
+            if BenchmarkingMode.COLD_RUN_MODE == mode:
+                self._clear_os_caches()
+            counters_before = {
+                metric: self._acquire_system_metric_counters(metric)
+                for metric in cumulative_metrics
+            }
+            execution = self._run_timestamped_query(query)
+            for metric in cumulative_metrics:
+                execution.system_metric_deltas[metric] = self.__get_counter_deltas(
+                    counters_before[metric], self._acquire_system_metric_counters(metric)
+                )
+            trial_result.executions.append(execution)
+        self.benchmarking_reseults[mode].query_trial_results.append(trial_result)
+        median_latency = statistics.median(trial_result.get_latencies())
+        self.benchmarking_reseults[mode].query_e2e_latencies.append(_seconds_to_ns(median_latency))
+        if self.config.get("count_query", {}).get("enable", False):
+            self.__run_count_query_trials(mode, query, nr_warmup_runs, nr_measured_runs)
 
-    def __set_thread_event_for_stage(self, stage: BenchmarkingStage):
+    def _run_timestamped_query(self, query: str) -> QueryExecutionResult:
+        timestamp = time.time_ns()
+        execution = self._run_query(query)
+        execution.timestamp = timestamp
+        return execution
+
+    def __get_counter_deltas(
+        self, counters_before: Dict[str, int], counters_after: Dict[str, int]
+    ) -> Dict[str, int]:
+        # Counters may go backwards if a container is recreated in between
+        return {
+            key: max(0, value - counters_before.get(key, 0))
+            for key, value in counters_after.items()
+        }
+
+    def __close_stage_counters(self):
+        for metric, snapshot in self.__stage_counter_snapshots.items():
+            if snapshot is None:
+                continue
+            mode, stage, start_ts, counters_before = snapshot
+            deltas = self.__get_counter_deltas(
+                counters_before, self._acquire_system_metric_counters(metric)
+            )
+            metric_result = self.benchmarking_reseults[mode].system_metric_results[metric]
+            for key, value in deltas.items():
+                metric_result.stage_counters[stage][key] = (
+                    metric_result.stage_counters[stage].get(key, 0) + value
+                )
+            metric_result.stage_elapsed_times[stage] += (time.perf_counter_ns() - start_ts) / 1e9
+            self.__stage_counter_snapshots[metric] = None
+
+    def __open_stage_counters(self, mode: BenchmarkingMode, stage: BenchmarkingStage):
+        self.__close_stage_counters()
+        for metric in self.get_enabled_system_metrics():
+            if metric.is_cumulative:
+                self.__stage_counter_snapshots[metric] = (
+                    mode,
+                    stage,
+                    time.perf_counter_ns(),
+                    self._acquire_system_metric_counters(metric),
+                )
+
+    def __set_thread_event_for_stage(self, stage: BenchmarkingStage, mode: BenchmarkingMode):
+        self.__open_stage_counters(mode, stage)
         for it_stage in BenchmarkingStage:
             for it_metric in BenchmarkingSystemMetric:
                 if stage != it_stage:
@@ -204,6 +988,7 @@ class CPTExecutorBase(ABC):
                     self.__system_metric_pollers[it_metric].stage_alteration_notifier.clear()
 
     def __unset_thread_event_after_stage(self, stage: BenchmarkingStage):
+        self.__close_stage_counters()
         for it_stage in BenchmarkingStage:
             for it_metric in BenchmarkingSystemMetric:
                 if stage != it_stage:
@@ -213,6 +998,13 @@ class CPTExecutorBase(ABC):
                     self.__system_metric_pollers[it_metric].stage_alteration_notifier.set()
                     self.__system_metric_pollers[it_metric].stage_alteration_notifier.clear()
 
+    def end_ingest_stage(self):
+        """
+        Ends the ingest stage without terminating the tool, so that what runs next, e.g., another
+        executor's ingestion, is not accounted for this executor's ingestion.
+        """
+        self.__unset_thread_event_after_stage(BenchmarkingStage.INGEST)
+
     # The following are the main SPI
     @abstractmethod
     def deploy(self, mode: BenchmarkingMode):
@@ -220,14 +1012,352 @@ class CPTExecutorBase(ABC):
 
     @abstractmethod
     def ingest(self, mode: BenchmarkingMode):
-        self.__set_thread_event_for_stage(BenchmarkingStage.INGEST)
+        self.__set_thread_event_for_stage(BenchmarkingStage.INGEST, mode)
         pass
 
     @abstractmethod
     def run_query_benchmark(self, mode: BenchmarkingMode):
-        self.__set_thread_event_for_stage(BenchmarkingStage.RUN_QUERY_BENCHMARK)
+        # Calibrate before the stage starts, so it is not accounted for the stage
+        self.__calibrate_empty_query(mode)
+        self.__set_thread_event_for_stage(BenchmarkingStage.RUN_QUERY_BENCHMARK, mode)
+        pass
+
+    @abstractmethod
+    def _get_queries(self) -> List[str]:
         pass
 
+    @abstractmethod
+    def _run_query(self, query: str) -> QueryExecutionResult:
+        pass
+
+    def run_concurrency_benchmark(self, mode: BenchmarkingMode):
+        """
+        Runs the configured query set from closed-loop workers, for each concurrency level under
+        `concurrency.levels`. Each worker issues the next query as soon as its previous one returns,
+        until `concurrency.duration` seconds have passed or `concurrency.iterations` queries have
+        been issued, whichever comes first.
+        """
+        self.__set_thread_event_for_stage(BenchmarkingStage.RUN_QUERY_BENCHMARK, mode)
+        concurrency_config = self.config.get("concurrency", {})
+        levels = concurrency_config.get("levels", [1, 2, 4, 8, 16])
+        duration = concurrency_config.get("duration", None)
+        nr_iterations = concurrency_config.get("iterations", None)
+        if duration is None and nr_iterations is None:
+            duration = 60
+        queries = self._get_queries()
+        for level in levels:
+            logger.info(f"Running query set with {level} concurrent workers")
+            level_result = ConcurrencyLevelResult(level)
+            lock = threading.Lock()
+            nr_issued_queries = 0
+
+            def worker(deadline):
+                nonlocal nr_issued_queries
+                while True:
+                    with lock:
+                        if nr_iterations is not None and nr_issued_queries >= nr_iterations:
+                            return
+                        if deadline is not None and time.perf_counter() >= deadline:
+                            return
+                        query = queries[nr_issued_queries % len(queries)]
+                        nr_issued_queries += 1
+                    try:
+                        execution = self._run_timestamped_query(query)
+                    except Exception as e:
+                        logger.error(f"Query failed under {level} concurrent workers: {e}")
+                        with lock:
+                            level_result.nr_failed_queries += 1
+                        continue
+                    with lock:
+                        level_result.executions.append(execution)
+
+            start_ts = time.perf_counter_ns()
+            deadline = None if duration is None else time.perf_counter() + duration
+            with ThreadPoolExecutor(max_workers=level) as pool:
+                futures = [pool.submit(worker, deadline) for _ in range(level)]
+                for future in futures:
+                    future.result()
+            end_ts = time.perf_counter_ns()
+            level_result.elapsed_time = (end_ts - start_ts) / 1e9
+            self.benchmarking_reseults[mode].concurrency_level_results.append(level_result)
+            logger.info(
+                f"{level} concurrent workers finished {len(level_result.executions)} queries in"
+                f" {level_result.elapsed_time:.9f}s ({level_result.get_throughput():.3f} queries/s)"
+            )
+
+    def run_open_loop_benchmark(self, mode: BenchmarkingMode):
+        """
+        Issues queries from the configured query set on a fixed or Poisson schedule, for each target
+        rate under `open_loop.rates`, in increasing order. Latency is measured from each query's
+        scheduled start rather than its actual start, so the queueing delay of a saturated tool is
+        not omitted. The sweep stops at the first rate whose p99 latency exceeds
+        `open_loop.slo_p99`.
+        """
+        self.__set_thread_event_for_stage(BenchmarkingStage.RUN_QUERY_BENCHMARK, mode)
+        open_loop_config = self.config.get("open_loop", {})
+        rates = sorted(open_loop_config.get("rates", [1, 2, 4, 8]))
+        duration = open_loop_config.get("duration", 60)
+        arrival = open_loop_config.get("arrival", "poisson")
+        slo_p99 = open_loop_config.get("slo_p99", None)
+        max_outstanding_queries = open_loop_config.get("max_outstanding_queries", 256)
+        rng = random.Random(open_loop_config.get("seed", 0))
+        if arrival not in ("poisson", "fixed"):
+            raise Exception(f"Unknown open_loop.arrival: {arrival}")
+        queries = self._get_queries()
+        for rate in rates:
+            logger.info(f"Issuing queries at {rate} queries/s with {arrival} arrivals")
+            rate_result = OpenLoopRateResult(rate)
+            lock = threading.Lock()
+
+            def issue(query, scheduled_ts):
+                try:
+                    execution = self._run_query(query)
+                except Exception as e:
+                    logger.error(f"Query failed at {rate} queries/s: {e}")
+                    with lock:
+                        rate_result.nr_failed_queries += 1
+                    return
+                end_ts = time.perf_counter_ns()
+                with lock:
+                    rate_result.latency_histogram.record((end_ts - scheduled_ts) / 1e9)
+                    rate_result.service_time_histogram.record(execution.latency)
+
+            start_ts = time.perf_counter_ns()
+            offset = 0.0
+            with ThreadPoolExecutor(max_workers=max_outstanding_queries) as pool:
+                while offset < duration:
+                    scheduled_ts = start_ts + int(offset * 1e9)
+                    delay = (scheduled_ts - time.perf_counter_ns()) / 1e9
+                    if delay > 0:
+                        time.sleep(delay)
+                    query = queries[rate_result.nr_scheduled_queries % len(queries)]
+                    pool.submit(issue, query, scheduled_ts)
+                    rate_result.nr_scheduled_queries += 1
+                    if "poisson" == arrival:
+                        offset += rng.expovariate(rate)
+                    else:
+                        offset += 1 / rate
+            end_ts = time.perf_counter_ns()
+            rate_result.elapsed_time = (end_ts - start_ts) / 1e9
+            self.benchmarking_reseults[mode].open_loop_rate_results.append(rate_result)
+            logger.info(
+                f"{rate} queries/s target: {rate_result.get_throughput():.3f} queries/s achieved,"
+                f" latency {rate_result.latency_histogram}"
+            )
+            if (
+                slo_p99 is not None
+                and 0 != rate_result.latency_histogram.total_count
+                and rate_result.latency_histogram.get_value_at_percentile(99) > slo_p99
+            ):
+                logger.info(f"p99 latency exceeds {slo_p99}s at {rate} queries/s, stop the sweep")
+                break
+
+    def run_interleaved_benchmark(self, mode: BenchmarkingMode, other: "CPTExecutorBase"):
+        """
+        Runs the query set on this executor (A) and `other` (B), both already ingested, in a
+        randomized interleaved order: each round shuffles the queries and, for each query, runs A
+        and B back to back in a random order. Drift of the host over time then affects both sides
+        alike, and each run of A is paired with the run of B next to it. Warm-up and measured runs
+        are configured under `query_trial` of this executor.
+        """
+        self.__set_thread_event_for_stage(BenchmarkingStage.RUN_QUERY_BENCHMARK, mode)
+        trial_config = self.config.get("query_trial", {})
+        nr_warmup_runs = trial_config.get("warmup", 0)
+        nr_measured_runs = trial_config.get("measured", 1)
+        if nr_measured_runs < 1:
+            raise Exception(f"query_trial.measured must be at least 1, got {nr_measured_runs}")
+        rng = random.Random(self.config.get("interleaved", {}).get("seed", None))
+        queries_a = self._get_queries()
+        queries_b = other._get_queries()
+        if len(queries_a) != len(queries_b):
+            raise Exception(f"A has {len(queries_a)} queries but B has {len(queries_b)}")
+        paired_results = [
+            PairedQueryResult(query_a, query_b) for query_a, query_b in zip(queries_a, queries_b)
+        ]
+
+        for i in range(nr_warmup_runs + nr_measured_runs):
+            is_warmup = i < nr_warmup_runs
+            for query_index in rng.sample(range(len(paired_results)), len(paired_results)):
+                paired_result = paired_results[query_index]
+                a_first = rng.random() < 0.5
+                logger.info(
+                    f"{'Warm-up' if is_warmup else 'Measured'} round {i + 1} for No.{query_index}"
+                    f" query, {'A then B' if a_first else 'B then A'}"
+                )
+                if a_first:
+                    execution_a = self._run_timestamped_query(paired_result.query_a)
+                    execution_b = other._run_timestamped_query(paired_result.query_b)
+                else:
+                    execution_b = other._run_timestamped_query(paired_result.query_b)
+                    execution_a = self._run_timestamped_query(paired_result.query_a)
+                if is_warmup:
+                    continue
+                paired_result.executions_a.append(execution_a)
+                paired_result.executions_b.append(execution_b)
+                paired_result.a_first.append(a_first)
+        self.benchmarking_reseults[mode].paired_query_results = paired_results
+
+    def run_ingest_scaling_benchmark(self, mode: BenchmarkingMode):
+        """
+        Ingests the dataset with each number of concurrent workers under `ingest_scaling.workers`
+        (1 to the number of CPUs by default), and reports the aggregate throughput and the scaling
+        efficiency, i.e., the throughput per worker relative to the first number of workers.
+        """
+        self.__set_thread_event_for_stage(BenchmarkingStage.INGEST, mode)
+        worker_counts = self.config.get("ingest_scaling", {}).get(
+            "workers", list(range(1, os.cpu_count() + 1))
+        )
+        try:
+            for nr_workers in worker_counts:
+                logger.info(f"Ingesting with {nr_workers} concurrent workers")
+                scaling_result = self._ingest_with_workers(nr_workers)
+                self.benchmarking_reseults[mode].ingest_scaling_results.append(scaling_result)
+                logger.info(
+                    f"{nr_workers} concurrent workers ingested {scaling_result.decompressed_size}B"
+                    f" in {scaling_result.elapsed_time:.9f}s"
+                    f" ({scaling_result.get_throughput():.3f} MB/s)"
+                )
+        finally:
+            self.__unset_thread_event_after_stage(BenchmarkingStage.INGEST)
+
+    def run_dataset_scaling_benchmark(self, mode: BenchmarkingMode):
+        """
+        Runs the whole pipeline (deploy, launch, ingest, query benchmark, and terminate) on
+        deterministic subsets of the dataset, one for each fraction under
+        `dataset_scaling.fractions`. Subsets are written under `dataset_scaling.subset_path`, which
+        must be visible from the tool at the same path as from the host, and removed once used.
+        """
+        tool_config = self._get_tool_config()
+        if tool_config is None:
+            raise Exception(f"{type(self).__name__} does not support dataset scaling")
+        scaling_config = self.config.get("dataset_scaling", {})
+        fractions = sorted(scaling_config.get("fractions", [0.01, 0.05, 0.25, 1]))
+        split = scaling_config.get("split", "file")
+        subset_path = scaling_config.get("subset_path", None)
+        if subset_path is None and any(fraction < 1 for fraction in fractions):
+            raise Exception("dataset_scaling.subset_path is required for subsets of the dataset")
+        dataset_path = tool_config["dataset_path"]
+        scaling_results = []
+        try:
+            for fraction in fractions:
+                if 1 <= fraction:
+                    tool_config["dataset_path"] = dataset_path
+                    dataset_size = sum(
+                        file_size for _, file_size in list_dataset_files(dataset_path)
+                    )
+                else:
+                    logger.info(f"Creating a subset of {fraction:.2%} of the dataset by {split}")
+                    tool_config["dataset_path"], dataset_size = create_dataset_subset(
+                        dataset_path, fraction, split, subset_path
+                    )
+                logger.info(
+                    f"Running the pipeline on {fraction:.2%} of the dataset ({dataset_size}B)"
+                )
+                # Each subset gets a fresh result, keeping the memory baselines
+                result = self.benchmarking_reseults[mode]
+                self.benchmarking_reseults[mode] = BenchmarkingResult(mode)
+                for metric, metric_result in result.system_metric_results.items():
+                    self.benchmarking_reseults[mode].system_metric_results[
+                        metric
+                    ].result_baseline = metric_result.result_baseline
+                for metric in self.get_enabled_system_metrics():
+                    self.start_polling_system_metric(metric, mode)
+                try:
+                    self.deploy(mode)
+                    self.launch(mode)
+                    self.ingest(mode)
+                    self.run_query_benchmark(mode)
+                finally:
+                    for metric in self.get_enabled_system_metrics():
+                        self.stop_polling_system_metric(metric, mode)
+                    self.terminate(mode)
+                scaling_results.append(
+                    DatasetScalingResult(fraction, dataset_size, self.benchmarking_reseults[mode])
+                )
+        finally:
+            tool_config["dataset_path"] = dataset_path
+            if subset_path is not None and os.path.exists(subset_path):
+                shutil.rmtree(subset_path)
+        self.benchmarking_reseults[mode] = BenchmarkingResult(mode)
+        self.benchmarking_reseults[mode].dataset_scaling_results = scaling_results
+
+    def _ingest_with_workers(self, nr_workers: int) -> IngestScalingResult:
+        """
+        Ingests the dataset with `nr_workers` concurrent workers, leaving the ingested data of the
+        regular `ingest` untouched.
+        """
+        raise Exception(f"{type(self).__name__} does not support ingest scaling")
+
+    def _shard_dataset_files(
+        self, dataset_path: str, nr_shards: int
+    ) -> List[Tuple[List[str], int]]:
+        """
+        Splits the files of the dataset (a file, a directory, or a glob pattern) into at most
+        `nr_shards` shards of similar sizes, by assigning each file, largest first, to the currently
+        smallest shard. Returns the file paths and total size, in bytes, of each shard.
+        """
+        file_sizes = [
+            (file_size, file_path) for file_path, file_size in list_dataset_files(dataset_path)
+        ]
+        if not file_sizes:
+            raise Exception(f"No file to ingest in {dataset_path}")
+        file_sizes.sort(reverse=True)
+        shards: List[Tuple[List[str], int]] = [
+            ([], 0) for _ in range(min(nr_shards, len(file_sizes)))
+        ]
+        # (total size, shard index) of each shard
+        shard_heap = [(0, i) for i in range(len(shards))]
+        for file_size, file_path in file_sizes:
+            shard_size, i = heapq.heappop(shard_heap)
+            shards[i][0].append(file_path)
+            shards[i] = (shards[i][0], shard_size + file_size)
+            heapq.heappush(shard_heap, (shard_size + file_size, i))
+        return shards
+
+    def _ingest_shards_in_docker(
+        self,
+        container_id: str,
+        dataset_path: str,
+        data_path: str,
+        nr_workers: int,
+        get_command: Callable[[str, List[str]], List[str]],
+    ) -> IngestScalingResult:
+        """
+        Splits the dataset's files into `nr_workers` shards and compresses them concurrently in the
+        container, each with the command returned by `get_command(archive path, file paths)` into
+        its own directory under `data_path`. The directories are removed once measured. Commands run
+        without a shell, as file lists can exceed the length limit of a single shell argument.
+        """
+        shards = self._shard_dataset_files(dataset_path, nr_workers)
+        if len(shards) < nr_workers:
+            logger.warning(f"Only {len(shards)} files to ingest with {nr_workers} workers")
+        scaling_result = IngestScalingResult(nr_workers)
+        scaling_result.nr_shards = len(shards)
+        scaling_result.decompressed_size = sum(shard_size for _, shard_size in shards)
+        scaling_path = posixpath.join(data_path, f"ingest-scaling-{nr_workers}")
+        self._check_directory_in_docker(container_id, scaling_path, need_to_clear=True)
+        commands = []
+        for i, (file_paths, _) in enumerate(shards):
+            archive_path = posixpath.join(scaling_path, str(i))
+            self._check_directory_in_docker(container_id, archive_path)
+            commands.append(get_command(archive_path, file_paths))
+        try:
+            start_ts = time.perf_counter_ns()
+            with ThreadPoolExecutor(max_workers=len(commands)) as pool:
+                futures = [
+                    pool.submit(self._docker_client.exec_run, container_id, command)
+                    for command in commands
+                ]
+                for future in futures:
+                    future.result()
+            end_ts = time.perf_counter_ns()
+            scaling_result.elapsed_time = (end_ts - start_ts) / 1e9
+            output, _ = self._exec_in_docker(container_id, f"du -c -b {scaling_path}")
+            scaling_result.compressed_size = int(output.strip().split("\n")[-1].split()[0])
+        finally:
+            self._exec_in_docker(container_id, f"rm -rf {scaling_path}")
+        return scaling_result
+
     @abstractmethod
     def launch(self, mode: BenchmarkingMode):
         pass
@@ -241,57 +1371,363 @@ class CPTExecutorBase(ABC):
     def terminate(self, mode: BenchmarkingMode):
         pass
 
+    def export_results(self, target: str, modes: List[BenchmarkingMode], output_dir: str) -> str:
+        """
+        Writes the results of `modes`, with every raw latency and system metric sample, to a
+        versioned JSON file under `output_dir`, and returns its path.
+        """
+        created_at = datetime.datetime.now(datetime.timezone.utc)
+        document = {
+            "schema_version": RESULT_SCHEMA_VERSION,
+            "clp_bench_version": VERSION,
+            "target": target,
+            "created_at": created_at.isoformat(),
+            "host": {
+                "hostname": socket.gethostname(),
+                "platform": platform.platform(),
+                "nr_cpus": os.cpu_count(),
+            },
+            "config": self.config,
+            "results": [self.benchmarking_reseults[mode].to_dict() for mode in modes],
+        }
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(
+            output_dir, f"{target.lower()}-{created_at.strftime('%Y%m%dT%H%M%S%fZ')}.json"
+        )
+        with open(output_path, "w") as output_file:
+            # Values the yaml parser produces but JSON lacks, e.g., dates, are written as strings
+            json.dump(document, output_file, indent=2, default=str)
+        logger.info(f"Results exported to {output_path}")
+        return output_path
+
     def visualize(self):
         for mode, result in self.benchmarking_reseults.items():
-            if result.decompressed_size:
+            prefix = f"{mode.value.capitalize()} mode:"
+            if result.decompressed_size is not None:
+                logger.info(
+                    f"{prefix} decompressed size {result.decompressed_size / 1024 / 1024:.2f}MB"
+                )
+            if result.compressed_size is not None:
                 logger.info(
-                    f"{mode.value.capitalize()} mode: decompressed size {result.decompressed_size}"
+                    f"{prefix} compressed size {result.compressed_size / 1024 / 1024:.2f}MB"
                 )
-            if result.compressed_size:
+            if result.ratio is not None:
+                logger.info(f"{prefix} compression ratio {result.ratio}x")
+            if result.ingest_e2e_latency is not None:
+                logger.info(f"{prefix} ingest e2e latency {result.ingest_e2e_latency / 1e9:.9f}s")
+            if result.loader_peak_rss is not None:
                 logger.info(
-                    f"{mode.value.capitalize()} mode: compressed size {result.compressed_size}"
+                    f"{prefix} loader peak RSS {result.loader_peak_rss / 1024 / 1024:.2f}MB"
                 )
-            if result.ratio:
-                logger.info(f"{mode.value.capitalize()} mode: compression ratio {result.ratio}")
-            if result.ingest_e2e_latency:
+            if 1 < len(result.ingest_progress):
+                throughputs = [
+                    (ingested_bytes - previous_bytes) / ((timestamp - previous_timestamp) / 1e9)
+                    for (previous_timestamp, previous_bytes), (timestamp, ingested_bytes) in zip(
+                        result.ingest_progress, result.ingest_progress[1:]
+                    )
+                    if previous_timestamp < timestamp
+                ]
+                elapsed_time = (result.ingest_progress[-1][0] - result.ingest_progress[0][0]) / 1e9
+                ingested_bytes = result.ingest_progress[-1][1] - result.ingest_progress[0][1]
                 logger.info(
-                    f"{mode.value.capitalize()} mode: ingest e2e latency {result.ingest_e2e_latency}"
+                    f"{prefix} ingest throughput mean"
+                    f" {ingested_bytes / elapsed_time / 1024 / 1024:.2f}MB/s,"
+                    f" peak {max(throughputs) / 1024 / 1024:.2f}MB/s"
+                    f" over {len(result.ingest_progress)} samples"
                 )
             for i in range(len(result.query_e2e_latencies)):
                 logger.info(
-                    f"{mode.value.capitalize()} mode: No.{i} query e2e latency {result.query_e2e_latencies[i]}"
+                    f"{prefix} No.{i} query e2e latency {result.query_e2e_latencies[i] / 1e9:.9f}s"
+                )
+            confidence = self.config.get("query_trial", {}).get("confidence", 0.95)
+            for i in range(len(result.query_trial_results)):
+                logger.info(
+                    f"{prefix} No.{i} query e2e latency summary"
+                    f" {result.query_trial_results[i].summarize(confidence)}"
+                )
+            for i in range(len(result.count_query_trial_results)):
+                count_trial_result = result.count_query_trial_results[i]
+                if count_trial_result is None:
+                    logger.info(f"{prefix} No.{i} query count-only e2e latency n/a")
+                    continue
+                count_summary = count_trial_result.summarize(confidence)
+                full_latency = result.query_e2e_latencies[i] / 1e9
+                ratio = "n/a" if 0 == full_latency else f"{count_summary.median / full_latency:.2%}"
+                logger.info(
+                    f"{prefix} No.{i} query count-only e2e latency summary {count_summary},"
+                    f" count {count_trial_result.executions[-1].nr_matched_log_lines},"
+                    f" {ratio} of full retrieval"
+                )
+            if result.empty_query_trial_result is not None:
+                empty_query_executions = result.empty_query_trial_result.executions
+                logger.info(
+                    f"{prefix} empty query e2e latency summary"
+                    f" {result.empty_query_trial_result.summarize(confidence)}"
+                )
+                harness_latencies = [
+                    execution.harness_latency
+                    for execution in empty_query_executions
+                    if execution.harness_latency is not None
+                ]
+                if harness_latencies:
+                    logger.info(
+                        f"{prefix} empty query harness e2e latency summary"
+                        f" {LatencySummary(harness_latencies, confidence)}"
+                    )
+            for i in range(len(result.query_trial_results)):
+                executions = [
+                    execution
+                    for execution in result.query_trial_results[i].executions
+                    if execution.user_time is not None
+                ]
+                if not executions:
+                    continue
+                # Describe the median execution
+                execution = sorted(executions, key=lambda e: e.latency)[(len(executions) - 1) // 2]
+                logger.info(
+                    f"{prefix} No.{i} query in-container timing of median run:"
+                    f" wall {execution.latency:.9f}s, user {execution.user_time:.9f}s,"
+                    f" system {execution.system_time:.9f}s, max RSS {execution.max_rss}KB,"
+                    f" harness e2e {execution.harness_latency:.9f}s"
                 )
+            for i in range(len(result.query_trial_results)):
+                executions = [
+                    execution
+                    for execution in result.query_trial_results[i].executions
+                    if execution.nr_output_bytes is not None
+                ]
+                if not executions:
+                    continue
+                # Describe the median execution
+                execution = sorted(executions, key=lambda e: e.latency)[(len(executions) - 1) // 2]
+                logger.info(
+                    f"{prefix} No.{i} query output of median run: {execution.nr_output_bytes}B in"
+                    f" {execution.nr_matched_log_lines} lines, time to first byte"
+                    f" {self.__format_optional_latency(execution.time_to_first_byte)}, time to"
+                    f" first result"
+                    f" {self.__format_optional_latency(execution.time_to_first_result)},"
+                    f" e2e {execution.latency:.9f}s"
+                )
+            for i in range(len(result.query_trial_results)):
+                executions = [
+                    execution
+                    for execution in result.query_trial_results[i].executions
+                    if execution.summed_latency is not None
+                ]
+                if not executions:
+                    continue
+                # Describe the median execution
+                execution = sorted(executions, key=lambda e: e.latency)[(len(executions) - 1) // 2]
+                parallelism = (
+                    execution.summed_latency / execution.latency if 0 < execution.latency else 0
+                )
+                logger.info(
+                    f"{prefix} No.{i} query sub-queries of median run:"
+                    f" wall-clock {execution.latency:.9f}s,"
+                    f" summed {execution.summed_latency:.9f}s, {parallelism:.2f}x parallelism"
+                )
+            for level_result in result.concurrency_level_results:
+                logger.info(
+                    f"{prefix} {level_result.concurrency} concurrent workers throughput"
+                    f" {level_result.get_throughput():.3f} queries/s,"
+                    f" {level_result.nr_failed_queries} failed queries"
+                )
+                if level_result.executions:
+                    logger.info(
+                        f"{prefix} {level_result.concurrency} concurrent workers query e2e latency"
+                        f" summary {LatencySummary(level_result.get_latencies(), confidence)}"
+                    )
+
+            for rate_result in result.open_loop_rate_results:
+                logger.info(
+                    f"{prefix} {rate_result.target_rate} queries/s target throughput"
+                    f" {rate_result.get_throughput():.3f} queries/s achieved,"
+                    f" {rate_result.nr_failed_queries} failed queries"
+                )
+                logger.info(
+                    f"{prefix} {rate_result.target_rate} queries/s target query e2e latency"
+                    f" {rate_result.latency_histogram}"
+                )
+                logger.info(
+                    f"{prefix} {rate_result.target_rate} queries/s target query service time"
+                    f" {rate_result.service_time_histogram}"
+                )
+            if result.open_loop_rate_results:
+                logger.info(
+                    f"{prefix} sustainable throughput"
+                    f" {self.get_sustainable_throughput(mode)} queries/s"
+                )
+
+            if result.ingest_scaling_results:
+                first_result = result.ingest_scaling_results[0]
+                first_throughput_per_worker = first_result.get_throughput() / first_result.nr_shards
+            for scaling_result in result.ingest_scaling_results:
+                throughput_per_worker = scaling_result.get_throughput() / scaling_result.nr_shards
+                efficiency = (
+                    throughput_per_worker / first_throughput_per_worker
+                    if 0 != first_throughput_per_worker
+                    else 0
+                )
+                logger.info(
+                    f"{prefix} {scaling_result.nr_workers} concurrent workers ingest throughput"
+                    f" {scaling_result.get_throughput():.3f} MB/s,"
+                    f" {throughput_per_worker:.3f} MB/s per worker,"
+                    f" scaling efficiency {efficiency:.2%},"
+                    f" compressed size {scaling_result.compressed_size}B"
+                )
+
+            for scaling_result in result.dataset_scaling_results:
+                metrics = ", ".join(
+                    f"{name} {'n/a' if value is None else value}"
+                    for name, value in scaling_result.get_metrics().items()
+                )
+                logger.info(
+                    f"{prefix} {scaling_result.fraction:.2%} of dataset"
+                    f" ({scaling_result.dataset_size}B): {metrics}"
+                )
+            if 1 < len(result.dataset_scaling_results):
+                self.__describe_dataset_scaling_fits(mode, result.dataset_scaling_results)
+
+            for i in range(len(result.paired_query_results)):
+                logger.info(
+                    f"{prefix} No.{i} query paired e2e latency"
+                    f" {result.paired_query_results[i].describe(confidence)}"
+                )
+
+            for metric in self.get_enabled_system_metrics():
+                if not metric.is_cumulative:
+                    continue
+                metric_result = result.system_metric_results[metric]
+                for stage in BenchmarkingStage:
+                    counters = metric_result.stage_counters[stage]
+                    if counters:
+                        description = self.__describe_counters(
+                            metric, counters, metric_result.stage_elapsed_times[stage]
+                        )
+                        logger.info(
+                            f"{prefix} {metric.value[0]} usage at {stage.value} stage:"
+                            f" {description}"
+                        )
+                for i in range(len(result.query_trial_results)):
+                    executions = [
+                        execution
+                        for execution in result.query_trial_results[i].executions
+                        if metric in execution.system_metric_deltas
+                    ]
+                    if not executions:
+                        continue
+                    # Describe the median execution
+                    execution = sorted(executions, key=lambda e: e.latency)[
+                        (len(executions) - 1) // 2
+                    ]
+                    description = self.__describe_counters(
+                        metric, execution.system_metric_deltas[metric], execution.latency
+                    )
+                    logger.info(
+                        f"{prefix} No.{i} query {metric.value[0]} usage of median run:"
+                        f" {description}"
+                    )
 
             if self.config.get("system_metric", {}).get("enable", False):
                 for metric in BenchmarkingSystemMetric:
+                    if metric.is_cumulative:
+                        continue
+                    unit = metric.value[1]
                     for stage in BenchmarkingStage:
-                        if not result.system_metric_results[metric].stage_results[stage]:
-                            average_metric_result = 0
-                        else:
-                            result.system_metric_results[metric].stage_results[stage] = [
-                                result
-                                for result in result.system_metric_results[metric].stage_results[
-                                    stage
-                                ]
-                                if 0 < result
+                        average_metric_result = result.system_metric_results[
+                            metric
+                        ].get_stage_average(stage)
+                        if average_metric_result is not None:
+                            logger.info(
+                                f"{prefix} average {metric.value[0]} usage at {stage.value} stage:"
+                                f" {average_metric_result}{unit}"
+                            )
+                        breakdowns = [
+                            breakdown
+                            for breakdown in result.system_metric_results[metric].stage_breakdowns[
+                                stage
                             ]
-                            if -1 != result.system_metric_results[metric].result_baseline:
-                                average_metric_result = int(
-                                    statistics.mean(
-                                        result.system_metric_results[metric].stage_results[stage]
-                                    )
-                                    - result.system_metric_results[metric].result_baseline
-                                )
-                            else:
-                                average_metric_result = int(
-                                    statistics.mean(
-                                        result.system_metric_results[metric].stage_results[stage]
-                                    )
-                                )
+                            if breakdown
+                        ]
+                        if breakdowns:
+                            average_anon = int(statistics.mean(b["anon"] for b in breakdowns))
+                            average_file = int(statistics.mean(b["file"] for b in breakdowns))
+                            peak = max(b["peak"] for b in breakdowns)
                             logger.info(
-                                f"{mode.value.capitalize()} mode: average {metric.value[0]} usage at {stage.value} stage: {average_metric_result}{metric.value[1]}"
+                                f"{prefix} average anonymous {metric.value[0]}"
+                                f" {average_anon}{unit}, average page cache {average_file}{unit},"
+                                f" peak {metric.value[0]} {peak}{unit} at {stage.value} stage"
                             )
 
+    def __describe_dataset_scaling_fits(
+        self, mode: BenchmarkingMode, scaling_results: List[DatasetScalingResult]
+    ) -> None:
+        """
+        Fits each metric against the dataset size as a power law, and extrapolates it to each size
+        under `dataset_scaling.extrapolate_gib`.
+        """
+        extrapolated_sizes = self.config.get("dataset_scaling", {}).get("extrapolate_gib", [])
+        all_metrics = [scaling_result.get_metrics() for scaling_result in scaling_results]
+        for name in all_metrics[-1]:
+            points = [
+                (scaling_result.dataset_size, metrics.get(name))
+                for scaling_result, metrics in zip(scaling_results, all_metrics)
+            ]
+            points = [(size, value) for size, value in points if value is not None and 0 < value]
+            if len({size for size, _ in points}) < 2:
+                logger.info(f"{mode.value.capitalize()} mode: {name} cannot be fitted")
+                continue
+            a, b = fit_power_law([size for size, _ in points], [value for _, value in points])
+            extrapolations = "".join(
+                f", {a * (size * 1024**3) ** b:.6g} at {size}GiB" for size in extrapolated_sizes
+            )
+            logger.info(
+                f"{mode.value.capitalize()} mode: {name} grows as {a:.6g} * size^{b:.4f}"
+                f"{extrapolations}"
+            )
+
+    def __format_optional_latency(self, latency: Optional[float]) -> str:
+        return "n/a" if latency is None else f"{latency:.9f}s"
+
+    def __describe_counters(
+        self, metric: BenchmarkingSystemMetric, counters: Dict[str, int], elapsed_time: float
+    ) -> str:
+        if BenchmarkingSystemMetric.IO == metric:
+            read_mb = counters.get("rbytes", 0) / 1024 / 1024
+            written_mb = counters.get("wbytes", 0) / 1024 / 1024
+            read_throughput = read_mb / elapsed_time if 0 != elapsed_time else 0
+            return (
+                f"read {read_mb:.2f}MB in {counters.get('rios', 0)} ops, written"
+                f" {written_mb:.2f}MB in {counters.get('wios', 0)} ops, {read_throughput:.2f}MB/s"
+                f" read on average over {elapsed_time:.3f}s"
+            )
+        cpu_seconds = counters.get("usage_usec", 0) / 1e6
+        average_cores = cpu_seconds / elapsed_time if 0 != elapsed_time else 0
+        return (
+            f"{cpu_seconds:.3f} CPU-seconds (user {counters.get('user_usec', 0) / 1e6:.3f}s,"
+            f" system {counters.get('system_usec', 0) / 1e6:.3f}s), {average_cores:.3f} cores on"
+            f" average over {elapsed_time:.3f}s"
+        )
+
+    def get_sustainable_throughput(self, mode: BenchmarkingMode) -> float:
+        """
+        Returns the highest target rate of the open-loop sweep whose p99 latency meets
+        `open_loop.slo_p99`, or 0 if there is none.
+        """
+        slo_p99 = self.config.get("open_loop", {}).get("slo_p99", None)
+        sustainable_throughput = 0
+        for rate_result in self.benchmarking_reseults[mode].open_loop_rate_results:
+            if 0 == rate_result.latency_histogram.total_count:
+                continue
+            if slo_p99 is not None and (
+                rate_result.latency_histogram.get_value_at_percentile(99) > slo_p99
+            ):
+                continue
+            if 0 != rate_result.nr_failed_queries:
+                continue
+            sustainable_throughput = max(sustainable_throughput, rate_result.target_rate)
+        return sustainable_throughput
+
     def __load_system_metric_polling_config(self, metric: BenchmarkingSystemMetric):
         for stage in BenchmarkingStage:
             interval = (
@@ -301,20 +1737,80 @@ class CPTExecutorBase(ABC):
             )
             self.__system_metric_pollers[metric].stage_polling_intervals[stage] = interval
             logger.info(
-                f"{metric.value[0].capitalize()} usage polling interval for {stage.value}: {interval} seconds"
+                f"{metric.value[0].capitalize()} usage polling interval for {stage.value}:"
+                f" {interval} seconds"
             )
 
+    def _get_container_ids(self) -> List[str]:
+        """
+        Returns the IDs or names of the docker containers running the tool, for samplers reading
+        container cgroups. Can be overridden by `system_metric.<metric>.containers`.
+        """
+        return []
+
+    def _is_using_cgroup_sampler(self, metric: BenchmarkingSystemMetric) -> bool:
+        return "cgroup" == self.config.get("system_metric", {}).get(metric.value[0], {}).get(
+            "sampler", None
+        )
+
+    def _get_container_cgroups(self, metric: BenchmarkingSystemMetric) -> List[ContainerCgroup]:
+        container_ids = (
+            self.config.get("system_metric", {}).get(metric.value[0], {}).get("containers", None)
+        )
+        if container_ids is None:
+            container_ids = self._get_container_ids()
+        if not container_ids:
+            raise Exception(f"No container to sample {metric.value[0]} usage from cgroup")
+        container_cgroups = []
+        for container_id in container_ids:
+            if container_id not in self.__container_cgroups:
+                self.__container_cgroups[container_id] = ContainerCgroup(
+                    container_id, self._docker_client
+                )
+            container_cgroups.append(self.__container_cgroups[container_id])
+        return container_cgroups
+
+    def _acquire_cgroup_memory_breakdown(self) -> Dict[str, int]:
+        breakdown: Dict[str, int] = {}
+        for container_cgroup in self._get_container_cgroups(BenchmarkingSystemMetric.MEMORY):
+            try:
+                container_breakdown = container_cgroup.read_memory_usage()
+            except FileNotFoundError:
+                # The container has been stopped, e.g., between ingestion and query in cold run
+                logger.info(f"cgroup of container {container_cgroup.container_id} disappeared")
+                self.__container_cgroups.pop(container_cgroup.container_id, None)
+                continue
+            for key, value in container_breakdown.items():
+                breakdown[key] = breakdown.get(key, 0) + value
+        return breakdown
+
     def __record_system_metric_polling_sample(
         self, metric: BenchmarkingSystemMetric, mode: BenchmarkingMode
     ):
         for stage in BenchmarkingStage:
             if self.__system_metric_pollers[metric].stage_events[stage].is_set():
-                metric_sample = self._acquire_system_metric_sample(metric)
+                if metric.is_cumulative:
+                    metric_sample = self.__get_cumulative_metric_sample(
+                        metric, self._acquire_system_metric_counters(metric)
+                    )
+                elif self._is_using_cgroup_sampler(metric):
+                    breakdown = self._acquire_cgroup_memory_breakdown()
+                    metric_sample = breakdown.get("tool", 0)
+                    # Kept even if empty, so breakdowns stay aligned with samples
+                    self.benchmarking_reseults[mode].system_metric_results[metric].stage_breakdowns[
+                        stage
+                    ].append(breakdown)
+                else:
+                    metric_sample = self._acquire_system_metric_sample(metric)
                 self.benchmarking_reseults[mode].system_metric_results[metric].stage_results[
                     stage
                 ].append(metric_sample)
+                self.benchmarking_reseults[mode].system_metric_results[metric].stage_timestamps[
+                    stage
+                ].append(time.time_ns())
                 logger.info(
-                    f"Current {metric.value[0]} usage at {stage.value} stage: {metric_sample}{metric.value[1]}"
+                    f"Current {metric.value[0]} usage at {stage.value} stage:"
+                    f" {metric_sample}{metric.value[1]}"
                 )
                 self.__system_metric_pollers[metric].stage_alteration_notifier.wait(
                     self.__system_metric_pollers[metric].stage_polling_intervals[stage]
@@ -334,31 +1830,98 @@ class CPTExecutorBase(ABC):
                     if 0 != mem_total and 0 != mem_free:
                         break
             metric_sample = mem_total - mem_free
-        elif BenchmarkingSystemMetric.CPU == metric:
-            metric_sample = 0
-            # TODO
+        elif metric.is_cumulative:
+            metric_sample = self.__get_cumulative_metric_sample(
+                metric, self._acquire_system_metric_counters(metric)
+            )
         else:
             raise Exception(f"Unknow metric: {metric.value[0]}")
         return metric_sample
 
+    def __get_cumulative_metric_sample(
+        self, metric: BenchmarkingSystemMetric, counters: Dict[str, int]
+    ) -> int:
+        if BenchmarkingSystemMetric.CPU == metric:
+            return counters.get("usage_usec", 0) // 1000
+        # Bytes read and written in KB
+        return (counters.get("rbytes", 0) + counters.get("wbytes", 0)) // 1024
+
+    def _acquire_system_metric_counters(self, metric: BenchmarkingSystemMetric) -> Dict[str, int]:
+        """
+        Returns the cumulative counters of `metric` for the tool. They are read from the cgroups of
+        the tool's containers, or from the resource usage of the harness' terminated child processes
+        for tools running on the host (e.g., grep).
+        """
+        if BenchmarkingSystemMetric.CPU == metric:
+            counters = {"usage_usec": 0, "user_usec": 0, "system_usec": 0}
+        elif BenchmarkingSystemMetric.IO == metric:
+            counters = {"rbytes": 0, "wbytes": 0, "rios": 0, "wios": 0}
+        else:
+            raise Exception(f"Unknow cumulative metric: {metric.value[0]}")
+        metric_config = self.config.get("system_metric", {}).get(metric.value[0], {})
+        if "children" == metric_config.get("sampler", "cgroup") or not (
+            metric_config.get("containers") or self._get_container_ids()
+        ):
+            usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            if BenchmarkingSystemMetric.CPU == metric:
+                counters["user_usec"] = int(usage.ru_utime * 1e6)
+                counters["system_usec"] = int(usage.ru_stime * 1e6)
+                counters["usage_usec"] = counters["user_usec"] + counters["system_usec"]
+            else:
+                # Block I/O is accounted in 512-byte units, the number of operations is unknown
+                counters["rbytes"] = usage.ru_inblock * 512
+                counters["wbytes"] = usage.ru_oublock * 512
+            return counters
+        for container_cgroup in self._get_container_cgroups(metric):
+            try:
+                if BenchmarkingSystemMetric.CPU == metric:
+                    stats = [container_cgroup.read_flat_keyed("cpu.stat")]
+                else:
+                    # One line per block device
+                    stats = list(container_cgroup.read_nested_keyed("io.stat").values())
+            except FileNotFoundError:
+                logger.info(f"cgroup of container {container_cgroup.container_id} disappeared")
+                self.__container_cgroups.pop(container_cgroup.container_id, None)
+                continue
+            for stat in stats:
+                for key in counters:
+                    counters[key] += stat.get(key, 0)
+        return counters
+
     def __poll_system_metrics(self, metric: BenchmarkingSystemMetric, mode: BenchmarkingMode):
         self.__load_system_metric_polling_config(metric)
 
-        while self.__overall_threading_event.is_set():
+        while self.__system_metric_pollers[metric].polling_event.is_set():
             self.__record_system_metric_polling_sample(metric, mode)
 
+    def get_enabled_system_metrics(self) -> List[BenchmarkingSystemMetric]:
+        """
+        Returns the metrics to poll. Memory is polled whenever system metrics are enabled, while the
+        other metrics are polled only if they are configured under `system_metric`.
+        """
+        system_metric_config = self.config.get("system_metric", {})
+        if not system_metric_config.get("enable", False):
+            return []
+        return [
+            metric
+            for metric in BenchmarkingSystemMetric
+            if BenchmarkingSystemMetric.MEMORY == metric or metric.value[0] in system_metric_config
+        ]
+
     def start_polling_system_metric(self, metric: BenchmarkingSystemMetric, mode: BenchmarkingMode):
-        if not self.config.get("system_metric", {}).get("enable", False):
+        if metric not in self.get_enabled_system_metrics():
             return
-        if not self.__overall_threading_event.is_set():
+        if not self.__system_metric_pollers[metric].polling_event.is_set():
             logger.info(f"Start polling {metric.value[0]} usage for mode {mode.value}")
+            if metric.is_cumulative:
+                self.benchmarking_reseults[mode].system_metric_results[metric].result_baseline = -1
             if 0 == self.benchmarking_reseults[mode].system_metric_results[metric].result_baseline:
                 metric_sample = self._acquire_system_metric_sample(metric)
                 self.benchmarking_reseults[mode].system_metric_results[
                     metric
                 ].result_baseline = metric_sample
                 logger.info(f"Initial {metric.value[0]} usage: {metric_sample}{metric.value[1]}")
-            self.__overall_threading_event.set()
+            self.__system_metric_pollers[metric].polling_event.set()
             self.__system_metric_pollers[metric].thread = threading.Thread(
                 target=self.__poll_system_metrics,
                 args=(
@@ -372,10 +1935,12 @@ class CPTExecutorBase(ABC):
             logger.error(f"Already being polling {metric.value[0]} usage for mode {mode.value}")
 
     def stop_polling_system_metric(self, metric: BenchmarkingSystemMetric, mode: BenchmarkingMode):
-        if not self.config.get("system_metric", {}).get("enable", False):
+        if metric not in self.get_enabled_system_metrics():
             return
-        if self.__overall_threading_event.is_set():
+        if metric.is_cumulative:
+            self.__close_stage_counters()
+        if self.__system_metric_pollers[metric].polling_event.is_set():
             logger.info(f"Stop polling {metric.value[0]} usage for mode {mode.value}")
-            self.__overall_threading_event.clear()
+            self.__system_metric_pollers[metric].polling_event.clear()
         else:
             logger.error(f"Already stopped polling {metric.value[0]} usage for mode {mode.value}")
@@ -0,0 +1,427 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dateutil import parser as date_parser
+
+# Retrive logger
+logger = logging.getLogger(__name__)
+
+# Number of log events rendered and written at once
+CHUNK_EVENTS = 4096
+
+# Unit suffixes accepted by `--size`
+SIZE_UNITS: Dict[str, int] = {
+    "": 1,
+    "B": 1,
+    "KB": 1000,
+    "MB": 1000**2,
+    "GB": 1000**3,
+    "TB": 1000**4,
+    "KIB": 1024,
+    "MIB": 1024**2,
+    "GIB": 1024**3,
+    "TIB": 1024**4,
+}
+
+# A variable slot of a template, e.g., `<block>`
+VARIABLE_PATTERN = re.compile(r"<(\w+)>")
+
+HADOOP_TEMPLATES = [
+    "INFO org.apache.hadoop.hdfs.server.common.Storage: Analyzing storage directories for bpid"
+    " BP-<int>-<ip>-<job>",
+    "INFO org.apache.hadoop.hdfs.server.datanode.DataNode: DataTransfer, at <host>:<port>:"
+    " Transmitted BP-<int>-<ip>-<job>:<block> (numBytes=<int>) to /<ip>:<port>",
+    "INFO org.apache.hadoop.yarn.server.nodemanager.containermanager.container.ContainerImpl:"
+    " Container <container> transitioned from <state> to <state>",
+    "DEBUG org.apache.hadoop.mapred.ShuffleHandler: verifying request. enc_str=<token>;"
+    " hash=<token>",
+    "INFO org.apache.hadoop.yarn.server.nodemanager.containermanager.launcher.ContainerLaunch:"
+    " Sending signal to pid <pid> as user <user> for container <container>",
+    "DEBUG org.apache.hadoop.ipc.Server: IPC Server handler <int> on <port>, call"
+    " Call#<int> Retry#0 org.apache.hadoop.hdfs.protocol.ClientProtocol.getFileInfo from"
+    " <ip>:<port>: <int> reply: <int>",
+    "INFO org.apache.hadoop.yarn.server.nodemanager.containermanager.monitor.ContainersMonitorImpl:"
+    " Memory usage of ProcessTree <pid> for container-id <container>: <size> of 2 GB physical"
+    " memory used; <size> of 4.2 GB virtual memory used",
+    "INFO org.apache.hadoop.mapreduce.Job: Running job: <job>",
+    "INFO org.apache.hadoop.hdfs.server.datanode.DataNode: Receiving"
+    " BP-<int>-<ip>-<job>:<block> src: /<ip>:<port> dest: /<ip>:<port>",
+    "INFO org.apache.hadoop.mapred.MapTask: Processing split: <path>:0+<int>",
+    "DEBUG org.apache.hadoop.util.Shell: setsid exited with exit code <exit>",
+    "WARN org.apache.hadoop.hdfs.DFSClient: Slow ReadProcessor read fields took <int>ms"
+    " (threshold=30000ms); ack: seqno: <int> reply: SUCCESS, targets: [<ip>:<port>]",
+]
+
+MONGODB_TEMPLATES = [
+    '{"t":{"$date":"<timestamp>"},"s":"I","c":"NETWORK","id":22943,"ctx":"listener","msg":'
+    '"Connection accepted","attr":{"remote":"<ip>:<port>","uuid":"<uuid>","connectionId":<int>,'
+    '"connectionCount":<int>}}',
+    '{"t":{"$date":"<timestamp>"},"s":"I","c":"NETWORK","id":22944,"ctx":"<conn>","msg":'
+    '"Connection ended","attr":{"remote":"<ip>:<port>","uuid":"<uuid>","connectionId":<int>,'
+    '"connectionCount":<int>}}',
+    '{"t":{"$date":"<timestamp>"},"s":"I","c":"COMMAND","id":51803,"ctx":"<conn>","msg":'
+    '"Slow query","attr":{"type":"command","ns":"ycsb.usertable","command":{"find":"usertable",'
+    '"filter":{"_id":"<key>"},"$db":"ycsb"},"planSummary":"IDHACK","keysExamined":1,'
+    '"docsExamined":1,"numYields":0,"reslen":<int>,"locks":{},"protocol":"op_msg",'
+    '"durationMillis":<int>}}',
+    '{"t":{"$date":"<timestamp>"},"s":"I","c":"STORAGE","id":22430,"ctx":"WTCheckpointThread",'
+    '"msg":"WiredTiger message","attr":{"message":{"ts_sec":<epoch>,"ts_usec":<int>,"thread":'
+    '"<pid>:<hex>","session_name":"WT_SESSION.checkpoint","category":"WT_VERB_CHECKPOINT_PROGRESS",'
+    '"category_id":6,"verbose_level":"DEBUG","verbose_level_id":1,"msg":"saving checkpoint'
+    " snapshot min: <int>, snapshot max: <int> snapshot count: 0, oldest timestamp: (0, 0),"
+    ' meta checkpoint timestamp: (0, 0) base write gen: <int>"}}}',
+    '{"t":{"$date":"<timestamp>"},"s":"I","c":"WTWRTLOG","id":22430,"ctx":"<conn>","msg":'
+    '"WiredTiger message","attr":{"message":{"ts_sec":<epoch>,"ts_usec":<int>,"thread":'
+    '"<pid>:<hex>","session_name":"connection","category":"WT_VERB_LOG","category_id":21,'
+    '"verbose_level":"DEBUG","verbose_level_id":1,"msg":"log_release: sync log <path>"}}}',
+    '{"t":{"$date":"<timestamp>"},"s":"I","c":"WTWRTLOG","id":22430,"ctx":"initandlisten",'
+    '"msg":"WiredTiger message","attr":{"message":{"ts_sec":<epoch>,"ts_usec":<int>,"thread":'
+    '"<pid>:<hex>","session_name":"connection","category":"WT_VERB_LOG","category_id":21,'
+    '"verbose_level":"DEBUG","verbose_level_id":1,"msg":"log_remove: remove log <path>"}}}',
+    '{"t":{"$date":"<timestamp>"},"s":"I","c":"STORAGE","id":22419,"ctx":"FlowControlRefresher",'
+    '"msg":"Trimmed samples","attr":{"numTrimmed":<small>}}',
+    '{"t":{"$date":"<timestamp>"},"s":"I","c":"STORAGE","id":4615611,"ctx":"initandlisten",'
+    '"msg":"MongoDB starting","attr":{"pid":<pid>,"port":<port>,"dbPath":"<path>",'
+    '"architecture":"64-bit","host":"<host>"}}',
+    '{"t":{"$date":"<timestamp>"},"s":"I","c":"TXN","id":51802,"ctx":"<conn>","msg":'
+    '"transaction","attr":{"parameters":{"lsid":{"id":{"$uuid":"<uuid>"}},"txnNumber":<int>,'
+    '"autocommit":false},"readTimestamp":"Timestamp(0, 0)","terminationCause":"committed",'
+    '"timeActiveMicros":<int>,"timeInactiveMicros":<int>,"numYields":0,"locks":{},'
+    '"tickets":{"readTickets":<small>,"writeTickets":<small>}}}',
+]
+
+HADOOP_PACKAGES = ["hdfs", "yarn.server", "mapred", "mapreduce", "ipc", "security", "util"]
+MONGODB_COMPONENTS = ["ACCESS", "COMMAND", "CONTROL", "INDEX", "NETWORK", "REPL", "STORAGE"]
+WORDS = [
+    "block",
+    "buffer",
+    "cache",
+    "checkpoint",
+    "client",
+    "commit",
+    "container",
+    "flush",
+    "heartbeat",
+    "index",
+    "lease",
+    "metric",
+    "node",
+    "queue",
+    "replica",
+    "request",
+    "segment",
+    "session",
+    "shard",
+    "snapshot",
+    "stream",
+    "task",
+    "token",
+    "volume",
+]
+VERBS = ["Allocated", "Closed", "Created", "Finished", "Opened", "Received", "Removed", "Started"]
+STATES = ["NEW", "LOCALIZING", "SCHEDULED", "RUNNING", "EXITED_WITH_SUCCESS", "DONE"]
+TOKEN_CHARACTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+# Generators of each kind of variable's values, the cardinality of the kinds with a fixed set
+VARIABLE_GENERATORS: Dict[str, Callable[[random.Random], str]] = {
+    "int": lambda rng: str(rng.randrange(100000)),
+    "small": lambda rng: str(rng.randrange(128)),
+    "epoch": lambda rng: str(1679400000 + rng.randrange(200000)),
+    "exit": lambda rng: str(rng.choice([0, 0, 0, 1, 143])),
+    "port": lambda rng: str(rng.randrange(1024, 65536)),
+    "pid": lambda rng: str(rng.randrange(1000, 65536)),
+    "ip": lambda rng: f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+    "host": lambda rng: f"worker{rng.randrange(1, 49)}",
+    "user": lambda rng: f"user{rng.randrange(1000)}",
+    "conn": lambda rng: f"conn{rng.randrange(1, 100000)}",
+    "job": lambda rng: f"job_1528179349176_{rng.randrange(100000):04d}",
+    "container": lambda rng: (
+        f"container_1528179349176_{rng.randrange(100000):04d}_01_{rng.randrange(1000000):06d}"
+    ),
+    "block": lambda rng: f"blk_{rng.randrange(1073741825, 1083741825)}_{rng.randrange(2000000)}",
+    "state": lambda rng: rng.choice(STATES),
+    "size": lambda rng: f"{rng.randrange(1, 2048) / 10:.1f} MB",
+    "token": lambda rng: "".join(rng.choice(TOKEN_CHARACTERS) for _ in range(28)),
+    "path": lambda rng: (
+        f"hdfs://master:8200/HiBench/{rng.choice(['Bayes', 'Sort', 'Wordcount'])}"
+        f"/{rng.choice(['Input', 'Output', 'temp'])}/part-{rng.randrange(100000):05d}"
+    ),
+    "key": lambda rng: f"user{rng.getrandbits(63)}",
+    "hex": lambda rng: f"{rng.getrandbits(64):016x}",
+    "uuid": lambda rng: str(uuid.UUID(int=rng.getrandbits(128))),
+}
+
+
+def parse_size(size: str) -> int:
+    """
+    Parses a size such as `512MB` or `10GiB` into bytes.
+    """
+    match = re.fullmatch(r"\s*([0-9.]+)\s*([A-Za-z]*)\s*", size)
+    if match is None or match.group(2).upper() not in SIZE_UNITS:
+        raise Exception(f"Invalid size: {size}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+class LogGenerator:
+    """
+    Generates a deterministic stream of Hadoop-style text log events or MongoDB-style JSON log
+    events. Templates and the values of each kind of variable are derived from `seed`, so every
+    process generating a file of the same dataset uses the same ones.
+    """
+
+    KINDS = ["hadoop", "mongodb"]
+
+    def __init__(self, kind: str, seed: int, nr_templates: int, cardinality: int):
+        if kind not in LogGenerator.KINDS:
+            raise Exception(f"Unknown log kind: {kind}")
+        self.kind = kind
+        rng = random.Random(f"{seed}-templates")
+        base_templates = HADOOP_TEMPLATES if "hadoop" == kind else MONGODB_TEMPLATES
+        templates = base_templates[:nr_templates]
+        while len(templates) < nr_templates:
+            templates.append(self.__create_template(rng, len(templates)))
+        # Each template is split at its timestamp, with `cardinality` renderings of the rest, so
+        # generating an event only picks one of them. Each kind of variable has `cardinality`
+        # distinct values shared by all templates.
+        self.templates: List[Tuple[str, List[str]]] = []
+        pools: Dict[str, List[str]] = {}
+        for template in templates:
+            if "hadoop" == kind:
+                template = "<timestamp> " + template
+            head, body = template.split("<timestamp>", 1)
+            body_format = VARIABLE_PATTERN.sub("%s", body.replace("%", "%%")) + "\n"
+            body_pools = []
+            for variable_kind in VARIABLE_PATTERN.findall(body):
+                if variable_kind not in pools:
+                    generate_value = VARIABLE_GENERATORS[variable_kind]
+                    pools[variable_kind] = [generate_value(rng) for _ in range(cardinality)]
+                body_pools.append(pools[variable_kind])
+            bodies = [
+                body_format % tuple(rng.choice(pool) for pool in body_pools)
+                for _ in range(cardinality)
+            ]
+            self.templates.append((head, bodies))
+        # Templates are Zipf distributed, as few templates make up most of a real log
+        self.cumulative_weights: List[float] = []
+        total_weight = 0.0
+        for i in range(len(self.templates)):
+            total_weight += 1 / (i + 1)
+            self.cumulative_weights.append(total_weight)
+
+    def __create_template(self, rng: random.Random, i: int) -> str:
+        """
+        Creates a template beyond the base ones, shaped like them.
+        """
+        variable_kinds = [kind for kind in VARIABLE_GENERATORS if kind not in ("state", "exit")]
+        message = f"{rng.choice(VERBS)} {rng.choice(WORDS)} <{rng.choice(variable_kinds)}>"
+        if "hadoop" == self.kind:
+            level = rng.choice(["INFO", "INFO", "INFO", "DEBUG", "WARN"])
+            logger_name = f"org.apache.hadoop.{rng.choice(HADOOP_PACKAGES)}.Synthetic{i}"
+            return (
+                f"{level} {logger_name}: {message} for {rng.choice(WORDS)}"
+                f" <{rng.choice(variable_kinds)}>"
+            )
+        attributes = ",".join(
+            f'"{rng.choice(WORDS)}{j}":"<{rng.choice(variable_kinds)}>"'
+            for j in range(rng.randrange(1, 5))
+        )
+        return (
+            f'{{"t":{{"$date":"<timestamp>"}},"s":"I","c":"{rng.choice(MONGODB_COMPONENTS)}",'
+            f'"id":{rng.randrange(20000, 5000000)},"ctx":"<conn>","msg":"{message}",'
+            f'"attr":{{{attributes}}}}}'
+        )
+
+    def __format_second(self, second: int) -> str:
+        """
+        Returns the timestamp up to its milliseconds, which only changes once a second.
+        """
+        date = datetime.fromtimestamp(second, timezone.utc)
+        if "hadoop" == self.kind:
+            return f"{date:%Y-%m-%d %H:%M:%S},"
+        return f"{date:%Y-%m-%dT%H:%M:%S}."
+
+    def write_file(
+        self, path: str, size: int, seed: str, start_time: float, events_per_second: float
+    ) -> int:
+        """
+        Writes log events to `path` until it reaches `size` bytes, streaming them in chunks, with
+        timestamps increasing from `start_time` (in seconds since the epoch). Returns the number of
+        bytes written.
+        """
+        rng = random.Random(seed)
+        next_random = rng.random
+        template_indices = range(len(self.templates))
+        heads = [head for head, _ in self.templates]
+        template_bodies = [bodies for _, bodies in self.templates]
+        nr_template_bodies = [len(bodies) for bodies in template_bodies]
+        max_interval = 2 / events_per_second
+        timestamp = start_time
+        formatted_second = None
+        # The head of each template followed by the timestamp up to its second, and the rest of the
+        # timestamp for each millisecond, so an event is only joined from three strings
+        timestamp_heads = heads
+        timestamp_suffix = "" if "hadoop" == self.kind else "+00:00"
+        timestamp_tails = [f"{millisecond:03d}{timestamp_suffix}" for millisecond in range(1000)]
+        written_size = 0
+        with open(path, "w", encoding="ascii", newline="\n") as log_file:
+            while written_size < size:
+                parts: List[str] = []
+                append = parts.append
+                for template_index in rng.choices(
+                    template_indices, cum_weights=self.cumulative_weights, k=CHUNK_EVENTS
+                ):
+                    timestamp += next_random() * max_interval
+                    second = int(timestamp)
+                    if second != formatted_second:
+                        formatted_second = second
+                        timestamp_prefix = self.__format_second(second)
+                        timestamp_heads = [head + timestamp_prefix for head in heads]
+                    append(timestamp_heads[template_index])
+                    append(timestamp_tails[int((timestamp - second) * 1000)])
+                    bodies = template_bodies[template_index]
+                    append(bodies[int(next_random() * nr_template_bodies[template_index])])
+                data = "".join(parts)
+                # Cut the last chunk at the line reaching `size`
+                if size < written_size + len(data):
+                    data = data[: data.index("\n", size - written_size - 1) + 1]
+                log_file.write(data)
+                written_size += len(data)
+        return written_size
+
+
+# The generator of a worker process, built once by the parent and handed to every worker
+_worker_generator: Optional[LogGenerator] = None
+
+
+def _init_worker(generator: LogGenerator) -> None:
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _generate_file(arguments: Tuple) -> Tuple[str, int, float]:
+    """
+    Generates one file of a dataset in a worker process.
+    """
+    path, size, seed, start_time, events_per_second = arguments
+    begin_time = time.perf_counter()
+    written_size = _worker_generator.write_file(path, size, seed, start_time, events_per_second)
+    return path, written_size, time.perf_counter() - begin_time
+
+
+def generate_main(argv: List[str]) -> int:
+    """
+    Entry of `clp-bench generate`. Returns 0 once every file is written, otherwise 1.
+    """
+    parser = argparse.ArgumentParser(
+        prog="clp-bench generate",
+        description="Generate a deterministic synthetic log dataset.",
+        epilog=(
+            "Each process writes on the order of 100-200 MB/s, so the rate scales with --processes"
+            " up to the number of cores or the disk's bandwidth."
+        ),
+    )
+    parser.add_argument(
+        "kind",
+        type=str,
+        choices=LogGenerator.KINDS,
+        help="Hadoop-style text logs (unstructured) or MongoDB-style JSON logs (semi-structured)",
+    )
+    parser.add_argument("output_dir", type=str, help="The directory to write the dataset to")
+    parser.add_argument(
+        "-s", "--size", type=str, default="1GiB", help="The total size, e.g., 512MB or 10GiB"
+    )
+    parser.add_argument(
+        "-f",
+        "--files",
+        type=int,
+        default=None,
+        help="The number of files, each of a similar size (the number of processes by default)",
+    )
+    parser.add_argument(
+        "-j",
+        "--processes",
+        type=int,
+        default=os.cpu_count(),
+        help="The number of files generated in parallel",
+    )
+    parser.add_argument(
+        "--templates",
+        type=int,
+        default=None,
+        help=(
+            "The number of distinct log templates (the built-in ones by default), beyond the"
+            " built-in ones they are synthesized"
+        ),
+    )
+    parser.add_argument(
+        "--cardinality",
+        type=int,
+        default=10000,
+        help="The number of distinct values of each kind of variable",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the dataset")
+    parser.add_argument(
+        "--start",
+        type=str,
+        default="2023-03-21T00:00:00+00:00",
+        help="The timestamp of the first log event of each file",
+    )
+    parser.add_argument(
+        "--events-per-second",
+        type=float,
+        default=1000,
+        help="The average number of log events per second of each file",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        size = parse_size(args.size)
+        start_time = date_parser.isoparse(args.start).timestamp()
+    except Exception as e:
+        logger.error(f"Invalid argument: {e}")
+        return 1
+    nr_files = args.processes if args.files is None else args.files
+    nr_templates = args.templates
+    if nr_templates is None:
+        nr_templates = len(HADOOP_TEMPLATES if "hadoop" == args.kind else MONGODB_TEMPLATES)
+    os.makedirs(args.output_dir, exist_ok=True)
+    extension = "log" if "hadoop" == args.kind else "json"
+    tasks = []
+    for i in range(nr_files):
+        # The remainder goes to the first files
+        file_size = size // nr_files + (1 if i < size % nr_files else 0)
+        path = os.path.join(args.output_dir, f"{args.kind}-{i:04d}.{extension}")
+        tasks.append((path, file_size, f"{args.seed}-{i}", start_time, args.events_per_second))
+    logger.info(
+        f"Generating {size}B of {args.kind} logs into {nr_files} files in {args.output_dir} with"
+        f" {args.processes} processes"
+    )
+    begin_time = time.perf_counter()
+    total_size = 0
+    try:
+        # Templates and their renderings are built once rather than by every worker
+        generator = LogGenerator(args.kind, args.seed, nr_templates, args.cardinality)
+        with multiprocessing.Pool(args.processes, _init_worker, (generator,)) as pool:
+            for path, written_size, elapsed_time in pool.imap_unordered(_generate_file, tasks):
+                logger.info(
+                    f"Generated {path} ({written_size}B) in {elapsed_time:.3f} seconds,"
+                    f" {written_size / elapsed_time / 1024 / 1024:.2f} MB/s"
+                )
+                total_size += written_size
+    except Exception as e:
+        logger.error(f"Failed to generate the dataset: {e}")
+        return 1
+    elapsed_time = time.perf_counter() - begin_time
+    logger.info(
+        f"Generated {total_size}B in {elapsed_time:.3f} seconds,"
+        f" {total_size / elapsed_time / 1024 / 1024:.2f} MB/s"
+    )
+    return 0
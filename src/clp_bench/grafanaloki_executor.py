@@ -1,11 +1,19 @@
+import functools
+import json
 import logging
-import subprocess
+import os
 import time
-from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
 
 from dateutil import parser
 
-from .executor import BenchmarkingMode, CPTExecutorBase
+from .dataset import list_dataset_files
+from .executor import BenchmarkingMode, CPTExecutorBase, QueryExecutionResult
+from .loki_metrics import LokiMetricsScraper
+from .loki_push import LokiPushLoader, LokiPushStatistics
+from .loki_query import LokiQueryClient
 
 # Retrive logger
 logger = logging.getLogger(__name__)
@@ -16,67 +24,288 @@ class CPTExecutorGrafanaLoki(CPTExecutorBase):
     A service provider for Grafana Loki.
     """
 
+    def __init__(self, config_path: str) -> None:
+        super().__init__(config_path)
+        # Queries go through `logcli` unless Loki's HTTP API is queried directly
+        self.__query_client: Optional[LokiQueryClient] = None
+        if "http" == self.config["loki"].get("query_backend", "logcli"):
+            self.__query_client = LokiQueryClient(
+                self.config["loki"].get("url", "http://localhost:3100")
+            )
+
     def deploy(self, mode: BenchmarkingMode):
         logger.info("Deploying Grafana Loki")
-        pass
+        if self.config["loki"].get("push", {}).get("enable", False):
+            url = self.config["loki"].get("url", "http://localhost:3100")
+            logger.info(f"Grafana Loki URL: {url}")
+            dataset_path = self.config["loki"]["dataset_path"]
+            logger.info(f"Grafana Loki dataset location: {dataset_path}")
 
     def ingest(self, mode: BenchmarkingMode):
         super().ingest(mode)
         logger.info("Ingesting data for Grafana Loki")
-        # When launched the loki and promtail containers, the ingestion is automatically started
-        # You could query the current ingested bytes by:
-        # curl -G http://localhost:3100/metrics | grep 'loki_distributor_bytes_received_total'
-        # You could query the current compression size by:
-        # curl -G http://localhost:3100/metrics | grep 'loki_chunk_store_stored_chunk_bytes_total'
-        # You could query the ingestion time by:
-        # curl -G http://localhost:3100/metrics | grep 'loki_request_duration_seconds_sum{method="POST",route="loki_api_v1_push"'
-        pass
+        metrics_config = self.config["loki"].get("metrics", {})
+        scraper = None
+        if metrics_config.get("enable", False):
+            scraper = LokiMetricsScraper(
+                self.config["loki"].get("url", "http://localhost:3100"),
+                metrics_config.get("interval", 1),
+            )
+            scraper.start()
+        try:
+            statistics = None
+            if self.config["loki"].get("push", {}).get("enable", False):
+                statistics = self.__push_dataset(mode)
+            # Otherwise, when launched the loki and promtail containers, the ingestion is
+            # automatically started, and only its metrics tell when it finishes
+            if scraper is not None:
+                self.__measure_ingest(mode, scraper, statistics)
+        finally:
+            if scraper is not None:
+                scraper.stop()
+
+    def __measure_ingest(
+        self,
+        mode: BenchmarkingMode,
+        scraper: LokiMetricsScraper,
+        statistics: Optional[LokiPushStatistics],
+    ):
+        """
+        Waits for Loki to receive the whole dataset, which is complete once the received bytes reach
+        what was pushed, or stop changing, and then for its chunks to be flushed, to measure the
+        compressed size.
+        """
+        metrics_config = self.config["loki"].get("metrics", {})
+        stable_duration = metrics_config.get("stable_duration", 10)
+        timeout = metrics_config.get("timeout", 7200)
+        grace_period = metrics_config.get("grace_period", 300)
+        result = self.benchmarking_reseults[mode]
+        baseline = scraper.samples[0]
+        target = None
+        if statistics is not None:
+            # Loki counts the bytes of log lines without their newlines
+            target = baseline.received_bytes + statistics.nr_bytes - statistics.nr_entries
+        completion = scraper.wait_until_stable(
+            lambda sample: sample.received_bytes, stable_duration, timeout, target, grace_period
+        )
+        samples = [
+            sample for sample in scraper.get_samples() if sample.timestamp <= completion.timestamp
+        ]
+        result.ingest_progress = [
+            (sample.timestamp, int(sample.received_bytes - baseline.received_bytes))
+            for sample in samples
+        ]
+        received_bytes = int(completion.received_bytes - baseline.received_bytes)
+        logger.info(f"Grafana Loki received {received_bytes}B of log lines")
+        if statistics is None:
+            if 0 == baseline.received_bytes:
+                # Ingestion started after the last sample before the received bytes grew
+                start_sample = max(
+                    (sample for sample in samples if 0 == sample.received_bytes),
+                    key=lambda sample: sample.timestamp,
+                )
+                result.ingest_e2e_latency = completion.timestamp - start_sample.timestamp
+            else:
+                logger.warning(
+                    "Ingestion started before the metrics were scraped, using the total duration"
+                    " of push requests as the ingest latency"
+                )
+                result.ingest_e2e_latency = int(completion.push_duration * 1e9)
+            dataset_path = self.config["loki"].get("dataset_path", None)
+            if dataset_path is not None:
+                result.decompressed_size = sum(
+                    file_size for _, file_size in list_dataset_files(dataset_path)
+                )
+            else:
+                result.decompressed_size = received_bytes
+        logger.info(f"Grafana Loki ingest e2e latency: {result.ingest_e2e_latency / 1e9:.9f}s")
+
+        if metrics_config.get("flush", True):
+            scraper.flush()
+        stored = scraper.wait_until_stable(
+            lambda sample: sample.stored_chunk_bytes,
+            stable_duration,
+            timeout,
+            grace_period=grace_period,
+        )
+        result.compressed_size = int(stored.stored_chunk_bytes - baseline.stored_chunk_bytes)
+        logger.info(f"File size after compression: {result.compressed_size}B")
+        if 0 < result.compressed_size:
+            result.ratio = result.decompressed_size / result.compressed_size
+            logger.info(f"Compression ratio: {result.ratio}x")
+
+    def __push_dataset(self, mode: BenchmarkingMode) -> LokiPushStatistics:
+        """
+        Pushes the dataset to Loki from the harness instead of promtail, so the ingestion is timed.
+        """
+        push_config = self.config["loki"]["push"]
+        dataset_path = self.config["loki"]["dataset_path"]
+        loader = LokiPushLoader(
+            self.config["loki"].get("url", "http://localhost:3100"),
+            {"job": self.config["loki"]["job"]},
+            push_config.get("workers", os.cpu_count()),
+            push_config.get("batch_size", 1 << 20),
+            "line" == push_config.get("timestamps", "line"),
+        )
+        statistics = loader.load(dataset_path)
+        self.benchmarking_reseults[mode].decompressed_size = statistics.nr_bytes
+        self.benchmarking_reseults[mode].ingest_e2e_latency = int(statistics.elapsed_time * 1e9)
+        logger.info(
+            f"Grafana Loki ingested {statistics.nr_entries} log lines ({statistics.nr_bytes}B) from"
+            f" {dataset_path} with {statistics.nr_requests} push requests"
+            f" ({statistics.nr_compressed_bytes}B gzipped) in {statistics.elapsed_time:.9f}"
+            f" seconds, {statistics.get_throughput() / 1024 / 1024:.2f} MB/s"
+        )
+        return statistics
 
     def run_query_benchmark(self, mode: BenchmarkingMode):
         super().run_query_benchmark(mode)
         logger.info("Running query benchmark for Grafana Loki")
-        logcli_binary_path = self.config["loki"]["logcli_binary_path"]
+        queries = self._get_queries()
+        for query in queries:
+            self._run_query_trials(mode, query)
+
+    def _get_container_ids(self) -> List[str]:
+        return self.config["loki"].get("container_ids", ["loki", "promtail"])
+
+    def _get_queries(self) -> List[str]:
+        return self.config["loki"]["queries"]
+
+    def _run_empty_query(self) -> Optional[QueryExecutionResult]:
+        if self.__query_client is not None:
+            return self.__query_client.ping()
+        return self._execute_query("true")
+
+    def _run_query(self, query: str) -> QueryExecutionResult:
+        logcli_binary_path = self.config["loki"].get("logcli_binary_path", "logcli")
         job = self.config["loki"]["job"]
         limit = self.config["loki"]["limit"]
         batch = self.config["loki"]["batch"]
-        from_ts = self.config["loki"]["from"]
-        to_ts = self.config["loki"]["to"]
-        queries = self.config["loki"]["queries"]
-
-        start_time = parser.isoparse(from_ts)
-        end_time = parser.isoparse(to_ts)
-        interval = timedelta(minutes=self.config.get("loki", {}).get("interval", 10))
-        for query in queries:
-            current_time = start_time
-            total_query_latency = 0
-            total_nr_matched_log_lines = 0
-            while current_time <= end_time - interval:
-                command = (
-                    f"{logcli_binary_path} query "
-                    + "'{ job="
-                    + f'"{job}"'
-                    + "} |~ "
-                    + query
-                    + f"' --limit={limit} --batch={batch} "
-                    + f'--from="{current_time.isoformat()}" --to="{(current_time + interval).isoformat()}" | wc -l'
+        window_queries = []
+        for window_start, window_end in self.__get_windows():
+            if self.__query_client is not None:
+                window_queries.append(
+                    functools.partial(
+                        self.__query_client.query_range,
+                        "{ job=" + f'"{job}"' + "} |~ " + query,
+                        window_start,
+                        window_end,
+                        limit,
+                        batch,
+                    )
                 )
-                logger.info(f"Executing command: {command}")
-                start_ts = time.perf_counter_ns()
-                result = subprocess.run(
-                    command,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.DEVNULL,
-                    shell=True,
-                    check=True,
+                continue
+            command = (
+                f"{logcli_binary_path} query "
+                + "'{ job="
+                + f'"{job}"'
+                + "} |~ "
+                + query
+                + f"' --limit={limit} --batch={batch} "
+                + f'--from="{window_start.isoformat()}" --to="{window_end.isoformat()}"'
+            )
+            window_queries.append(functools.partial(self._execute_query, command))
+        result = self.__run_windows(window_queries)
+        logger.info(f"Number of matched log lines: {result.nr_matched_log_lines}")
+        return result
+
+    def _run_count_query(self, query: str) -> Optional[QueryExecutionResult]:
+        logcli_binary_path = self.config["loki"].get("logcli_binary_path", "logcli")
+        job = self.config["loki"]["job"]
+        interval_minutes = self.config.get("loki", {}).get("interval", 10)
+        # Count the matches of each window as `_run_query` retrieves them, at the window's end
+        expression = (
+            "sum(count_over_time({ job="
+            + f'"{job}"'
+            + "} |~ "
+            + query
+            + f" [{interval_minutes}m]))"
+        )
+        window_queries = []
+        for _, window_end in self.__get_windows():
+            if self.__query_client is not None:
+                window_queries.append(
+                    functools.partial(self.__query_client.count, expression, window_end)
                 )
-                end_ts = time.perf_counter_ns()
-                total_query_latency += (end_ts - start_ts) / 1e9
-                total_nr_matched_log_lines += int(result.stdout.decode("utf-8").strip())
-                current_time += interval
-            logger.info(f"Number of matched log lines: {total_nr_matched_log_lines}")
-            self.benchmarking_reseults[mode].query_e2e_latencies.append(
-                f"{total_query_latency:.9f}s"
+                continue
+            command = (
+                f"{logcli_binary_path} instant-query '{expression}' "
+                + f'--now="{window_end.isoformat()}"'
             )
+            window_queries.append(functools.partial(self._execute_count_query, command))
+        result = self.__run_windows(window_queries)
+        logger.info(f"Number of matched log lines: {result.nr_matched_log_lines}")
+        return result
+
+    def __get_windows(self) -> List[Tuple[datetime, datetime]]:
+        """
+        Splits the range from `from` to `to` into windows of `interval` minutes.
+        """
+        start_time = parser.isoparse(self.config["loki"]["from"])
+        end_time = parser.isoparse(self.config["loki"]["to"])
+        interval = timedelta(minutes=self.config.get("loki", {}).get("interval", 10))
+        windows = []
+        current_time = start_time
+        while current_time <= end_time - interval:
+            windows.append((current_time, current_time + interval))
+            current_time += interval
+        return windows
+
+    def __run_windows(
+        self, window_queries: List[Callable[[], QueryExecutionResult]]
+    ) -> QueryExecutionResult:
+        """
+        Runs the query of each window, `loki.window_parallelism` of them at a time as Grafana
+        splits a query by time. The latency is the wall-clock latency of all windows, and the summed
+        latency is the sum of their latencies.
+        """
+        parallelism = self.config["loki"].get("window_parallelism", 1)
+        result = QueryExecutionResult(0, 0)
+        result.summed_latency = 0
+        if 1 == parallelism:
+            # Windows run one after another, so the first byte and first result of the query arrive
+            # in the first window with output
+            window_executions = []
+            for window_query in window_queries:
+                window_executions.append((result.latency, window_query()))
+                result.latency += window_executions[-1][1].latency
+        else:
+            begin_time = time.perf_counter()
+
+            def execute_window(
+                window_query: Callable[[], QueryExecutionResult],
+            ) -> Tuple[float, QueryExecutionResult]:
+                return time.perf_counter() - begin_time, window_query()
+
+            with ThreadPoolExecutor(max_workers=parallelism) as pool:
+                window_executions = list(pool.map(execute_window, window_queries))
+            result.latency = time.perf_counter() - begin_time
+        for offset, execution in window_executions:
+            result.summed_latency += execution.latency
+            result.nr_matched_log_lines += execution.nr_matched_log_lines
+            if execution.nr_output_bytes is not None:
+                result.nr_output_bytes = (result.nr_output_bytes or 0) + execution.nr_output_bytes
+            if execution.time_to_first_byte is not None:
+                time_to_first_byte = offset + execution.time_to_first_byte
+                if (
+                    result.time_to_first_byte is None
+                    or time_to_first_byte < result.time_to_first_byte
+                ):
+                    result.time_to_first_byte = time_to_first_byte
+            if execution.time_to_first_result is not None:
+                time_to_first_result = offset + execution.time_to_first_result
+                if (
+                    result.time_to_first_result is None
+                    or time_to_first_result < result.time_to_first_result
+                ):
+                    result.time_to_first_result = time_to_first_result
+        return result
+
+    def _parse_count_output(self, output: str) -> int:
+        # logcli prints the instant vector as JSON, which is empty without any match
+        if not output.strip():
+            return 0
+        return sum(int(float(sample["value"][1])) for sample in json.loads(output))
 
     def launch(self, mode: BenchmarkingMode):
         logger.info("Launching Grafana Loki")
@@ -85,6 +314,7 @@ class CPTExecutorGrafanaLoki(CPTExecutorBase):
     def mid_terminate(self, mode: BenchmarkingMode):
         super().mid_terminate(mode)
         self.terminate(mode)
+        self._clear_os_caches()
 
     def terminate(self, mode: BenchmarkingMode):
         logger.info("Terminating Grafana Loki")
@@ -1,6 +1,7 @@
 import logging
+from typing import Dict, List, Optional
 
-from .executor import BenchmarkingMode, CPTExecutorBase
+from .executor import BenchmarkingMode, CPTExecutorBase, QueryExecutionResult
 
 # Retrive logger
 logger = logging.getLogger(__name__)
@@ -23,15 +24,37 @@ class CPTExecutorGrep(CPTExecutorBase):
     def run_query_benchmark(self, mode: BenchmarkingMode):
         super().run_query_benchmark(mode)
         logger.info("Running query benchmark for grep")
-        dataset_path = self.config["grep"]["dataset_path"]
-        queries = self.config["grep"]["queries"]
+        queries = self._get_queries()
         for query in queries:
-            command = f"grep -r {query} {dataset_path}"
-            self._execute_query(mode, command)
+            self._run_query_trials(mode, query)
+
+    def _get_tool_config(self) -> Optional[Dict]:
+        return self.config["grep"]
+
+    def _get_queries(self) -> List[str]:
+        return self.config["grep"]["queries"]
+
+    def _run_empty_query(self) -> Optional[QueryExecutionResult]:
+        return self._execute_query("true")
+
+    def _run_query(self, query: str) -> QueryExecutionResult:
+        dataset_path = self.config["grep"]["dataset_path"]
+        command = f"grep -r {query} {dataset_path}"
+        return self._execute_query(command)
+
+    def _run_count_query(self, query: str) -> Optional[QueryExecutionResult]:
+        dataset_path = self.config["grep"]["dataset_path"]
+        command = f"grep -r -c -h {query} {dataset_path}"
+        return self._execute_count_query(command)
 
     def mid_terminate(self, mode: BenchmarkingMode):
         super().mid_terminate(mode)
         self.terminate(mode)
+        self._clear_os_caches()
+
+    def _get_archive_paths(self) -> List[str]:
+        # grep searches the raw dataset directly
+        return [self.config["grep"]["dataset_path"]]
 
     def launch(self, mode: BenchmarkingMode):
         logger.info("Launching grep")
@@ -0,0 +1,155 @@
+import logging
+import re
+import threading
+import time
+import urllib.request
+from typing import Callable, Dict, List, Optional
+
+# Retrive logger
+logger = logging.getLogger(__name__)
+
+# Bytes of log lines received by the distributors
+RECEIVED_BYTES_METRIC = "loki_distributor_bytes_received_total"
+# Bytes of the chunks flushed to the store
+STORED_CHUNK_BYTES_METRIC = "loki_chunk_store_stored_chunk_bytes_total"
+# Time spent serving requests, of which the push route is the time spent ingesting
+REQUEST_DURATION_SUM_METRIC = "loki_request_duration_seconds_sum"
+PUSH_ROUTE = "loki_api_v1_push"
+
+# A sample line of the Prometheus text format, e.g., `name{label="value"} 1.5e+06`
+SAMPLE_PATTERN = re.compile(r"([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)")
+LABEL_PATTERN = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_metrics(text: str) -> Dict[str, List[tuple]]:
+    """
+    Parses the Prometheus text format into the labels and value of each series, by metric name.
+    """
+    metrics: Dict[str, List[tuple]] = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = SAMPLE_PATTERN.match(line)
+        if match is None:
+            continue
+        labels = dict(LABEL_PATTERN.findall(match.group(2) or ""))
+        metrics.setdefault(match.group(1), []).append((labels, float(match.group(3))))
+    return metrics
+
+
+def sum_metric(metrics: Dict[str, List[tuple]], name: str, **label_filters: str) -> float:
+    """
+    Returns the sum of the series of a metric whose labels match `label_filters`.
+    """
+    return sum(
+        value
+        for labels, value in metrics.get(name, [])
+        if all(labels.get(label) == expected for label, expected in label_filters.items())
+    )
+
+
+class LokiMetricsSample:
+    """
+    The ingest counters of Loki at a point in time.
+    """
+
+    def __init__(self, timestamp: int, metrics: Dict[str, List[tuple]]):
+        self.timestamp: int = timestamp  # Unit: nanosecond since the epoch
+        self.received_bytes: float = sum_metric(metrics, RECEIVED_BYTES_METRIC)
+        self.stored_chunk_bytes: float = sum_metric(metrics, STORED_CHUNK_BYTES_METRIC)
+        self.push_duration: float = sum_metric(
+            metrics, REQUEST_DURATION_SUM_METRIC, method="POST", route=PUSH_ROUTE
+        )  # Unit: second
+
+
+class LokiMetricsScraper:
+    """
+    Polls Loki's `/metrics` endpoint from a background thread, keeping a sample of the ingest
+    counters every `interval` seconds.
+    """
+
+    def __init__(self, url: str, interval: float):
+        self.url = url.rstrip("/")
+        self.interval = interval
+        self.samples: List[LokiMetricsSample] = []
+        self.__lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    def scrape(self) -> LokiMetricsSample:
+        with urllib.request.urlopen(f"{self.url}/metrics", timeout=60) as response:
+            text = response.read().decode("utf-8")
+        return LokiMetricsSample(time.time_ns(), parse_metrics(text))
+
+    def start(self) -> None:
+        self.samples = [self.scrape()]
+        self.__stop_event.clear()
+        self.__thread = threading.Thread(target=self.__poll, daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def get_samples(self) -> List[LokiMetricsSample]:
+        with self.__lock:
+            return list(self.samples)
+
+    def __poll(self) -> None:
+        while not self.__stop_event.wait(self.interval):
+            try:
+                sample = self.scrape()
+            except Exception as e:
+                logger.warning(f"Failed to scrape Loki's metrics: {e}")
+                continue
+            with self.__lock:
+                self.samples.append(sample)
+
+    def wait_until_stable(
+        self,
+        get_value: Callable[[LokiMetricsSample], float],
+        stable_duration: float,
+        timeout: float,
+        target: Optional[float] = None,
+        grace_period: float = 300,
+    ) -> LokiMetricsSample:
+        """
+        Waits until the positive value that `get_value` reads from each sample reaches `target`, or
+        stops changing for `stable_duration` seconds since the call. Returns the first sample with
+        the final value. Fails if the value is still 0 after `grace_period` seconds, as Loki is then
+        likely not receiving anything (e.g., Promtail is not running, or the URL is wrong).
+        """
+        begin_timestamp = time.time_ns()
+        begin_time = time.monotonic()
+        while True:
+            samples = self.get_samples()
+            last_sample = samples[-1]
+            last_value = get_value(last_sample)
+            first_sample = last_sample
+            for sample in reversed(samples):
+                if get_value(sample) != last_value:
+                    break
+                first_sample = sample
+            if target is not None and target <= last_value:
+                return first_sample
+            stable_since = max(first_sample.timestamp, begin_timestamp)
+            if 0 < last_value and stable_duration * 1e9 <= last_sample.timestamp - stable_since:
+                return first_sample
+            if 0 == last_value and grace_period <= time.monotonic() - begin_time:
+                raise Exception(
+                    f"Loki's metrics stayed at 0 for {grace_period} seconds, check that it receives"
+                    " logs"
+                )
+            if timeout <= time.monotonic() - begin_time:
+                raise Exception(f"Loki's metrics did not settle within {timeout} seconds")
+            time.sleep(self.interval)
+
+    def flush(self) -> None:
+        """
+        Asks the ingesters to flush their in-memory chunks to the store.
+        """
+        request = urllib.request.Request(f"{self.url}/flush", method="POST")
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
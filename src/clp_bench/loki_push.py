@@ -0,0 +1,231 @@
+import calendar
+import gzip
+import http.client
+import json
+import logging
+import queue
+import re
+import threading
+import time
+import urllib.parse
+from typing import Dict, List, Optional, Tuple
+
+from .dataset import list_dataset_files
+
+# Retrive logger
+logger = logging.getLogger(__name__)
+
+# Path of Loki's push API
+LOKI_PUSH_PATH = "/loki/api/v1/push"
+
+# A timestamp leading a log line, e.g., `2018-06-05 06:15:29,701`, taken as UTC
+LINE_TIMESTAMP_PATTERN = re.compile(r"(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})(?:[,.](\d{1,9}))?")
+
+# Status codes of a push worth retrying, i.e., rate limiting and server errors
+RETRIED_STATUSES = (429, 500, 502, 503, 504)
+
+
+class LokiPushStatistics:
+    """
+    Totals of a load into Loki.
+    """
+
+    def __init__(self) -> None:
+        self.nr_bytes = 0  # Unit: byte, of the log lines read including their newlines
+        self.nr_entries = 0
+        self.nr_requests = 0
+        self.nr_compressed_bytes = 0  # Unit: byte, of the gzipped request bodies
+        self.elapsed_time = 0.0  # Unit: second
+
+    def get_throughput(self) -> float:
+        """
+        Returns the ingest throughput in bytes per second.
+        """
+        if 0 == self.elapsed_time:
+            return 0
+        return self.nr_bytes / self.elapsed_time
+
+
+class LokiPushLoader:
+    """
+    Streams the files of a dataset into Loki's push API. The calling thread reads the lines into
+    batches of about `batch_size` bytes, each being a gzipped push request with a stream per file,
+    and a pool of `nr_workers` threads pushes them, each over its own connection. The queue of
+    batches is bounded, so memory usage does not grow with the dataset.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        labels: Dict[str, str],
+        nr_workers: int,
+        batch_size: int,
+        use_line_timestamps: bool,
+        max_retries: int = 5,
+        timeout: float = 600,
+    ) -> None:
+        self.url = urllib.parse.urlsplit(url)
+        self.labels = labels
+        self.nr_workers = nr_workers
+        self.batch_size = batch_size
+        self.use_line_timestamps = use_line_timestamps
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.__batches: queue.Queue = queue.Queue(maxsize=2 * nr_workers)
+        self.__lock = threading.Lock()
+        self.__error: Optional[Exception] = None
+        self.__statistics = LokiPushStatistics()
+        # The batch being read, with the lines of each file in their own stream
+        self.__batch_streams: List[Tuple[Dict[str, str], List[List[str]]]] = []
+        self.__batch_bytes = 0
+        # Epoch second of each date and time, as lines of the same second share it
+        self.__parsed_seconds: Dict[str, int] = {}
+
+    def load(self, dataset_path: str) -> LokiPushStatistics:
+        """
+        Pushes every line of the dataset, and returns once Loki acknowledged all of them.
+        """
+        self.__error = None
+        self.__statistics = LokiPushStatistics()
+        self.__batch_streams = []
+        self.__batch_bytes = 0
+        begin_time = time.perf_counter()
+        workers = [
+            threading.Thread(target=self.__push_batches, name=f"loki-push-{i}", daemon=True)
+            for i in range(self.nr_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for file_path, _ in list_dataset_files(dataset_path):
+                if self.__error is not None:
+                    break
+                self.__read_file(file_path)
+            self.__flush_batch()
+        except Exception as e:
+            self.__set_error(e)
+        finally:
+            for _ in workers:
+                self.__batches.put(None)
+            for worker in workers:
+                worker.join()
+        self.__statistics.elapsed_time = time.perf_counter() - begin_time
+        if self.__error is not None:
+            raise Exception(f"Failed to push to Loki: {self.__error}")
+        return self.__statistics
+
+    def __read_file(self, file_path: str) -> None:
+        stream_values: List[List[str]] = []
+        self.__batch_streams.append(({**self.labels, "filename": file_path}, stream_values))
+        # Lines without a timestamp, e.g., of a stack trace, take the one of the line before
+        timestamp = time.time_ns()
+        with open(file_path, "rb") as log_file:
+            for raw_line in log_file:
+                line = raw_line.decode("utf-8", errors="replace")
+                if self.use_line_timestamps:
+                    timestamp = self.__parse_timestamp(line, timestamp)
+                else:
+                    timestamp = time.time_ns()
+                stream_values.append([str(timestamp), line.rstrip("\n")])
+                self.__batch_bytes += len(raw_line)
+                if self.batch_size <= self.__batch_bytes:
+                    self.__flush_batch()
+                    if self.__error is not None:
+                        return
+                    stream_values = []
+                    self.__batch_streams.append(
+                        ({**self.labels, "filename": file_path}, stream_values)
+                    )
+
+    def __parse_timestamp(self, line: str, previous_timestamp: int) -> int:
+        match = LINE_TIMESTAMP_PATTERN.match(line)
+        if match is None:
+            return previous_timestamp
+        date_time = f"{match.group(1)} {match.group(2)}"
+        second = self.__parsed_seconds.get(date_time)
+        if second is None:
+            second = calendar.timegm(time.strptime(date_time, "%Y-%m-%d %H:%M:%S"))
+            self.__parsed_seconds[date_time] = second
+        fraction = match.group(3) or "0"
+        return second * 1000000000 + int(fraction.ljust(9, "0"))
+
+    def __flush_batch(self) -> None:
+        streams = [(labels, values) for labels, values in self.__batch_streams if values]
+        if streams:
+            self.__batches.put((streams, self.__batch_bytes))
+        self.__batch_streams = []
+        self.__batch_bytes = 0
+
+    def __push_batches(self) -> None:
+        connection = self.__connect()
+        try:
+            while True:
+                batch = self.__batches.get()
+                if batch is None:
+                    return
+                # Keep draining the queue after a failure, so the reader never blocks
+                if self.__error is not None:
+                    continue
+                streams, nr_bytes = batch
+                try:
+                    body = gzip.compress(
+                        json.dumps(
+                            {
+                                "streams": [
+                                    {"stream": labels, "values": values}
+                                    for labels, values in streams
+                                ]
+                            }
+                        ).encode("utf-8"),
+                        compresslevel=1,
+                    )
+                    connection = self.__push(connection, body)
+                except Exception as e:
+                    self.__set_error(e)
+                    continue
+                with self.__lock:
+                    self.__statistics.nr_bytes += nr_bytes
+                    self.__statistics.nr_entries += sum(len(values) for _, values in streams)
+                    self.__statistics.nr_requests += 1
+                    self.__statistics.nr_compressed_bytes += len(body)
+        finally:
+            connection.close()
+
+    def __connect(self) -> http.client.HTTPConnection:
+        if "https" == self.url.scheme:
+            return http.client.HTTPSConnection(self.url.netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(self.url.netloc, timeout=self.timeout)
+
+    def __push(
+        self, connection: http.client.HTTPConnection, body: bytes
+    ) -> http.client.HTTPConnection:
+        """
+        Sends a push request, retrying with an exponential backoff on rate limiting, server errors,
+        and broken connections. Returns the connection to reuse.
+        """
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        path = self.url.path.rstrip("/") + LOKI_PUSH_PATH
+        for attempt in range(self.max_retries + 1):
+            try:
+                connection.request("POST", path, body=body, headers=headers)
+                response = connection.getresponse()
+                message = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                if self.max_retries == attempt:
+                    raise
+                logger.warning(f"Push to Loki failed, retrying: {e}")
+                connection.close()
+                connection = self.__connect()
+            else:
+                if 200 <= response.status < 300:
+                    return connection
+                if response.status not in RETRIED_STATUSES or self.max_retries == attempt:
+                    raise Exception(f"Loki responded {response.status}: {message[:512]!r}")
+                logger.warning(f"Loki responded {response.status}, retrying")
+            time.sleep(min(2**attempt * 0.1, 10))
+        raise Exception(f"Failed to push to Loki after {self.max_retries} retries")
+
+    def __set_error(self, error: Exception) -> None:
+        with self.__lock:
+            if self.__error is None:
+                self.__error = error
@@ -0,0 +1,324 @@
+import codecs
+import http.client
+import json
+import logging
+import re
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .executor import QUERY_READ_BUFFER_SIZE, QueryExecutionResult, QueryOutputCounter
+
+# Retrive logger
+logger = logging.getLogger(__name__)
+
+# Paths of Loki's query APIs
+LOKI_QUERY_RANGE_PATH = "/loki/api/v1/query_range"
+LOKI_QUERY_PATH = "/loki/api/v1/query"
+LOKI_READY_PATH = "/ready"
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# The containers descended into by `_StreamsParser`, by the container they are in and their key,
+# as their role and whether they are objects. Any other value is decoded whole.
+_STREAMS_PARSER_CONTAINERS = {
+    (None, None): ("root", True),
+    ("root", "data"): ("data", True),
+    ("data", "result"): ("result", False),
+    ("result", None): ("stream", True),
+    ("stream", "values"): ("values", False),
+}
+
+
+def _to_ns(time_point: datetime) -> int:
+    return int(time_point.timestamp()) * 1000000000 + time_point.microsecond * 1000
+
+
+class _StreamsParser:
+    """
+    Incrementally parses the body of a `query_range` response of streams as its chunks arrive, and
+    returns the entries of `data.result[].values[]` as `(timestamp, labels, line)` tuples as soon as
+    each of them is complete. Only the containers leading to the entries are descended into, so any
+    other value, e.g., `stream` or `stats`, is decoded whole once it is complete. The labels of an
+    entry are the ones of the `stream` before its `values`, in the order Loki writes them.
+    """
+
+    def __init__(self) -> None:
+        self.__text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.__json_decoder = json.JSONDecoder()
+        self.__buffer = ""
+        self.__position = 0
+        # The containers being parsed, as [role, is_object, state, key], where the state is what is
+        # expected next
+        self.__containers: List[list] = []
+        self.__labels = ""
+        self.__finished = False
+
+    def feed(self, data: bytes, final: bool = False) -> List[Tuple[str, str, str]]:
+        self.__buffer = self.__buffer[self.__position :] + self.__text_decoder.decode(data, final)
+        self.__position = 0
+        entries: List[Tuple[str, str, str]] = []
+        while self.__parse_next(entries, final):
+            pass
+        if final and not self.__finished:
+            raise Exception(f"Incomplete response from Loki: {self.__buffer[:512]!r}")
+        return entries
+
+    def __parse_next(self, entries: List[Tuple[str, str, str]], final: bool) -> bool:
+        """
+        Parses the next token or value of the buffer, and returns whether to continue, i.e., whether
+        the buffer held all of it.
+        """
+        self.__position = _WHITESPACE.match(self.__buffer, self.__position).end()
+        if len(self.__buffer) == self.__position:
+            return False
+        if self.__finished:
+            raise Exception(f"Unexpected data after Loki's response: {self.__buffer[:512]!r}")
+        character = self.__buffer[self.__position]
+        if not self.__containers:
+            return self.__parse_value(None, None, character, entries, final)
+        container = self.__containers[-1]
+        role, is_object, state, key = container
+        if ("}" if is_object else "]") == character and state in ("first", "next"):
+            self.__position += 1
+            self.__containers.pop()
+            self.__finished = not self.__containers
+            return True
+        if "next" == state:
+            if "," != character:
+                raise Exception(f"Unexpected response from Loki: {self.__buffer[:512]!r}")
+            self.__position += 1
+            container[2] = "key" if is_object else "value"
+        elif is_object and state in ("first", "key"):
+            if '"' != character:
+                raise Exception(f"Unexpected response from Loki: {self.__buffer[:512]!r}")
+            key = self.__decode(final)
+            if key is None:
+                return False
+            container[2] = "colon"
+            container[3] = key
+        elif "colon" == state:
+            if ":" != character:
+                raise Exception(f"Unexpected response from Loki: {self.__buffer[:512]!r}")
+            self.__position += 1
+            container[2] = "value"
+        else:
+            if not self.__parse_value(role, key, character, entries, final):
+                return False
+            container[2] = "next"
+        return True
+
+    def __parse_value(
+        self,
+        parent_role: Optional[str],
+        key: Optional[str],
+        character: str,
+        entries: List[Tuple[str, str, str]],
+        final: bool,
+    ) -> bool:
+        if (parent_role, key) in _STREAMS_PARSER_CONTAINERS:
+            role, is_object = _STREAMS_PARSER_CONTAINERS[(parent_role, key)]
+            if ("{" if is_object else "[") == character:
+                self.__position += 1
+                self.__containers.append([role, is_object, "first", None])
+                if "stream" == role:
+                    self.__labels = ""
+                return True
+        value = self.__decode(final)
+        if value is None:
+            return False
+        if "values" == parent_role:
+            timestamp, line = value
+            entries.append((timestamp, self.__labels, line))
+        elif "stream" == parent_role and "stream" == key:
+            self.__labels = json.dumps(value, sort_keys=True)
+        return True
+
+    def __decode(self, final: bool):
+        """
+        Decodes the value at the position, or returns None if the buffer does not hold all of it.
+        """
+        try:
+            value, end = self.__json_decoder.raw_decode(self.__buffer, self.__position)
+        except json.JSONDecodeError:
+            if final:
+                raise Exception(f"Malformed response from Loki: {self.__buffer[:512]!r}")
+            return None
+        # A number at the end of the buffer may continue in the next chunk
+        if (
+            not final
+            and len(self.__buffer) == end
+            and isinstance(value, (int, float))
+            and not isinstance(value, bool)
+        ):
+            return None
+        self.__position = end
+        return value
+
+
+class LokiQueryClient:
+    """
+    Queries Loki's HTTP API directly, without starting a `logcli` process per request. Each thread
+    keeps its own keep-alive connection, so concurrent windows do not share one.
+    """
+
+    def __init__(self, url: str, timeout: float = 3600):
+        self.url = urllib.parse.urlsplit(url)
+        self.timeout = timeout
+        self.__connections = threading.local()
+
+    def query_range(
+        self, query: str, start: datetime, end: datetime, limit: int, batch: int
+    ) -> QueryExecutionResult:
+        """
+        Retrieves up to `limit` log lines matching `query` from `start` (inclusive) to `end`
+        (exclusive), newest first, in pages of `batch` lines as `logcli query` does. Each page
+        continues from the oldest timestamp counted so far, inclusive, as more lines may share it.
+        The lines of that timestamp already counted are returned again, so they are skipped, and the
+        page is extended by their number to still hold `batch` new lines. Each page is parsed as its
+        chunks arrive, so only a chunk of it is held in memory at a time, besides the lines of the
+        boundary, and the first result is timed when its line arrives rather than its whole page.
+        """
+        output_counter = QueryOutputCounter(time.perf_counter_ns())
+        start_ns = _to_ns(start)
+        end_ns = _to_ns(end)
+        nr_entries = 0
+        # The lines counted so far of the oldest timestamp counted so far
+        boundary_timestamp: Optional[str] = None
+        boundary_entries: Set[Tuple[str, str, str]] = set()
+        while nr_entries < limit:
+            page_size = min(batch, limit - nr_entries)
+            page_limit = page_size + len(boundary_entries)
+            parameters = {
+                "query": query,
+                "start": start_ns,
+                "end": end_ns,
+                "limit": page_limit,
+                "direction": "backward",
+            }
+            parser = _StreamsParser()
+            nr_page_entries = 0
+            nr_returned_entries = 0
+            oldest_timestamp: Optional[str] = None
+            oldest_entries: Set[Tuple[str, str, str]] = set()
+            path = f"{LOKI_QUERY_RANGE_PATH}?{urllib.parse.urlencode(parameters)}"
+            for chunk in self.__request(path, output_counter):
+                for entry in parser.feed(chunk):
+                    nr_returned_entries += 1
+                    if entry in boundary_entries:
+                        continue
+                    if output_counter.first_result_ts is None:
+                        output_counter.first_result_ts = time.perf_counter_ns()
+                    nr_page_entries += 1
+                    timestamp = entry[0]
+                    if oldest_timestamp is None or int(timestamp) < int(oldest_timestamp):
+                        oldest_timestamp = timestamp
+                        oldest_entries = {entry}
+                    elif timestamp == oldest_timestamp:
+                        oldest_entries.add(entry)
+            parser.feed(b"", final=True)
+            nr_entries = min(limit, nr_entries + nr_page_entries)
+            # A page short of its limit is the last one
+            if 0 == nr_page_entries or nr_returned_entries < page_limit:
+                break
+            # As the end is exclusive, the next page includes the oldest timestamp again, in case
+            # the page ended among lines of the same timestamp
+            end_ns = int(oldest_timestamp) + 1
+            if oldest_timestamp == boundary_timestamp:
+                boundary_entries |= oldest_entries
+            else:
+                boundary_timestamp = oldest_timestamp
+                boundary_entries = oldest_entries
+        execution = output_counter.to_execution_result(time.perf_counter_ns())
+        execution.nr_matched_log_lines = nr_entries
+        return execution
+
+    def count(self, query: str, time_point: datetime) -> QueryExecutionResult:
+        """
+        Runs an instant metric query, e.g., `sum(count_over_time(...))`, at `time_point`, and
+        returns the sum of the resulting vector as the number of matched log lines.
+        """
+        output_counter = QueryOutputCounter(time.perf_counter_ns())
+        response = self.__get(
+            LOKI_QUERY_PATH, {"query": query, "time": _to_ns(time_point)}, output_counter
+        )
+        nr_matched_log_lines = sum(
+            int(float(sample["value"][1])) for sample in response["data"]["result"]
+        )
+        execution = output_counter.to_execution_result(time.perf_counter_ns())
+        execution.nr_matched_log_lines = nr_matched_log_lines
+        return execution
+
+    def ping(self) -> QueryExecutionResult:
+        """
+        Requests `/ready`, measuring the overhead of a request without any query.
+        """
+        output_counter = QueryOutputCounter(time.perf_counter_ns())
+        for _ in self.__request(LOKI_READY_PATH, output_counter):
+            pass
+        return output_counter.to_execution_result(time.perf_counter_ns())
+
+    def __get(self, path: str, parameters: Dict, output_counter: QueryOutputCounter) -> Dict:
+        path = f"{path}?{urllib.parse.urlencode(parameters)}"
+        return json.loads(b"".join(self.__request(path, output_counter)))
+
+    def __request(self, path: str, output_counter: QueryOutputCounter) -> Iterator[bytes]:
+        """
+        Sends a GET request over the thread's connection, reconnecting once if the server closed
+        it, and yields the chunks of the response body as they arrive, counting their bytes as the
+        output. The body must be read to the end for the connection to be reused.
+        """
+        full_path = self.url.path.rstrip("/") + path
+        for attempt in range(2):
+            connection = self.__get_connection()
+            try:
+                connection.request("GET", full_path)
+                response = connection.getresponse()
+                break
+            except (http.client.HTTPException, ConnectionError) as e:
+                self.__close_connection()
+                if 0 != attempt:
+                    raise Exception(f"Failed to query Loki: {e}")
+        if 200 != response.status:
+            raise Exception(f"Loki responded {response.status}: {response.read()[:512]!r}")
+        completed = False
+        try:
+            while True:
+                # Unlike `read`, `read1` returns what has arrived instead of waiting for a full
+                # buffer
+                chunk = response.read1(QUERY_READ_BUFFER_SIZE)
+                if not chunk:
+                    # `read1` leaves the response open at the end of its length, so the connection
+                    # is not ready for the next request until `read` closes it
+                    response.read()
+                    break
+                # Lines of the JSON body are not results, so only its bytes are counted
+                if output_counter.first_byte_ts is None:
+                    output_counter.first_byte_ts = time.perf_counter_ns()
+                output_counter.nr_bytes += len(chunk)
+                yield chunk
+            completed = True
+        except (http.client.HTTPException, ConnectionError) as e:
+            raise Exception(f"Failed to query Loki: {e}")
+        finally:
+            # A partially read response leaves the connection unusable
+            if not completed:
+                self.__close_connection()
+
+    def __get_connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self.__connections, "connection", None)
+        if connection is None:
+            if "https" == self.url.scheme:
+                connection = http.client.HTTPSConnection(self.url.netloc, timeout=self.timeout)
+            else:
+                connection = http.client.HTTPConnection(self.url.netloc, timeout=self.timeout)
+            self.__connections.connection = connection
+        return connection
+
+    def __close_connection(self) -> None:
+        connection = getattr(self.__connections, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.__connections.connection = None
@@ -0,0 +1,112 @@
+import ctypes
+import logging
+import mmap
+import os
+import subprocess
+from typing import Iterator, List, Tuple
+
+# Retrive logger
+logger = logging.getLogger(__name__)
+
+
+def _iterate_files(paths: List[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for dir_path, _, file_names in os.walk(path):
+            for file_name in file_names:
+                file_path = os.path.join(dir_path, file_name)
+                if os.path.isfile(file_path) and not os.path.islink(file_path):
+                    yield file_path
+
+
+def drop_os_page_cache() -> None:
+    """
+    Flushes dirty pages and drops the page cache, dentries, and inodes of the whole host. Requires
+    root, so falls back to sudo when not running as root.
+    """
+    os.sync()
+    if 0 == os.geteuid():
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+    else:
+        try:
+            subprocess.run(
+                ["sudo", "tee", "/proc/sys/vm/drop_caches"],
+                input=b"3\n",
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+        except subprocess.CalledProcessError as e:
+            raise Exception(f"Failed to drop OS page cache: {e}")
+    logger.info("OS page cache dropped")
+
+
+def evict_from_page_cache(paths: List[str]) -> None:
+    """
+    Evicts every file under `paths` from the page cache, leaving the rest of the cache untouched.
+    """
+    os.sync()
+    nr_evicted_files = 0
+    for file_path in _iterate_files(paths):
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except OSError as e:
+            logger.warning(f"Cannot open {file_path} to evict it from page cache: {e}")
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            nr_evicted_files += 1
+        finally:
+            os.close(fd)
+    logger.info(f"Evicted {nr_evicted_files} files under {paths} from page cache")
+
+
+def get_page_cache_residency(paths: List[str]) -> Tuple[int, int]:
+    """
+    Returns the number of bytes of the files under `paths` that are resident in the page cache, and
+    their total size, using mincore(2).
+    """
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.mmap.restype = ctypes.c_void_p
+    libc.mmap.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_size_t,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_long,
+    ]
+    libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    libc.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.POINTER(ctypes.c_ubyte)]
+    map_failed = ctypes.c_void_p(-1).value
+
+    resident_size = 0
+    total_size = 0
+    for file_path in _iterate_files(paths):
+        file_size = os.path.getsize(file_path)
+        if 0 == file_size:
+            continue
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except OSError as e:
+            logger.warning(f"Cannot open {file_path} to check its page cache residency: {e}")
+            continue
+        try:
+            address = libc.mmap(None, file_size, mmap.PROT_READ, mmap.MAP_SHARED, fd, 0)
+            if address == map_failed:
+                raise OSError(ctypes.get_errno(), f"mmap failed for {file_path}")
+            try:
+                nr_pages = (file_size + mmap.PAGESIZE - 1) // mmap.PAGESIZE
+                page_states = (ctypes.c_ubyte * nr_pages)()
+                if 0 != libc.mincore(address, file_size, page_states):
+                    raise OSError(ctypes.get_errno(), f"mincore failed for {file_path}")
+                nr_resident_pages = sum(state & 1 for state in page_states)
+                resident_size += min(nr_resident_pages * mmap.PAGESIZE, file_size)
+                total_size += file_size
+            finally:
+                libc.munmap(address, file_size)
+        finally:
+            os.close(fd)
+    return resident_size, total_size
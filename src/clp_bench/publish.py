@@ -0,0 +1,123 @@
+import datetime
+import json
+import logging
+import socket
+import urllib.request
+from typing import Any, Dict, List, Tuple
+
+from .executor import (
+    BenchmarkingMode,
+    BenchmarkingStage,
+    BenchmarkingSystemMetric,
+    CPTExecutorBase,
+)
+from .version import VERSION
+
+# Retrive logger
+logger = logging.getLogger(__name__)
+
+# How each target is shown by the UI: (target, displayed name, displayed order, is enabled, type).
+# Type 1 is unstructured and type 2 is semi-structured.
+PUBLISHED_TARGETS: Dict[str, Tuple[str, str, int, bool, int]] = {
+    "CLPG": ("clpg", "CLP & CLG", 1, False, 1),
+    "GLT": ("glt", "CLP", 2, True, 1),
+    "ElasticsearchUnstructured": ("elasticsearch", "Elasticsearch", 3, True, 1),
+    "GrafanaLoki": ("loki", "Loki", 4, True, 1),
+    "Grep": ("grep", "grep", 5, True, 1),
+    "CLPS": ("clps", "CLP-S", 1, True, 2),
+    "CLPJson": ("clpJson", "CLP-JSON", 2, False, 2),
+    "Elasticsearch": ("elasticsearch", "Elasticsearch", 3, True, 2),
+}
+
+# The UI's `metric` of each mode, other modes are not shown by the UI
+PUBLISHED_MODES: Dict[BenchmarkingMode, int] = {
+    BenchmarkingMode.HOT_RUN_MODE: 1,
+    BenchmarkingMode.COLD_RUN_MODE: 2,
+}
+
+
+def build_published_rows(
+    executor: CPTExecutorBase, target: str, modes: List[BenchmarkingMode]
+) -> List[Dict[str, Any]]:
+    """
+    Converts the results of `modes` into rows of the UI backend's schema. Entries under `publish` in
+    the `yaml` file override how the target is shown.
+    """
+    if target not in PUBLISHED_TARGETS:
+        raise Exception(f"{target} is not shown by the UI")
+    (
+        published_target,
+        target_displayed_name,
+        displayed_order,
+        is_enable,
+        target_type,
+    ) = PUBLISHED_TARGETS[target]
+    publish_config = executor.config.get("publish", {})
+    created_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    rows = []
+    for mode in modes:
+        if mode not in PUBLISHED_MODES:
+            logger.info(f"Skip publishing {mode.value} mode as the UI does not show it")
+            continue
+        result = executor.benchmarking_reseults[mode]
+        memory_result = result.system_metric_results[BenchmarkingSystemMetric.MEMORY]
+        avg_ingest_mem = memory_result.get_stage_average(BenchmarkingStage.INGEST)
+        avg_query_mem = memory_result.get_stage_average(BenchmarkingStage.RUN_QUERY_BENCHMARK)
+        rows.append(
+            {
+                "target": publish_config.get("target", published_target),
+                "target_displayed_name": publish_config.get(
+                    "target_displayed_name", target_displayed_name
+                ),
+                "displayed_order": publish_config.get("displayed_order", displayed_order),
+                "is_enable": publish_config.get("is_enable", is_enable),
+                "type": publish_config.get("type", target_type),
+                "metric": PUBLISHED_MODES[mode],
+                # Unit: ms
+                "ingest_time": (
+                    None
+                    if result.ingest_e2e_latency is None
+                    else round(result.ingest_e2e_latency / 1e6)
+                ),
+                # Unit: byte
+                "compressed_size": result.compressed_size,
+                # Unit: byte
+                "avg_ingest_mem": None if avg_ingest_mem is None else avg_ingest_mem * 1024,
+                # Unit: byte
+                "avg_query_mem": None if avg_query_mem is None else avg_query_mem * 1024,
+                # Unit: ms
+                "query_times": str(
+                    [round(latency / 1e6) for latency in result.query_e2e_latencies]
+                ),
+                # Every measured run of each query, kept by the run history. Unit: ms
+                "query_latencies": [
+                    [latency * 1e3 for latency in trial_result.get_latencies()]
+                    for trial_result in result.query_trial_results
+                ],
+                "created_at": created_at,
+                "tool_version": publish_config.get("tool_version"),
+                "clp_bench_version": VERSION,
+                "host": socket.gethostname(),
+            }
+        )
+    return rows
+
+
+def publish_results(
+    executor: CPTExecutorBase, target: str, modes: List[BenchmarkingMode], url: str
+) -> None:
+    """
+    Publishes the results of `modes` to the UI backend at `url` in a single request.
+    """
+    rows = build_published_rows(executor, target, modes)
+    if not rows:
+        logger.info("No result to publish")
+        return
+    request = urllib.request.Request(
+        f"{url.rstrip('/')}/api/bulk",
+        data=json.dumps({"results": rows}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request) as response:
+        logger.info(f"Published {len(rows)} results to {url}: {response.read().decode('utf-8')}")
@@ -0,0 +1,252 @@
+import math
+import statistics
+from typing import Dict, List, Sequence, Tuple
+
+
+def percentile(samples: Sequence[float], percent: float) -> float:
+    """
+    Returns the `percent`-th percentile of `samples`, linearly interpolated between the closest
+    ranks.
+    """
+    if not samples:
+        raise ValueError("Cannot compute percentile of an empty sample set")
+    sorted_samples = sorted(samples)
+    rank = (len(sorted_samples) - 1) * percent / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    if lower == upper:
+        return sorted_samples[lower]
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * (rank - lower)
+
+
+def median_confidence_interval(
+    samples: Sequence[float], confidence: float = 0.95
+) -> Tuple[float, float]:
+    """
+    Returns a distribution-free confidence interval of the median, built from the order statistics
+    of `samples`. Latencies are rarely normally distributed, so no distribution is assumed. With too
+    few samples to reach `confidence`, the interval widens to [min, max].
+    """
+    if not samples:
+        raise ValueError("Cannot compute confidence interval of an empty sample set")
+    sorted_samples = sorted(samples)
+    n = len(sorted_samples)
+    # Find the narrowest symmetric pair of order statistics (j, n - 1 - j) so that the median falls
+    # in between with a probability of at least `confidence`, i.e., P(j < B <= n - 1 - j) where B is
+    # Binomial(n, 0.5).
+    lower_index = 0
+    tail_probability = 0.0
+    for j in range(n // 2):
+        # P(B <= j), accumulated in log space to stay accurate for large sample sets
+        tail_probability += math.exp(
+            math.lgamma(n + 1) - math.lgamma(j + 1) - math.lgamma(n - j + 1) - n * math.log(2)
+        )
+        if 1 - 2 * tail_probability < confidence:
+            break
+        lower_index = j
+    return sorted_samples[lower_index], sorted_samples[n - 1 - lower_index]
+
+
+class LatencySummary:
+    """
+    Summary statistics of repeated latency samples, in seconds.
+    """
+
+    def __init__(self, samples: List[float], confidence: float = 0.95):
+        self.nr_samples = len(samples)
+        self.confidence = confidence
+        self.min = min(samples)
+        self.max = max(samples)
+        self.mean = statistics.mean(samples)
+        self.median = statistics.median(samples)
+        self.p95 = percentile(samples, 95)
+        self.p99 = percentile(samples, 99)
+        self.stddev = statistics.stdev(samples) if 1 < len(samples) else 0.0
+        self.ci_lower, self.ci_upper = median_confidence_interval(samples, confidence)
+
+    def __str__(self) -> str:
+        return (
+            f"n={self.nr_samples} min={self.min:.9f}s median={self.median:.9f}s"
+            f" p95={self.p95:.9f}s p99={self.p99:.9f}s stddev={self.stddev:.9f}s"
+            f" {self.confidence:.0%} CI of median=[{self.ci_lower:.9f}s, {self.ci_upper:.9f}s]"
+        )
+
+
+class LatencyHistogram:
+    """
+    A log-linear latency histogram in the style of HdrHistogram. Values are recorded in nanoseconds
+    and kept with `significant_digits` decimal digits of precision, so memory does not grow with the
+    number of samples and tail percentiles stay accurate.
+    """
+
+    def __init__(self, significant_digits: int = 3):
+        self.significant_digits = significant_digits
+        self.__sub_bucket_bits = math.ceil(math.log2(2 * 10**significant_digits))
+        self.counts: Dict[int, int] = {}
+        self.total_count = 0
+        self.min = 0  # Unit: nanosecond
+        self.max = 0  # Unit: nanosecond
+
+    def __get_index(self, value: int) -> int:
+        if value < (1 << self.__sub_bucket_bits):
+            return value
+        shift = value.bit_length() - self.__sub_bucket_bits
+        return (shift << (self.__sub_bucket_bits - 1)) + (value >> shift)
+
+    def __get_highest_equivalent_value(self, index: int) -> int:
+        if index < (1 << self.__sub_bucket_bits):
+            return index
+        shift = (index >> (self.__sub_bucket_bits - 1)) - 1
+        top = index - (shift << (self.__sub_bucket_bits - 1))
+        return ((top + 1) << shift) - 1
+
+    def record(self, latency: float) -> None:
+        """
+        Records a latency given in seconds.
+        """
+        value = max(0, int(latency * 1e9))
+        index = self.__get_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        if 0 == self.total_count or value < self.min:
+            self.min = value
+        self.max = max(self.max, value)
+        self.total_count += 1
+
+    def get_value_at_percentile(self, percent: float) -> float:
+        """
+        Returns the latency, in seconds, at the given percentile.
+        """
+        if 0 == self.total_count:
+            raise ValueError("Cannot compute percentile of an empty histogram")
+        target_count = max(1, math.ceil(percent / 100 * self.total_count))
+        accumulated_count = 0
+        for index in sorted(self.counts):
+            accumulated_count += self.counts[index]
+            if accumulated_count >= target_count:
+                return min(self.__get_highest_equivalent_value(index), self.max) / 1e9
+        return self.max / 1e9
+
+    def to_dict(self) -> Dict:
+        """
+        Returns the recorded counts, each keyed by the highest value, in nanoseconds, equivalent to
+        its bucket.
+        """
+        return {
+            "significant_digits": self.significant_digits,
+            "total_count": self.total_count,
+            "min_ns": self.min,
+            "max_ns": self.max,
+            "counts": [
+                [min(self.__get_highest_equivalent_value(index), self.max), self.counts[index]]
+                for index in sorted(self.counts)
+            ],
+        }
+
+    def __str__(self) -> str:
+        if 0 == self.total_count:
+            return "n=0"
+        return (
+            f"n={self.total_count} min={self.min / 1e9:.9f}s"
+            f" p50={self.get_value_at_percentile(50):.9f}s"
+            f" p90={self.get_value_at_percentile(90):.9f}s"
+            f" p99={self.get_value_at_percentile(99):.9f}s"
+            f" p99.9={self.get_value_at_percentile(99.9):.9f}s max={self.max / 1e9:.9f}s"
+        )
+
+
+def _get_exact_u_distribution(n_x: int, n_y: int) -> List[int]:
+    """
+    Returns the number of arrangements of `n_x` and `n_y` distinct samples yielding each U from 0 to
+    `n_x * n_y`, i.e., the null distribution of U without ties.
+    """
+    # frequencies[n][u] for the current number of x samples, m, and n y samples. With m = 0, U is
+    # always 0.
+    frequencies = [[1] for _ in range(n_y + 1)]
+    for m in range(1, n_x + 1):
+        current_frequencies = [[1]]
+        for n in range(1, n_y + 1):
+            frequency = [0] * (m * n + 1)
+            # The largest sample is either a y sample, adding nothing to U, or an x sample, which
+            # is larger than all the n y samples
+            for u, count in enumerate(current_frequencies[n - 1]):
+                frequency[u] += count
+            for u, count in enumerate(frequencies[n]):
+                frequency[u + n] += count
+            current_frequencies.append(frequency)
+        frequencies = current_frequencies
+    return frequencies[n_y]
+
+
+def mann_whitney_u(samples_x: Sequence[float], samples_y: Sequence[float]) -> Tuple[float, float]:
+    """
+    Runs the two-sided Mann-Whitney U test of whether `samples_x` and `samples_y` come from the same
+    distribution, and returns U of `samples_x` and the p-value. Being rank-based, the test needs no
+    assumption on the distribution of latencies and is robust to outliers. The p-value is exact for
+    small sample sets without ties, otherwise it is approximated with the normal distribution,
+    corrected for ties.
+    """
+    if not samples_x or not samples_y:
+        raise ValueError("Cannot run Mann-Whitney U test on an empty sample set")
+    n_x = len(samples_x)
+    n_y = len(samples_y)
+    # Rank the pooled samples, giving tied samples the average of their ranks
+    pooled = sorted([(sample, 0) for sample in samples_x] + [(sample, 1) for sample in samples_y])
+    rank_sum_x = 0.0
+    tie_correction = 0
+    i = 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        average_rank = (i + j) / 2 + 1
+        rank_sum_x += average_rank * sum(1 for k in range(i, j + 1) if 0 == pooled[k][1])
+        nr_ties = j - i + 1
+        tie_correction += nr_ties**3 - nr_ties
+        i = j + 1
+    u_x = rank_sum_x - n_x * (n_x + 1) / 2
+    u_min = min(u_x, n_x * n_y - u_x)
+
+    if 0 == tie_correction and n_x * n_y <= 400:
+        distribution = _get_exact_u_distribution(n_x, n_y)
+        p_value = 2 * sum(distribution[: int(u_min) + 1]) / sum(distribution)
+        return u_x, min(1.0, p_value)
+
+    n = n_x + n_y
+    mean = n_x * n_y / 2
+    variance = n_x * n_y / 12 * ((n + 1) - tie_correction / (n * (n - 1)))
+    if 0 == variance:
+        return u_x, 1.0
+    # Continuity correction
+    z = (abs(u_x - mean) - 0.5) / math.sqrt(variance)
+    p_value = math.erfc(max(0.0, z) / math.sqrt(2))
+    return u_x, min(1.0, p_value)
+
+
+def get_min_mann_whitney_p_value(n_x: int, n_y: int) -> float:
+    """
+    Returns the smallest two-sided p-value the Mann-Whitney U test can reach with `n_x` and `n_y`
+    samples, i.e., when every sample of one side is below every sample of the other.
+    """
+    return min(1.0, 2 / math.comb(n_x + n_y, n_x))
+
+
+def fit_power_law(xs: Sequence[float], ys: Sequence[float]) -> Tuple[float, float]:
+    """
+    Fits `y = a * x^b` by least squares on `log(y)` against `log(x)`, and returns `(a, b)`. The
+    exponent `b` tells how a metric grows with `x`, e.g., 1 for linear growth. Needs at least two
+    distinct positive `x`s, and positive `y`s.
+    """
+    if len(xs) != len(ys) or len(xs) < 2:
+        raise ValueError("Cannot fit a power law to fewer than two points")
+    log_xs = [math.log(x) for x in xs]
+    log_ys = [math.log(y) for y in ys]
+    mean_log_x = statistics.mean(log_xs)
+    mean_log_y = statistics.mean(log_ys)
+    variance = sum((log_x - mean_log_x) ** 2 for log_x in log_xs)
+    if 0 == variance:
+        raise ValueError("Cannot fit a power law to a single distinct x")
+    b = (
+        sum((log_x - mean_log_x) * (log_y - mean_log_y) for log_x, log_y in zip(log_xs, log_ys))
+        / variance
+    )
+    return math.exp(mean_log_y - b * mean_log_x), b
@@ -0,0 +1,77 @@
+"""
+A timing agent that clp-bench uploads into a container to time a tool's own process there, so the
+measurement excludes the overhead of the harness (e.g., exec setup and streaming results out of the
+container).
+
+Usage: python3 timing_agent.py <command> [<arg>...]
+
+It runs the command, counts the lines the command writes to stdout without forwarding them, and
+prints a single JSON line to stdout with the wall time, user time, and system time (in nanoseconds)
+and the max RSS (in KB) of the command, along with the size of its output and the time to its first
+byte and first complete line (in nanoseconds, or null without output). It exits with the command's
+exit code.
+
+It only depends on the Python standard library, as it runs with the container's own interpreter.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+READ_BUFFER_SIZE = 1 << 16
+
+
+def main(argv):
+    if not argv:
+        sys.stderr.write("Usage: python3 timing_agent.py <command> [<arg>...]\n")
+        return 2
+
+    read_buffer = bytearray(READ_BUFFER_SIZE)
+    nr_output_lines = 0
+    nr_output_bytes = 0
+    first_byte_ts = None
+    first_line_ts = None
+    start_ts = time.monotonic_ns()
+    process = subprocess.Popen(argv, stdout=subprocess.PIPE, bufsize=0)
+    while True:
+        nr_read_bytes = process.stdout.readinto(read_buffer)
+        if not nr_read_bytes:
+            break
+        if first_byte_ts is None:
+            first_byte_ts = time.monotonic_ns()
+        nr_lines = read_buffer.count(b"\n", 0, nr_read_bytes)
+        if first_line_ts is None and 0 < nr_lines:
+            first_line_ts = time.monotonic_ns()
+        nr_output_lines += nr_lines
+        nr_output_bytes += nr_read_bytes
+    # wait4 returns the resource usage of the command only, unlike getrusage(RUSAGE_CHILDREN)
+    _, status, rusage = os.wait4(process.pid, 0)
+    end_ts = time.monotonic_ns()
+    process.stdout.close()
+    if os.WIFEXITED(status):
+        exit_code = os.WEXITSTATUS(status)
+    else:
+        exit_code = -os.WTERMSIG(status)
+    # The process is reaped already, so stop Popen from waiting for it again
+    process.returncode = exit_code
+
+    report = {
+        "wall_time_ns": end_ts - start_ts,
+        "user_time_ns": int(rusage.ru_utime * 1e9),
+        "system_time_ns": int(rusage.ru_stime * 1e9),
+        "max_rss_kb": rusage.ru_maxrss,
+        "nr_output_lines": nr_output_lines,
+        "nr_output_bytes": nr_output_bytes,
+        "time_to_first_byte_ns": None if first_byte_ts is None else first_byte_ts - start_ts,
+        "time_to_first_result_ns": None if first_line_ts is None else first_line_ts - start_ts,
+        "exit_code": exit_code,
+    }
+    sys.stdout.write(json.dumps(report) + "\n")
+    sys.stdout.flush()
+    return exit_code if 0 <= exit_code else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
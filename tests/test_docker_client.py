@@ -0,0 +1,170 @@
+import http.client
+import http.server
+import json
+import os
+import socketserver
+import struct
+import threading
+
+import pytest
+
+from clp_bench.docker_client import DockerClient, DockerExecError, STDERR_STREAM, STDOUT_STREAM
+
+
+def _frame(stream_type: int, data: bytes) -> bytes:
+    return struct.pack(">BxxxL", stream_type, len(data)) + data
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _FakeDockerHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves an exec whose start streams `server.frames`, and whose state reports it running for the
+    first `server.nr_running_polls` polls before exiting with `server.exit_code`. If
+    `server.drop_reused` is set, requests on a connection that served one already are dropped.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self) -> str:
+        return "unix"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def handle_one_request(self) -> None:
+        self.nr_requests = getattr(self, "nr_requests", 0) + 1
+        super().handle_one_request()
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if "/containers/container/restart?" in self.path:
+            self.server.nr_restarts += 1
+            if not self.__drop_reused():
+                self.send_response(204)
+                self.end_headers()
+        elif self.path.endswith("/exec"):
+            self.server.cmds.append(json.loads(body)["Cmd"])
+            self.__send_json({"Id": "exec-1"})
+        elif self.path.endswith("/exec/exec-1/start"):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/vnd.docker.raw-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            # Split the frames across writes, so headers and payloads arrive in pieces
+            stream = b"".join(self.server.frames)
+            for i in range(0, len(stream), 5):
+                self.wfile.write(stream[i : i + 5])
+                self.wfile.flush()
+            self.close_connection = True
+        else:
+            self.send_error(404)
+
+    def do_GET(self) -> None:
+        if self.path.endswith("/containers/container/json"):
+            self.server.nr_inspects += 1
+            if not self.__drop_reused():
+                self.__send_json({"Id": "container"})
+        elif self.path.endswith("/exec/exec-1/json"):
+            self.server.nr_polls += 1
+            running = self.server.nr_polls <= self.server.nr_running_polls
+            self.__send_json(
+                {"Running": running, "ExitCode": None if running else self.server.exit_code}
+            )
+        else:
+            self.send_error(404)
+
+    def __drop_reused(self) -> bool:
+        """
+        Closes the connection without a response if it is a reused one to drop, as the daemon does
+        with an idle connection, and returns whether it did.
+        """
+        if self.server.drop_reused and 1 < self.nr_requests:
+            self.close_connection = True
+            return True
+        return False
+
+    def __send_json(self, value) -> None:
+        data = json.dumps(value).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def docker_server(tmp_path):
+    socket_path = os.path.join(tmp_path, "docker.sock")
+    server = _UnixHTTPServer(socket_path, _FakeDockerHandler)
+    server.cmds = []
+    server.frames = []
+    server.nr_polls = 0
+    server.nr_running_polls = 0
+    server.exit_code = 0
+    server.drop_reused = False
+    server.nr_inspects = 0
+    server.nr_restarts = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_exec_stream_demultiplexes_frames(docker_server):
+    large_data = os.urandom(70000)
+    docker_server.frames = [
+        _frame(STDOUT_STREAM, b"hello\n"),
+        _frame(STDERR_STREAM, b"warning\n"),
+        _frame(STDOUT_STREAM, b""),
+        _frame(STDOUT_STREAM, large_data),
+    ]
+    docker_server.nr_running_polls = 2
+    client = DockerClient(docker_server.server_address)
+    chunks = list(client.exec_stream("container", ["echo", "hello"]))
+    assert [["echo", "hello"]] == docker_server.cmds
+    assert [
+        (STDOUT_STREAM, b"hello\n"),
+        (STDERR_STREAM, b"warning\n"),
+        (STDOUT_STREAM, b""),
+        (STDOUT_STREAM, large_data),
+    ] == chunks
+    # Polled until the exec stopped running
+    assert 3 == docker_server.nr_polls
+
+
+def test_exec_run_splits_stdout_and_stderr(docker_server):
+    docker_server.frames = [
+        _frame(STDOUT_STREAM, b"a"),
+        _frame(STDERR_STREAM, b"b"),
+        _frame(STDOUT_STREAM, b"c"),
+    ]
+    client = DockerClient(docker_server.server_address)
+    assert (b"ac", b"b") == client.exec_run("container", ["true"])
+
+
+def test_exec_stream_raises_on_non_zero_exit_code(docker_server):
+    docker_server.frames = [_frame(STDOUT_STREAM, b"out"), _frame(STDERR_STREAM, b"no such file")]
+    docker_server.exit_code = 2
+    client = DockerClient(docker_server.server_address)
+    with pytest.raises(DockerExecError) as exc_info:
+        client.exec_run("container", ["ls", "/missing"])
+    assert 2 == exc_info.value.exit_code
+    assert b"no such file" == exc_info.value.stderr
+    assert not client.test_path("container", "/missing")
+
+
+def test_request_retries_only_get_on_dropped_idle_connection(docker_server):
+    client = DockerClient(docker_server.server_address)
+    assert {"Id": "container"} == client.inspect_container("container")
+    docker_server.drop_reused = True
+    # A GET dropped on the idle connection is retried on a new one
+    assert {"Id": "container"} == client.inspect_container("container")
+    assert 3 == docker_server.nr_inspects
+    # A POST dropped after it was sent may have taken effect, so it is not retried
+    with pytest.raises(http.client.RemoteDisconnected):
+        client.restart_container("container")
+    assert 1 == docker_server.nr_restarts
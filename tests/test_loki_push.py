@@ -0,0 +1,121 @@
+import gzip
+import http.server
+import json
+import os
+import threading
+
+import pytest
+
+from clp_bench.loki_push import LokiPushLoader
+
+
+class _FakeLokiPushHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Accepts pushes to `/loki/api/v1/push`, after failing the first `server.nr_failures` of them
+    with `server.failure_status`, and keeps the entries of the accepted ones.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with self.server.lock:
+            self.server.nr_requests += 1
+            failed = self.server.nr_requests <= self.server.nr_failures
+            if not failed:
+                assert "gzip" == self.headers["Content-Encoding"]
+                for stream in json.loads(gzip.decompress(body))["streams"]:
+                    for timestamp, line in stream["values"]:
+                        self.server.entries.append((stream["stream"], int(timestamp), line))
+        if failed:
+            message = b"try again later"
+            self.send_response(self.server.failure_status)
+            self.send_header("Content-Length", str(len(message)))
+            self.end_headers()
+            self.wfile.write(message)
+        else:
+            self.send_response(204)
+            self.end_headers()
+
+
+@pytest.fixture
+def loki_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _FakeLokiPushHandler)
+    server.lock = threading.Lock()
+    server.entries = []
+    server.nr_requests = 0
+    server.nr_failures = 0
+    server.failure_status = 503
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def dataset_path(tmp_path):
+    with open(os.path.join(tmp_path, "a.log"), "w") as log_file:
+        for i in range(50):
+            log_file.write(f"2018-06-05 06:15:{i % 60:02d},701 INFO line a{i}\n")
+            if 0 == i % 10:
+                log_file.write(f"\tat stack trace of a{i}\n")
+    with open(os.path.join(tmp_path, "b.log"), "w") as log_file:
+        for i in range(30):
+            log_file.write(f"2018-06-05 07:00:00.5 WARN line b{i}\n")
+    return str(tmp_path)
+
+
+def _get_loader(server, **kwargs) -> LokiPushLoader:
+    return LokiPushLoader(
+        f"http://127.0.0.1:{server.server_address[1]}",
+        {"job": "test"},
+        nr_workers=2,
+        batch_size=256,
+        use_line_timestamps=True,
+        **kwargs,
+    )
+
+
+def test_load_retries_until_accepted(loki_server, dataset_path):
+    loki_server.nr_failures = 3
+    statistics = _get_loader(loki_server).load(dataset_path)
+
+    lines = sorted(line for _, _, line in loki_server.entries)
+    assert 85 == len(lines)
+    assert len(set(lines)) == len(lines)
+    assert 85 == statistics.nr_entries
+    total_size = sum(
+        os.path.getsize(os.path.join(dataset_path, name)) for name in ("a.log", "b.log")
+    )
+    assert total_size == statistics.nr_bytes
+    # Only accepted pushes are counted
+    assert loki_server.nr_requests - 3 == statistics.nr_requests
+
+    entries = {line: (labels, timestamp) for labels, timestamp, line in loki_server.entries}
+    labels, timestamp = entries["2018-06-05 06:15:01,701 INFO line a1"]
+    assert {"job": "test", "filename": os.path.join(dataset_path, "a.log")} == labels
+    assert 1528179301701000000 == timestamp
+    # A line without a timestamp takes the one of the line before
+    assert (
+        entries["\tat stack trace of a10"][1] == entries["2018-06-05 06:15:10,701 INFO line a10"][1]
+    )
+    assert 1528182000500000000 == entries["2018-06-05 07:00:00.5 WARN line b0"][1]
+
+
+def test_load_fails_after_max_retries(loki_server, dataset_path):
+    loki_server.nr_failures = 1000
+    with pytest.raises(Exception, match="503"):
+        _get_loader(loki_server, max_retries=2).load(dataset_path)
+
+
+def test_load_does_not_retry_client_errors(loki_server, dataset_path):
+    loki_server.nr_failures = 1000
+    loki_server.failure_status = 400
+    with pytest.raises(Exception, match="400"):
+        _get_loader(loki_server).load(dataset_path)
+    # Each worker gives up on its first failure, and the rest of the batches are dropped
+    assert loki_server.nr_requests <= 2
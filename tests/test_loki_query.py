@@ -0,0 +1,184 @@
+import http.server
+import json
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timezone
+
+import pytest
+
+from clp_bench.loki_query import _StreamsParser, LokiQueryClient
+
+
+class _FakeLokiHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves `/loki/api/v1/query_range` backward over `server.entries`, i.e., `(timestamp, labels,
+    line)` tuples, like Loki does: the newest `limit` entries from `start` (inclusive) to `end`
+    (exclusive), grouped by stream.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        parameters = dict(urllib.parse.parse_qsl(url.query))
+        if "/loki/api/v1/query_range" != url.path:
+            self.send_error(404)
+            return
+        assert "backward" == parameters["direction"]
+        start = int(parameters["start"])
+        end = int(parameters["end"])
+        self.server.requests.append((start, end, int(parameters["limit"])))
+        page = sorted(
+            (entry for entry in self.server.entries if start <= entry[0] < end),
+            key=lambda entry: entry[0],
+            reverse=True,
+        )[: int(parameters["limit"])]
+        streams = {}
+        for timestamp, labels, line in page:
+            streams.setdefault(labels, []).append([str(timestamp), line])
+        body = json.dumps(
+            {
+                "status": "success",
+                "data": {
+                    "resultType": "streams",
+                    "result": [
+                        {"stream": {"job": labels}, "values": values}
+                        for labels, values in streams.items()
+                    ],
+                },
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        # Holds back the rest of the body after its first value, if asked to
+        split = body.find(b"]", body.find(b'"values"')) + 1
+        if 0 < self.server.delay and 0 < split:
+            self.wfile.write(body[:split])
+            self.wfile.flush()
+            time.sleep(self.server.delay)
+            body = body[split:]
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def loki_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _FakeLokiHandler)
+    server.entries = []
+    server.requests = []
+    server.delay = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _get_client(server) -> LokiQueryClient:
+    return LokiQueryClient(f"http://127.0.0.1:{server.server_address[1]}")
+
+
+START = datetime.fromtimestamp(1000, tz=timezone.utc)
+END = datetime.fromtimestamp(2000, tz=timezone.utc)
+
+
+def _ns(second: int) -> int:
+    return second * 1000000000
+
+
+def test_query_range_pages_without_duplicates(loki_server):
+    # Timestamps shared within and across streams straddle the page boundaries
+    loki_server.entries = [
+        (_ns(1100), "a", "line 0"),
+        (_ns(1200), "a", "line 1"),
+        (_ns(1200), "b", "line 2"),
+        (_ns(1300), "a", "line 3"),
+        (_ns(1300), "a", "line 4"),
+        (_ns(1300), "b", "line 5"),
+        (_ns(1400), "b", "line 6"),
+        (_ns(1500), "a", "line 7"),
+    ]
+    execution = _get_client(loki_server).query_range('{job=~".+"}', START, END, 1000, 3)
+    assert 8 == execution.nr_matched_log_lines
+    assert execution.nr_output_bytes > 0
+    assert execution.time_to_first_result is not None
+    first_start, first_end, first_limit = loki_server.requests[0]
+    assert (_ns(1000), _ns(2000), 3) == (first_start, first_end, first_limit)
+    # Each page continues from the oldest timestamp of the previous one, inclusive
+    assert _ns(1300) + 1 == loki_server.requests[1][1]
+
+
+def test_query_range_pages_through_a_crowded_timestamp(loki_server):
+    # More lines share a timestamp than a page holds
+    loki_server.entries = [(_ns(1500), "a", f"line {i}") for i in range(7)]
+    loki_server.entries += [(_ns(1400), "a", "old line 0"), (_ns(1100), "b", "old line 1")]
+    execution = _get_client(loki_server).query_range('{job=~".+"}', START, END, 1000, 2)
+    assert 9 == execution.nr_matched_log_lines
+
+
+def test_query_range_stops_at_limit(loki_server):
+    loki_server.entries = [(_ns(1000 + i), "a", f"line {i}") for i in range(10)]
+    execution = _get_client(loki_server).query_range('{job="a"}', START, END, 7, 3)
+    assert 7 == execution.nr_matched_log_lines
+    # Pages of 3, 3, and the remaining 1 new lines, each after the line of the boundary
+    assert [3, 4, 2] == [limit for _, _, limit in loki_server.requests]
+
+
+def test_query_range_stops_at_short_page(loki_server):
+    loki_server.entries = [(_ns(1000 + i), "a", f"line {i}") for i in range(4)]
+    execution = _get_client(loki_server).query_range('{job="a"}', START, END, 1000, 3)
+    assert 4 == execution.nr_matched_log_lines
+    assert 2 == len(loki_server.requests)
+
+
+def test_query_range_without_matches(loki_server):
+    execution = _get_client(loki_server).query_range('{job="a"}', START, END, 1000, 3)
+    assert 0 == execution.nr_matched_log_lines
+    assert execution.time_to_first_result is None
+    assert 1 == len(loki_server.requests)
+
+
+def test_query_range_times_first_result_before_body_completes(loki_server):
+    loki_server.entries = [(_ns(1000 + i), "a", f"line {i}") for i in range(5)]
+    loki_server.delay = 0.5
+    execution = _get_client(loki_server).query_range('{job="a"}', START, END, 1000, 10)
+    assert 5 == execution.nr_matched_log_lines
+    assert execution.latency >= 0.5
+    assert execution.time_to_first_result < execution.latency - 0.4
+
+
+def test_streams_parser_handles_any_chunking():
+    body = json.dumps(
+        {
+            "status": "success",
+            "data": {
+                "resultType": "streams",
+                "result": [
+                    {"stream": {"job": "a", "é": "ü"}, "values": [["12", 'line\n "x" é']]},
+                    {"stream": {"job": "b"}, "values": [["11", "a"], ["10", ""]]},
+                ],
+                "stats": {"summary": {"bytesProcessedPerSecond": 12345, "execTime": 0.5}},
+            },
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+    parser = _StreamsParser()
+    entries = []
+    for i in range(len(body)):
+        entries += parser.feed(body[i : i + 1])
+    entries += parser.feed(b"", final=True)
+    labels_a = json.dumps({"job": "a", "é": "ü"}, sort_keys=True)
+    labels_b = json.dumps({"job": "b"}, sort_keys=True)
+    assert [
+        ("12", labels_a, 'line\n "x" é'),
+        ("11", labels_b, "a"),
+        ("10", labels_b, ""),
+    ] == entries
+
+    with pytest.raises(Exception, match="Incomplete"):
+        _StreamsParser().feed(body[:-1], final=True)
@@ -1,10 +1,13 @@
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import UniqueConstraint, Row
+from sqlalchemy import ForeignKey, Index, UniqueConstraint, Row, case, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 from dotenv import load_dotenv
+from datetime import datetime, timezone
+import json
 import os
 
 
@@ -39,72 +42,307 @@ class BenchmarkingResult(db.Model):
     __table_args__ = (UniqueConstraint("target", "type", "metric", name="uix_target_type_metric"),)
 
 
+class BenchmarkingRun(db.Model):
+    """
+    Every published run, kept as history. `BenchmarkingResult` only keeps the latest run of each
+    target, type, and metric.
+    """
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    target: Mapped[str] = mapped_column(nullable=False)
+    type: Mapped[int] = mapped_column(nullable=False)
+    metric: Mapped[int] = mapped_column(nullable=False)
+    created_at: Mapped[datetime] = mapped_column(nullable=False)
+    tool_version: Mapped[str] = mapped_column(nullable=True)
+    clp_bench_version: Mapped[str] = mapped_column(nullable=True)
+    host: Mapped[str] = mapped_column(nullable=True)
+    # Unit: ms
+    ingest_time: Mapped[int] = mapped_column(nullable=True)
+    # Unit: byte
+    compressed_size: Mapped[int] = mapped_column(nullable=True)
+    # Unit: byte
+    avg_ingest_mem: Mapped[int] = mapped_column(nullable=True)
+    # Unit: byte
+    avg_query_mem: Mapped[int] = mapped_column(nullable=True)
+
+    __table_args__ = (Index("ix_run_target_type_metric", "target", "type", "metric", "created_at"),)
+
+
+class QueryLatency(db.Model):
+    """
+    Each latency sample of each query of a run.
+    """
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    run_id: Mapped[int] = mapped_column(ForeignKey("benchmarking_run.id"), nullable=False)
+    query_index: Mapped[int] = mapped_column(nullable=False)
+    sample_index: Mapped[int] = mapped_column(nullable=False)
+    # Unit: ms
+    latency: Mapped[float] = mapped_column(nullable=False)
+
+    __table_args__ = (Index("ix_query_latency_run_query", "run_id", "query_index", "latency"),)
+
+
+RESULT_COLUMNS = [
+    "target",
+    "target_displayed_name",
+    "displayed_order",
+    "is_enable",
+    "type",
+    "metric",
+    "ingest_time",
+    "compressed_size",
+    "avg_ingest_mem",
+    "avg_query_mem",
+    "query_times",
+]
+RESULT_KEY_COLUMNS = ["target", "type", "metric"]
+
+
+def _get_missing_columns(row: dict) -> list:
+    return [column for column in RESULT_COLUMNS if column not in row]
+
+
+def _upsert_results(rows: list):
+    """
+    Inserts or updates all rows in a single transaction, with one `INSERT ... ON CONFLICT` statement.
+    """
+    if not rows:
+        return
+    # A statement cannot update the same row twice, so only the last row of each key is kept
+    values_by_key = {}
+    for row in rows:
+        values = {column: row[column] for column in RESULT_COLUMNS}
+        values_by_key[tuple(values[column] for column in RESULT_KEY_COLUMNS)] = values
+    values = list(values_by_key.values())
+    statement = sqlite_insert(BenchmarkingResult).values(values)
+    statement = statement.on_conflict_do_update(
+        index_elements=RESULT_KEY_COLUMNS,
+        set_={
+            column: statement.excluded[column]
+            for column in RESULT_COLUMNS
+            if column not in RESULT_KEY_COLUMNS
+        },
+    )
+    db.session.execute(statement)
+    for row in rows:
+        _add_run(row)
+    db.session.commit()
+
+
+def _add_run(row: dict):
+    """
+    Adds the row to the run history. `query_latencies`, if given, holds every latency sample of each
+    query, otherwise `query_times` is used as a single sample of each query.
+    """
+    created_at = datetime.now(timezone.utc)
+    if row.get("created_at"):
+        created_at = datetime.fromisoformat(row["created_at"])
+    run = BenchmarkingRun(
+        target=row["target"],
+        type=row["type"],
+        metric=row["metric"],
+        created_at=created_at,
+        tool_version=row.get("tool_version"),
+        clp_bench_version=row.get("clp_bench_version"),
+        host=row.get("host"),
+        ingest_time=row["ingest_time"],
+        compressed_size=row["compressed_size"],
+        avg_ingest_mem=row["avg_ingest_mem"],
+        avg_query_mem=row["avg_query_mem"],
+    )
+    db.session.add(run)
+    # Assign the run's ID
+    db.session.flush()
+    query_latencies = row.get("query_latencies")
+    if query_latencies is None:
+        query_latencies = [[latency] for latency in json.loads(row["query_times"] or "[]")]
+    db.session.add_all(
+        QueryLatency(
+            run_id=run.id, query_index=query_index, sample_index=sample_index, latency=latency
+        )
+        for query_index, samples in enumerate(query_latencies)
+        for sample_index, latency in enumerate(samples)
+    )
+
+
+def _parse_percentiles(percentiles: str) -> list:
+    values = [float(percentile) for percentile in percentiles.split(",")]
+    for value in values:
+        if not 0 < value <= 100:
+            raise ValueError(f"percentile {value} is not in (0, 100]")
+    return values
+
+
+def _select_query_latency_stats(run_ids, percentiles: list):
+    """
+    Builds a query of the stats of each query of each run in `run_ids`, with each percentile in
+    `percentiles` computed by SQL as the nearest-rank percentile.
+    """
+    partition = (QueryLatency.run_id, QueryLatency.query_index)
+    ranked = (
+        db.select(
+            QueryLatency.run_id,
+            QueryLatency.query_index,
+            QueryLatency.latency,
+            func.row_number()
+            .over(partition_by=partition, order_by=QueryLatency.latency)
+            .label("rank"),
+            func.count().over(partition_by=partition).label("nr_samples"),
+        )
+        .where(QueryLatency.run_id.in_(run_ids))
+        .subquery()
+    )
+    columns = [
+        ranked.c.run_id,
+        ranked.c.query_index,
+        func.max(ranked.c.nr_samples).label("nr_samples"),
+        func.min(ranked.c.latency).label("min"),
+        func.max(ranked.c.latency).label("max"),
+        func.avg(ranked.c.latency).label("mean"),
+    ]
+    for percentile in percentiles:
+        # ceil(nr_samples * percentile / 100) in integer arithmetic, with 0.1 precision
+        per_mille = round(percentile * 10)
+        target_rank = (ranked.c.nr_samples * per_mille + 999) // 1000
+        columns.append(
+            func.max(case((ranked.c.rank == target_rank, ranked.c.latency))).label(
+                f"p{percentile:g}"
+            )
+        )
+    return (
+        db.select(*columns)
+        .group_by(ranked.c.run_id, ranked.c.query_index)
+        .order_by(ranked.c.run_id, ranked.c.query_index)
+    )
+
+
+def _select_latest_run_ids():
+    return db.select(func.max(BenchmarkingRun.id)).group_by(
+        BenchmarkingRun.target, BenchmarkingRun.type, BenchmarkingRun.metric
+    )
+
+
+def _filter_runs(query):
+    for column in ["target", "type", "metric"]:
+        value = request.args.get(column)
+        if value:
+            query = query.filter(getattr(BenchmarkingRun, column) == value)
+    return query
+
+
+def _serialize_run(run: BenchmarkingRun) -> dict:
+    return {
+        "id": run.id,
+        "target": run.target,
+        "type": run.type,
+        "metric": run.metric,
+        "created_at": run.created_at.isoformat(),
+        "tool_version": run.tool_version,
+        "clp_bench_version": run.clp_bench_version,
+        "host": run.host,
+        "ingest_time": run.ingest_time,
+        "compressed_size": run.compressed_size,
+        "avg_ingest_mem": run.avg_ingest_mem,
+        "avg_query_mem": run.avg_query_mem,
+    }
+
+
 def _define_routes(base_path: str):
     @app.route(f"{base_path}/api/post", methods=["POST"])
     def add_result():
         data = request.json
-        new_benchmarking_result = BenchmarkingResult(
-            target=data["target"],
-            target_displayed_name=data["target_displayed_name"],
-            displayed_order=data["displayed_order"],
-            is_enable=data["is_enable"],
-            type=data["type"],
-            metric=data["metric"],
-            ingest_time=data["ingest_time"],
-            compressed_size=data["compressed_size"],
-            avg_ingest_mem=data["avg_ingest_mem"],
-            avg_query_mem=data["avg_query_mem"],
-            query_times=data["query_times"],
+        missing_columns = _get_missing_columns(data)
+        if missing_columns:
+            return jsonify({"message": f"missing {missing_columns}"}), 400
+        _upsert_results([data])
+        return jsonify({"message": "success"}), 201
+
+    @app.route(f"{base_path}/api/bulk", methods=["POST"])
+    def add_results():
+        rows = request.json.get("results", [])
+        for row in rows:
+            missing_columns = _get_missing_columns(row)
+            if missing_columns:
+                return jsonify({"message": f"missing {missing_columns}"}), 400
+        _upsert_results(rows)
+        return jsonify({"message": "success", "count": len(rows)}), 201
+
+    @app.route(f"{base_path}/api/runs", methods=["GET"])
+    def get_runs():
+        limit = request.args.get("limit", 100, type=int)
+        query = _filter_runs(db.select(BenchmarkingRun))
+        query = query.order_by(BenchmarkingRun.created_at.desc()).limit(limit)
+        runs = db.session.execute(query).scalars().all()
+        return (
+            jsonify({"message": "success", "payload": [_serialize_run(run) for run in runs]}),
+            201,
         )
-        query = db.select(BenchmarkingResult)
-        query = query.filter_by(target=data["target"])
-        query = query.filter_by(type=data["type"])
-        query = query.filter_by(metric=data["metric"])
-        existed_benchmarking_result: BenchmarkingResult = (
-            db.session.execute(query).scalars().first()
+
+    @app.route(f"{base_path}/api/runs/<int:run_id>", methods=["GET"])
+    def get_run(run_id: int):
+        run = db.session.get(BenchmarkingRun, run_id)
+        if run is None:
+            return jsonify({"message": f"run {run_id} not found"}), 404
+        samples = db.session.execute(
+            db.select(QueryLatency.query_index, QueryLatency.latency)
+            .where(QueryLatency.run_id == run_id)
+            .order_by(QueryLatency.query_index, QueryLatency.sample_index)
+        ).all()
+        query_latencies = []
+        for query_index, latency in samples:
+            while len(query_latencies) <= query_index:
+                query_latencies.append([])
+            query_latencies[query_index].append(latency)
+        payload = _serialize_run(run)
+        payload["query_latencies"] = query_latencies
+        return jsonify({"message": "success", "payload": payload}), 201
+
+    @app.route(f"{base_path}/api/runs/<int:run_id>/queries", methods=["GET"])
+    def get_run_query_stats(run_id: int):
+        try:
+            percentiles = _parse_percentiles(request.args.get("percentiles", "50,90,99"))
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+        rows = db.session.execute(_select_query_latency_stats([run_id], percentiles)).all()
+        return jsonify({"message": "success", "payload": [row._asdict() for row in rows]}), 201
+
+    @app.route(f"{base_path}/api/trend", methods=["GET"])
+    def get_trend():
+        limit = request.args.get("limit", 30, type=int)
+        query_index = request.args.get("query_index", type=int)
+        # The latest `limit` runs, with the median latency of each query computed by SQL
+        runs = (
+            _filter_runs(db.select(BenchmarkingRun))
+            .order_by(BenchmarkingRun.created_at.desc())
+            .limit(limit)
+            .subquery()
         )
-        if existed_benchmarking_result:
-            if existed_benchmarking_result.target != new_benchmarking_result.target:
-                existed_benchmarking_result.target = new_benchmarking_result.target
-            if (
-                existed_benchmarking_result.target_displayed_name
-                != new_benchmarking_result.target_displayed_name
-            ):
-                existed_benchmarking_result.target_displayed_name = (
-                    new_benchmarking_result.target_displayed_name
-                )
-            if (
-                existed_benchmarking_result.displayed_order
-                != new_benchmarking_result.displayed_order
-            ):
-                existed_benchmarking_result.displayed_order = (
-                    new_benchmarking_result.displayed_order
-                )
-            if existed_benchmarking_result.is_enable != new_benchmarking_result.is_enable:
-                existed_benchmarking_result.is_enable = new_benchmarking_result.is_enable
-            if existed_benchmarking_result.type != new_benchmarking_result.type:
-                existed_benchmarking_result.type = new_benchmarking_result.type
-            if existed_benchmarking_result.metric != new_benchmarking_result.metric:
-                existed_benchmarking_result.metric = new_benchmarking_result.metric
-            if existed_benchmarking_result.ingest_time != new_benchmarking_result.ingest_time:
-                existed_benchmarking_result.ingest_time = new_benchmarking_result.ingest_time
-            if (
-                existed_benchmarking_result.compressed_size
-                != new_benchmarking_result.compressed_size
-            ):
-                existed_benchmarking_result.compressed_size = (
-                    new_benchmarking_result.compressed_size
-                )
-            if existed_benchmarking_result.avg_ingest_mem != new_benchmarking_result.avg_ingest_mem:
-                existed_benchmarking_result.avg_ingest_mem = new_benchmarking_result.avg_ingest_mem
-            if existed_benchmarking_result.avg_query_mem != new_benchmarking_result.avg_query_mem:
-                existed_benchmarking_result.avg_query_mem = new_benchmarking_result.avg_query_mem
-            if existed_benchmarking_result.query_times != new_benchmarking_result.query_times:
-                existed_benchmarking_result.query_times = new_benchmarking_result.query_times
-        else:
-            db.session.add(new_benchmarking_result)
-        db.session.commit()
-        return jsonify({"message": "success"}), 201
+        stats = _select_query_latency_stats(db.select(runs.c.id), [50]).subquery()
+        query = (
+            db.select(
+                runs.c.id.label("run_id"),
+                runs.c.target,
+                runs.c.type,
+                runs.c.metric,
+                runs.c.created_at,
+                runs.c.tool_version,
+                stats.c.query_index,
+                stats.c.nr_samples,
+                stats.c.p50.label("median"),
+            )
+            .join(stats, stats.c.run_id == runs.c.id)
+            .order_by(runs.c.created_at, stats.c.query_index)
+        )
+        if query_index is not None:
+            query = query.where(stats.c.query_index == query_index)
+        rows = db.session.execute(query).all()
+        payload = []
+        for row in rows:
+            entry = row._asdict()
+            entry["created_at"] = row.created_at.isoformat()
+            payload.append(entry)
+        return jsonify({"message": "success", "payload": payload}), 201
 
     @app.route(f"{base_path}/")
     def index():
@@ -129,6 +367,19 @@ def _define_routes(base_path: str):
             query = query.filter_by(metric=metric)
 
         rows = db.session.execute(query).scalars().all()
+
+        # The median latency of each query of the latest run of each result, computed by SQL
+        query_latencies = {}
+        latest_runs = db.session.execute(
+            db.select(BenchmarkingRun).where(BenchmarkingRun.id.in_(_select_latest_run_ids()))
+        ).scalars()
+        run_keys = {run.id: (run.target, run.type, run.metric) for run in latest_runs}
+        if run_keys:
+            for stats in db.session.execute(
+                _select_query_latency_stats(list(run_keys.keys()), [50])
+            ):
+                query_latencies.setdefault(run_keys[stats.run_id], []).append(stats.p50)
+
         for row in rows:
             if isinstance(row, BenchmarkingResult):
                 results.append(
@@ -144,6 +395,11 @@ def _define_routes(base_path: str):
                         "avg_ingest_mem": row.avg_ingest_mem,
                         "avg_query_mem": row.avg_query_mem,
                         "query_times": row.query_times,
+                        # Unit: ms
+                        "query_latencies": query_latencies.get(
+                            (row.target, row.type, row.metric),
+                            json.loads(row.query_times or "[]"),
+                        ),
                     }
                 )
 
@@ -14,7 +14,7 @@ else:
 host = os.getenv("VITE_BACKEND_HOST", "127.0.0.1")
 port = os.getenv("VITE_BACKEND_PORT", 5000)
 base_path = os.getenv("VITE_FRONTEND_BASE_PATH", "")
-url = f"http://{host}:{port}{base_path}/api/post"
+url = f"http://{host}:{port}{base_path}/api/bulk"
 print(url)
 
 # All current results
@@ -192,8 +192,9 @@ results = [
 
 def dump_and_post():
     headers = {"Content-Type": "application/json"}
+    rows = []
     for result in results:
-        payload = json.dumps(
+        rows.append(
             {
                 "target": result[0][0],
                 "target_displayed_name": result[0][1],
@@ -208,8 +209,10 @@ def dump_and_post():
                 "query_times": str(list(result[1])),
             }
         )
-        response = requests.request("POST", url, headers=headers, data=payload)
-        print(response.text)
+    # All results are upserted in one request
+    payload = json.dumps({"results": rows})
+    response = requests.request("POST", url, headers=headers, data=payload)
+    print(response.text)
 
 
 dump_and_post()
@@ -279,6 +279,7 @@ type BenchmarkingResultResponse = {
         avg_ingest_mem: number;
         avg_query_mem: number;
         query_times: string;
+        query_latencies: number[];
     }[];
 };
 
@@ -383,7 +384,7 @@ function App() {
                     const target: string = result.payload[i].target;
                     const type: string = TYPE[result.payload[i].type];
                     const metric: string = METRIC[result.payload[i].metric];
-                    const query_times_arr: number[] = JSON.parse(result.payload[i].query_times);
+                    const query_times_arr: number[] = result.payload[i].query_latencies;
                     if (0 == NR_QUERIES[type][metric]) {
                         NR_QUERIES[type][metric] = query_times_arr.length;
                         for (let j = 0; j < NR_QUERIES[type][metric]; j++) {